@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "debug_toolbar",
     "rest_framework",
     "drf_spectacular",
@@ -180,7 +181,8 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/day",
-        "user": "1000/day"
+        "user": "1000/day",
+        "autocomplete": "120/minute",
     },
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
@@ -200,6 +202,82 @@ SPECTACULAR_SETTINGS = {
     },
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# every process must share one cache: the catalog version, cached
+# details and index generations reach the other web workers and the
+# management commands through it. Without REDIS_URL each process keeps
+# its own copy, which only suits tests and a single runserver.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+MOVIE_DETAIL_CACHE_TIMEOUT = 60 * 60
+
+ANONYMOUS_RESPONSE_CACHE_TIMEOUT = 60 * 10
+
+REVIEWS_MAX_DEPTH = 3
+# most review threads /movies/id/?reviews= keeps
+REVIEWS_MAX_LIMIT = 20
+
+MOVIE_SEARCH_CONFIG = "english"
+
+PEOPLE_NAME_SIMILARITY_THRESHOLD = 0.6
+
+AUTOCOMPLETE_INDEX_MAX_AGE = 60 * 60
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+# serve a stale in-process index (genres, autocomplete, collaboration
+# graph) while a thread rebuilds it, instead of rebuilding on the request
+# path; off in tests, whose data a thread's connection cannot see
+INDEX_BACKGROUND_REBUILD = os.getenv("INDEX_BACKGROUND_REBUILD") == "1"
+
+RATING_BATCH_MAX_SIZE = 1000
+# acknowledge POST /ratings/ with 202 once queued; `flush_ratings` applies
+# the queue in batches
+RATING_WRITE_BEHIND = os.getenv("RATING_WRITE_BEHIND") == "1"
+
+# /movies/top/ ranks by
+# (PRIOR_MEAN * PRIOR_VOTES + sum) / (PRIOR_VOTES + count);
+# run `rebuild_movie_ranking` after changing either
+MOVIE_RANKING_PRIOR_MEAN = 3
+MOVIE_RANKING_PRIOR_VOTES = 10
+
+# similar movies precomputed per movie, and served up to this many at a time
+MOVIE_NEIGHBORS_TOP_K = 20
+NEIGHBORS_MAX_LIMIT = 20
+# weight of sharing an attribute of each kind for /movies/id/similar/,
+# scaled down for attributes of many movies; run `build_content_neighbors`
+# after changing them
+CONTENT_SIMILARITY_WEIGHTS = {
+    "directors": 3,
+    "actors": 2,
+    "genres": 1,
+}
+# attributes of more movies than this (e.g. a broad genre) count towards
+# similarity but do not make two movies similar on their own
+CONTENT_SIMILARITY_MAX_CANDIDATES = 1000
+# likewise for words of more descriptions than this in
+# /movies/id/more-like-this/
+TEXT_SIMILARITY_MAX_CANDIDATES = 1000
+
+# `train_embeddings` publishes runs here, /movies/for-you/ maps the current
+MOVIE_EMBEDDINGS_DIR = os.getenv(
+    "MOVIE_EMBEDDINGS_DIR", "/vol/web/embeddings"
+)
+FOR_YOU_MAX_LIMIT = 50
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),  # default = 5 min
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),  # default = 1 day
@@ -0,0 +1,161 @@
+import bisect
+import heapq
+import unicodedata
+
+from django.conf import settings
+from django.db.models import Count
+
+from movies.indexes import InProcessIndex
+from movies.models import Actor, Director, Movie
+
+
+KINDS = ("movie", "actor", "director")
+LABELS = {"movie": "title", "actor": "name", "director": "name"}
+
+# results of one and two letter prefixes span a large part of the index,
+# so their top entries are kept once computed
+SHORT_PREFIX_LENGTH = 2
+
+
+def normalize(text):
+    """Lowercase words without accents separated by single spaces"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+    return " ".join(stripped.lower().split())
+
+
+def prefix_end(prefix):
+    """Smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class AutocompleteIndex(InProcessIndex):
+    """Prefix matches over movie titles and people names.
+
+    Names are kept in one sorted list of keys, one per word, so "cru"
+    finds "Tom Cruise". A key is the name from that word on followed by
+    the kind and id of the object; a prefix lookup is a pair of
+    bisections.
+    """
+    generation_key = "movies:autocomplete:generation"
+
+    def __init__(self):
+        super().__init__()
+        self.entries = {}
+        self.keys = []
+        self.top = {}
+
+    @property
+    def max_age(self):
+        return settings.AUTOCOMPLETE_INDEX_MAX_AGE
+
+    def build(self):
+        entries = {}
+
+        movies = Movie.objects.filter(draft=False).values_list(
+            "id", "title", "rating_count"
+        )
+        actors = Actor.objects.annotate(films=Count("film_actor")).values_list(
+            "id", "name", "films"
+        )
+        directors = Director.objects.annotate(
+            films=Count("film_director")
+        ).values_list("id", "name", "films")
+
+        for kind, rows in zip(KINDS, (movies, actors, directors)):
+            for object_id, label, popularity in rows.order_by().iterator():
+                entries[(kind, object_id)] = (label, popularity)
+
+        self.entries = entries
+        self.keys = sorted(
+            key
+            for ref, (label, _) in entries.items()
+            for key in self.index_keys(ref, label)
+        )
+        self.top = {}
+
+    @staticmethod
+    def index_keys(ref, label):
+        kind, object_id = ref
+        words = normalize(label).split()
+
+        return [
+            f"{' '.join(words[position:])}\0{kind}\0{object_id}"
+            for position in range(len(words))
+        ]
+
+    def put(self, ref, label, popularity=None):
+        """Add or replace an entry, keeping its popularity by default"""
+        if popularity is None:
+            popularity = self.entries.get(ref, (None, 0))[1]
+
+        self.remove(ref)
+        self.entries[ref] = (label, popularity)
+
+        for key in self.index_keys(ref, label):
+            bisect.insort(self.keys, key)
+            self.forget_top(key)
+
+    def remove(self, ref):
+        entry = self.entries.pop(ref, None)
+        if entry is None:
+            return
+
+        for key in self.index_keys(ref, entry[0]):
+            position = bisect.bisect_left(self.keys, key)
+            if position < len(self.keys) and self.keys[position] == key:
+                del self.keys[position]
+            self.forget_top(key)
+
+    def forget_top(self, key):
+        for length in range(1, SHORT_PREFIX_LENGTH + 1):
+            self.top.pop(key[:length], None)
+
+    def match(self, prefix, limit):
+        """Most popular entries of every kind whose key starts with prefix"""
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix_end(prefix), lo=start)
+
+        refs = set()
+        for key in self.keys[start:end]:
+            _, kind, object_id = key.split("\0")
+            refs.add((kind, int(object_id)))
+
+        return {
+            kind: heapq.nlargest(
+                limit,
+                (ref for ref in refs if ref[0] == kind),
+                key=lambda ref: (self.entries[ref][1], -ref[1]),
+            )
+            for kind in KINDS
+        }
+
+    def search(self, text, limit):
+        self.ensure_fresh()
+        prefix = normalize(text)
+
+        if not prefix:
+            return {f"{kind}s": [] for kind in KINDS}
+
+        with self.lock:
+            if len(prefix) > SHORT_PREFIX_LENGTH:
+                matches = self.match(prefix, limit)
+            else:
+                if prefix not in self.top:
+                    self.top[prefix] = self.match(
+                        prefix, settings.AUTOCOMPLETE_MAX_LIMIT
+                    )
+                matches = self.top[prefix]
+
+            return {
+                f"{kind}s": [
+                    {"id": ref[1], LABELS[kind]: self.entries[ref][0]}
+                    for ref in refs[:limit]
+                ]
+                for kind, refs in matches.items()
+            }
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,272 @@
+"""Scenarios for ``python manage.py benchmark``.
+
+Every scenario seeds synthetic data inside a transaction that the
+command rolls back, so benchmarks can run against a development
+database without leaving rows behind.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from movies import service
+from movies.genre_index import genre_index
+from movies.models import (
+    Genre,
+    Movie,
+    PendingRating,
+    RatingStar,
+    movie_search_vector,
+)
+
+
+SCENARIOS = {}
+
+SYLLABLES = (
+    "ka", "lo", "mi", "ra", "ten", "vor", "zu", "bel", "dor", "fin",
+    "gal", "hir", "jon", "mar", "nev", "os", "pra", "quin", "sel", "tor",
+)
+
+# pseudo-words drawn with Zipf-like frequencies, like words in real text
+VOCABULARY = tuple(
+    f"{first}{second}{third}"
+    for first in SYLLABLES
+    for second in SYLLABLES
+    for third in SYLLABLES[:10]
+)
+WEIGHTS = tuple(1 / rank for rank in range(1, len(VOCABULARY) + 1))
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+
+    return register
+
+
+def measure(func, repeat):
+    """Wall time of each call in milliseconds"""
+    timings = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return timings
+
+
+def summarize(label, timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    return (
+        f"{label:<32} median {statistics.median(ordered):9.2f} ms"
+        f"   p95 {p95:9.2f} ms"
+    )
+
+
+def words(generator, count):
+    return " ".join(generator.choices(VOCABULARY, WEIGHTS, k=count))
+
+
+def seed_movies(rows, batch_size=10000, seed=0):
+    generator = random.Random(seed)
+
+    for start in range(0, rows, batch_size):
+        Movie.objects.bulk_create(
+            Movie(
+                title=words(generator, generator.randint(1, 4)).title(),
+                tagline=words(generator, 6),
+                description=words(generator, 40),
+                year_of_release=generator.randint(1950, 2023),
+            )
+            for _ in range(min(batch_size, rows - start))
+        )
+
+    Movie.objects.update(search_vector=movie_search_vector())
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Movie._meta.db_table}")
+
+
+def first_page(queryset):
+    """What a list request costs in the database: count and first page"""
+    queryset.count()
+    list(queryset.values_list("id", flat=True)[:5])
+
+
+@scenario("movie_search")
+def movie_search(rows, repeat, stdout):
+    """Title ``icontains`` filter against ranked full-text search"""
+    seed_movies(rows)
+    terms = (
+        VOCABULARY[20],
+        VOCABULARY[400],
+        f"{VOCABULARY[50]} {VOCABULARY[60]}",
+    )
+    movies = Movie.objects.filter(draft=False)
+
+    for term in terms:
+        stdout.write(
+            summarize(
+                f"icontains '{term}'",
+                measure(
+                    lambda: first_page(movies.filter(title__icontains=term)),
+                    repeat,
+                ),
+            )
+        )
+        stdout.write(
+            summarize(
+                f"search '{term}'",
+                measure(
+                    lambda: first_page(service.search_movies(movies, term)),
+                    repeat,
+                ),
+            )
+        )
+
+
+def seed_genres(count, batch_size=10000, seed=0):
+    """Give every movie one to three genres, some far more common"""
+    generator = random.Random(seed)
+    genres = Genre.objects.bulk_create(
+        Genre(name=f"Genre {number}")
+        for number in range(count)
+    )
+    weights = [1 / rank for rank in range(1, count + 1)]
+    through = Movie.genres.through
+    movie_ids = list(Movie.objects.values_list("id", flat=True))
+
+    for start in range(0, len(movie_ids), batch_size):
+        through.objects.bulk_create(
+            through(movie_id=movie_id, genre_id=genre.id)
+            for movie_id in movie_ids[start:start + batch_size]
+            for genre in set(
+                generator.choices(genres, weights, k=generator.randint(1, 3))
+            )
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {through._meta.db_table}")
+
+    return [genre.name for genre in genres]
+
+
+@scenario("genre_filter")
+def genre_filter(rows, repeat, stdout):
+    """ORM joins on genre names against the in-process genre bitmaps"""
+    seed_movies(rows)
+    names = seed_genres(20)
+    movies = Movie.objects.filter(draft=False)
+    cases = (
+        ("any of 2", names[1:3], None, None),
+        ("all of 2", None, names[0:2], None),
+        ("all of 2, 1990-2000", None, names[0:2], slice(1990, 2000)),
+    )
+
+    genre_index.invalidate()
+    build = measure(genre_index.ensure_fresh, 1)
+    stdout.write(summarize("index build", build))
+
+    for label, any_genres, all_genres, released in cases:
+        joined = movies
+
+        if any_genres:
+            joined = joined.filter(genres__name__in=any_genres)
+        for name in all_genres or ():
+            joined = joined.filter(genres__name=name)
+        if released:
+            joined = joined.filter(
+                year_of_release__range=(released.start, released.stop)
+            )
+
+        stdout.write(
+            summarize(
+                f"join {label}",
+                measure(lambda: first_page(joined), repeat),
+            )
+        )
+        stdout.write(
+            summarize(
+                f"bitmap {label}",
+                measure(
+                    lambda: first_page(
+                        movies.filter(
+                            id__in_array=genre_index.select(
+                                any_genres, all_genres, released
+                            )
+                        )
+                    ),
+                    repeat,
+                ),
+            )
+        )
+
+    # the seeded rows are rolled back, so is what the index saw
+    genre_index.invalidate()
+
+
+@scenario("rating_writes")
+def rating_writes(rows, repeat, stdout, burst=200, hot_movies=20):
+    """Synchronous rating writes against queueing them for a flush.
+
+    Every run is a burst of votes by a few hundred users on a handful
+    of movies, like a premiere night.
+    """
+    seed_movies(rows)
+    generator = random.Random(0)
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(
+            email=f"voter{number}@example.com", username=f"voter{number}"
+        )
+        for number in range(burst)
+    )
+    stars = [
+        RatingStar.objects.get_or_create(value=value)[0]
+        for value in range(1, 6)
+    ]
+    movies = list(Movie.objects.order_by("id")[:hot_movies])
+
+    def votes():
+        return [
+            (
+                generator.choice(users),
+                generator.choice(movies),
+                generator.choice(stars),
+            )
+            for _ in range(burst)
+        ]
+
+    synchronous, queued, flushed = [], [], []
+
+    for _ in range(repeat):
+        batch = votes()
+        synchronous += measure(
+            lambda: [service.rate_movie(*vote) for vote in batch], 1
+        )
+
+        batch = votes()
+        queued += measure(
+            lambda: [service.enqueue_rating(*vote) for vote in batch], 1
+        )
+        flushed += measure(
+            lambda: service.flush_pending_ratings(batch_size=burst), 1
+        )
+
+    stdout.write(summarize(f"synchronous {burst} votes", synchronous))
+    stdout.write(summarize(f"queued {burst} votes", queued))
+    stdout.write(summarize(f"flush {burst} queued votes", flushed))
+    stdout.write(
+        summarize(
+            f"queued + flush {burst} votes",
+            [enqueue + flush for enqueue, flush in zip(queued, flushed)],
+        )
+    )
+
+    if PendingRating.objects.exists():
+        stdout.write("Queued ratings were left behind")
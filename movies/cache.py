@@ -0,0 +1,206 @@
+import hashlib
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+from movies.indexes import next_generation
+
+
+MOVIE_DETAIL_KEY = "movies:detail:{}:{}"
+MOVIE_DETAIL_GENERATION_KEY = "movies:detail:{}:generation"
+MOVIE_DETAIL_HITS_KEY = "movies:detail:hits"
+MOVIE_DETAIL_MISSES_KEY = "movies:detail:misses"
+VERSION_KEY = "movies:{}:version"
+MODIFIED_KEY = "movies:{}:modified"
+RESPONSE_KEY = "movies:response:{}:{}"
+
+# scopes of the versions: ratings only move the movies' aggregates, so
+# votes leave responses that render none of them cached
+CATALOG = "catalog"
+RATINGS = "ratings"
+
+
+def increment(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def get_movie_detail_generation(movie_id):
+    """Generation the movie's detail entries are stored under.
+
+    It is read before the movie, so a representation rendered while a
+    write commits lands under a generation the write already retired.
+    """
+    key = MOVIE_DETAIL_GENERATION_KEY.format(movie_id)
+    generation = cache.get(key)
+
+    if generation is None:
+        # evicted, cleared or retired: a value no entry is stored under
+        generation = random.randrange(1 << 32)
+        if not cache.add(
+            key, generation, timeout=settings.MOVIE_DETAIL_CACHE_TIMEOUT
+        ):
+            generation = cache.get(key, generation)
+
+    return generation
+
+
+def get_movie_detail(movie_id, generation, base_uri, variant):
+    """Cached ``(updated_at, data)`` detail representation of the movie
+    or None.
+
+    All variants of a movie (e.g. with truncated reviews) share one
+    entry, so they are retired together. Image urls in the payload are
+    absolute, so an entry rendered for another host counts as a miss.
+    """
+    entry = cache.get(MOVIE_DETAIL_KEY.format(movie_id, generation))
+
+    if (
+        entry is None
+        or entry["base_uri"] != base_uri
+        or variant not in entry["variants"]
+    ):
+        increment(MOVIE_DETAIL_MISSES_KEY)
+        return None
+
+    increment(MOVIE_DETAIL_HITS_KEY)
+    return entry["updated_at"], entry["variants"][variant]
+
+
+def set_movie_detail(movie_id, generation, base_uri, variant, data,
+                     updated_at):
+    key = MOVIE_DETAIL_KEY.format(movie_id, generation)
+    entry = cache.get(key)
+
+    if (
+        entry is None
+        or entry["base_uri"] != base_uri
+        or entry["updated_at"] != updated_at
+    ):
+        entry = {
+            "base_uri": base_uri, "updated_at": updated_at, "variants": {}
+        }
+
+    entry["variants"][variant] = data
+    cache.set(key, entry, timeout=settings.MOVIE_DETAIL_CACHE_TIMEOUT)
+
+
+def invalidate_movie_details(movie_ids):
+    """Retire the entries of the movies by dropping their generations;
+    the entries themselves expire
+    """
+    cache.delete_many(
+        [
+            MOVIE_DETAIL_GENERATION_KEY.format(movie_id)
+            for movie_id in movie_ids
+        ]
+    )
+
+
+def get_movie_detail_stats():
+    hits = cache.get(MOVIE_DETAIL_HITS_KEY, 0)
+    misses = cache.get(MOVIE_DETAIL_MISSES_KEY, 0)
+    requests = hits + misses
+
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / requests, 4) if requests else None,
+    }
+
+
+def get_versions(scopes):
+    """``(versions, modified)`` of the scopes: the counters committed
+    writes to them bump and the POSIX time of the latest bump
+    """
+    state = cache.get_many(
+        [key.format(scope) for scope in scopes
+         for key in (VERSION_KEY, MODIFIED_KEY)]
+    )
+    versions, modified = [], 0
+
+    for scope in scopes:
+        version_key = VERSION_KEY.format(scope)
+        modified_key = MODIFIED_KEY.format(scope)
+
+        if version_key in state and modified_key in state:
+            version, bumped = state[version_key], state[modified_key]
+        else:
+            # evicted or cleared, move on to a version no client holds
+            version, bumped = bump_version(scope)
+
+        versions.append(version)
+        modified = max(modified, bumped)
+
+    return tuple(versions), modified
+
+
+def bump_version(scope):
+    """Retire the scope's cached responses and list validators at once;
+    old keys simply expire
+    """
+    modified = time.time()
+    version = next_generation(VERSION_KEY.format(scope))
+    cache.set(MODIFIED_KEY.format(scope), modified, timeout=None)
+
+    return version, modified
+
+
+def bump_catalog_version():
+    bump_version(CATALOG)
+
+
+def bump_ratings_version():
+    bump_version(RATINGS)
+
+
+def get_response_key(request, scopes):
+    """Key of a rendered read response within the current versions of
+    the scopes it depends on.
+
+    Query parameters are sorted, so reordering them shares an entry.
+    The host and the negotiated media type are part of the key since
+    the rendered bytes depend on both.
+    """
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    source = "|".join(
+        (
+            request.build_absolute_uri(request.path),
+            query,
+            request.accepted_media_type,
+        )
+    )
+
+    versions, _ = get_versions(scopes)
+
+    return RESPONSE_KEY.format(
+        ".".join(map(str, versions)), hashlib.md5(source.encode()).hexdigest()
+    )
+
+
+def get_response(key):
+    return cache.get(key)
+
+
+def set_response(key, response):
+    cache.set(
+        key,
+        {
+            "content": response.content,
+            "content_type": response["Content-Type"],
+            "headers": {
+                header: response[header]
+                for header in ("ETag", "Last-Modified", "Vary")
+                if response.has_header(header)
+            },
+        },
+        timeout=settings.ANONYMOUS_RESPONSE_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,325 @@
+"""Bulk import and export of the catalog.
+
+Every row describes one movie. Its category, genres, directors and
+actors are given by name: on import existing ones are reused, missing
+ones are created. In CSV files several names are separated by ``|``.
+Exported JSON Lines files can be imported again.
+"""
+import csv
+import json
+import zlib
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+
+from movies import cache
+from movies.autocomplete import autocomplete_index
+from movies.collaboration import collaboration_graph
+from movies.genre_index import genre_index
+from movies.models import (
+    Actor,
+    Category,
+    Director,
+    Genre,
+    Movie,
+    MovieNeighbor,
+    movie_search_vector,
+)
+from movies.signals import neighbors_stale
+
+
+MOVIE_FIELDS = (
+    "title",
+    "tagline",
+    "description",
+    "year_of_release",
+    "country",
+    "world_premiere",
+    "budget",
+    "fees_in_the_usa",
+    "fees_in_the_world",
+    "draft",
+)
+RELATIONS = {"genres": Genre, "directors": Director, "actors": Actor}
+FORMATS = ("csv", "jsonl")
+
+
+class CatalogImportError(Exception):
+    pass
+
+
+def read_rows(path, file_format):
+    """Rows of the file one at a time, so memory does not grow with it"""
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+            return
+
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                raise CatalogImportError(f"Line {number}: {error.msg}")
+
+
+def batches(rows, size):
+    rows = iter(rows)
+
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def split_names(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split("|")
+
+    return [name.strip() for name in value if name.strip()]
+
+
+class NameMap:
+    """Ids of a model's rows by name, creating missing rows in bulk"""
+
+    def __init__(self, model):
+        self.model = model
+        self.ids = {}
+
+        for object_id, name in model.objects.values_list(
+            "id", "name"
+        ).order_by("id").iterator():
+            self.ids.setdefault(name, object_id)
+
+    def create_missing(self, names):
+        missing = sorted(set(names) - set(self.ids))
+        created = self.model.objects.bulk_create(
+            self.model(name=name) for name in missing
+        )
+        self.ids.update((instance.name, instance.id) for instance in created)
+
+
+def build_movie(row):
+    if not isinstance(row, dict):
+        raise ValidationError("a row must be an object")
+
+    for name in ("category", *RELATIONS):
+        value = row.get(name)
+        if not (
+            value is None
+            or isinstance(value, str)
+            or name in RELATIONS
+            and isinstance(value, list)
+            and all(isinstance(item, str) for item in value)
+        ):
+            raise ValidationError(f"{name} must be given by name")
+
+    movie = Movie()
+
+    for name in MOVIE_FIELDS:
+        value = row.get(name)
+        if value in (None, ""):
+            continue
+
+        field = Movie._meta.get_field(name)
+        setattr(movie, name, field.to_python(value))
+
+    if not movie.title:
+        raise ValidationError("title is required")
+
+    return movie
+
+
+def import_batch(rows, first_row, relations, categories):
+    """Write one batch with a statement per table"""
+    movies = []
+    for number, row in enumerate(rows, start=first_row):
+        try:
+            movies.append(build_movie(row))
+        except ValidationError as error:
+            raise CatalogImportError(
+                f"Row {number}: {'; '.join(error.messages)}"
+            )
+
+    categories.create_missing(
+        row["category"] for row in rows if row.get("category")
+    )
+    for movie, row in zip(movies, rows):
+        movie.category_id = categories.ids.get(row.get("category"))
+
+    names = {
+        field: [split_names(row.get(field)) for row in rows]
+        for field in RELATIONS
+    }
+    for field, name_map in relations.items():
+        name_map.create_missing(
+            name for row_names in names[field] for name in row_names
+        )
+
+    Movie.objects.bulk_create(movies)
+    Movie.objects.filter(
+        id__in=[movie.id for movie in movies]
+    ).update(search_vector=movie_search_vector())
+
+    for field, name_map in relations.items():
+        # the same name twice in a row links once
+        links = [
+            (movie.id, object_id)
+            for movie, row_names in zip(movies, names[field])
+            for object_id in {name_map.ids[name] for name in row_names}
+        ]
+        insert_links(
+            getattr(Movie, field).through,
+            RELATIONS[field]._meta.model_name,
+            links,
+        )
+
+    # the lists of the new movies, and those they enter, for
+    # refresh_neighbors
+    movie_ids = [movie.id for movie in movies]
+    neighbors_stale(MovieNeighbor.CONTENT, movie_ids)
+    neighbors_stale(MovieNeighbor.TEXT, movie_ids)
+
+
+def insert_links(through, target, links):
+    """Rows of an m2m table in one statement with two array parameters.
+
+    Model instances for the link rows would cost more than the insert.
+    """
+    if not links:
+        return
+
+    quote_name = connection.ops.quote_name
+    movie_column = quote_name(through._meta.get_field("movie").column)
+    target_column = quote_name(through._meta.get_field(target).column)
+    movie_ids, target_ids = zip(*links)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote_name(through._meta.db_table)} "
+            f"({movie_column}, {target_column}) "
+            f"SELECT * FROM unnest(%s::bigint[], %s::bigint[])",
+            [list(movie_ids), list(target_ids)],
+        )
+
+
+def import_catalog(rows, batch_size=1000, skip=0, on_batch=None):
+    """Import ``rows`` after the first ``skip`` in batches of
+    ``batch_size``, each in its own transaction.
+
+    ``on_batch`` is called with the number of rows done after every
+    committed batch. Returns the number of rows done. A batch the
+    database rejects raises CatalogImportError naming its rows.
+    """
+    relations = {field: NameMap(model) for field, model in RELATIONS.items()}
+    categories = NameMap(Category)
+    done = skip
+
+    try:
+        for batch in batches(islice(rows, skip, None), batch_size):
+            try:
+                with transaction.atomic():
+                    import_batch(batch, done + 1, relations, categories)
+            except DatabaseError as error:
+                raise CatalogImportError(
+                    f"Rows {done + 1}-{done + len(batch)}: "
+                    f"{str(error).strip()}"
+                ) from error
+            done += len(batch)
+
+            # bulk writes send no signals
+            cache.bump_catalog_version()
+            if on_batch is not None:
+                on_batch(done)
+    finally:
+        if done > skip:
+            genre_index.reset()
+            autocomplete_index.reset()
+            collaboration_graph.reset()
+
+    return done
+
+
+def export_movies(chunk_size=2000):
+    """Every movie as a dict, read through a server-side cursor.
+
+    Names of related rows are fetched per chunk of ``chunk_size``
+    movies as plain values, which costs a fraction of model prefetching
+    and keeps memory flat however large the catalog is. Outside of a
+    transaction the export runs in one repeatable-read transaction, so
+    all chunks see the same snapshot.
+    """
+    movies = Movie.objects.order_by("id").values(
+        "id",
+        *MOVIE_FIELDS,
+        "category__name",
+        "rating_count",
+        "average_rating",
+        "rating_histogram",
+        "updated_at",
+    )
+    outermost = not connection.in_atomic_block
+
+    with transaction.atomic():
+        if outermost:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"
+                )
+
+        for chunk in batches(movies.iterator(chunk_size), chunk_size):
+            movie_ids = [movie["id"] for movie in chunk]
+            related = {
+                field: related_names(field, movie_ids) for field in RELATIONS
+            }
+
+            for movie in chunk:
+                movie["category"] = movie.pop("category__name")
+                for field in RELATIONS:
+                    movie[field] = related[field].get(movie["id"], [])
+                if movie["average_rating"] is not None:
+                    movie["average_rating"] = float(movie["average_rating"])
+
+                yield movie
+
+
+def related_names(field, movie_ids):
+    """Names linked to each of the movies through the m2m ``field``"""
+    target = RELATIONS[field]._meta.model_name
+    names = {}
+
+    for movie_id, name in (
+        getattr(Movie, field)
+        .through.objects.filter(movie_id__in=movie_ids)
+        .values_list("movie_id", f"{target}__name")
+        .order_by(f"{target}__name")
+    ):
+        names.setdefault(movie_id, []).append(name)
+
+    return names
+
+
+def ndjson_chunks(records, compress=False, lines_per_chunk=500):
+    """JSON Lines of ``records`` as chunks of bytes, gzipped on the fly
+    when ``compress`` is set.
+    """
+    # wbits=31 writes the gzip container rather than raw zlib
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    for batch in batches(records, lines_per_chunk):
+        data = "".join(
+            json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+            for record in batch
+        ).encode()
+
+        if compressor is not None:
+            data = compressor.compress(data)
+        if data:
+            yield data
+
+    if compressor is not None:
+        yield compressor.flush()
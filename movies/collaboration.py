@@ -0,0 +1,242 @@
+"""Degrees of separation between actors and directors.
+
+People are linked by the published movies they worked on. The graph is
+kept as two CSR adjacency arrays, people to their movies and movies to
+their people, rather than people to people, which would hold every
+pair of every cast. A hop from a person goes through one of their
+movies to someone else on it, so a path comes with its chain of movies.
+
+Shortest paths are found by breadth-first search from both ends at
+once, always widening the side with fewer links to read, each level in
+a few vectorized array operations.
+"""
+import numpy as np
+
+from movies.indexes import InProcessIndex
+from movies.models import Movie
+
+
+# kinds of people, in the order their nodes are numbered
+KINDS = ("actor", "director")
+
+
+def compressed(rows, columns, size):
+    """CSR ``indptr`` and ``indices`` of the (row, column) pairs, rows
+    numbered below ``size``
+    """
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+
+    return indptr, columns[order].astype(np.int32)
+
+
+def gather(indptr, indices, rows):
+    """Every (row, index) pair of ``rows`` of a CSR matrix, flattened"""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+
+    return (
+        np.repeat(rows, lengths),
+        indices[np.repeat(starts, lengths) + offsets],
+    )
+
+
+class Search:
+    """One side of a bidirectional breadth-first search.
+
+    Every person found keeps the movie it was reached through and the
+    person on the other end of that movie; every movie is walked once,
+    from the first person reaching it.
+    """
+
+    def __init__(self, graph, source):
+        self.graph = graph
+        self.depth = np.full(graph.people, -1, dtype=np.int32)
+        self.via = np.full(graph.people, -1, dtype=np.int32)
+        self.parent = np.full(graph.people, -1, dtype=np.int32)
+        self.reached_from = np.full(graph.movies, -1, dtype=np.int32)
+        self.depth[source] = 0
+        self.frontier = np.array([source], dtype=np.int32)
+
+    def cost(self):
+        """Number of movie links the next level reads"""
+        indptr = self.graph.person_indptr
+        return int((indptr[self.frontier + 1] - indptr[self.frontier]).sum())
+
+    def expand(self):
+        """Move the frontier one hop on, returning the people found"""
+        graph = self.graph
+        people, movies = gather(
+            graph.person_indptr, graph.person_movies, self.frontier
+        )
+        movies, first = np.unique(movies, return_index=True)
+        people = people[first]
+        fresh = self.reached_from[movies] < 0
+        movies, people = movies[fresh], people[fresh]
+        self.reached_from[movies] = people
+
+        movies, found = gather(graph.movie_indptr, graph.movie_people, movies)
+        found, first = np.unique(found, return_index=True)
+        movies = movies[first]
+        fresh = self.depth[found] < 0
+        found, movies = found[fresh], movies[fresh]
+
+        self.depth[found] = self.depth[self.frontier[0]] + 1
+        self.via[found] = movies
+        self.parent[found] = self.reached_from[movies]
+        self.frontier = found
+
+        return found
+
+    def chain(self, node):
+        """People and movies from ``node`` back to the source"""
+        people, movies = [node], []
+
+        while self.parent[node] >= 0:
+            movies.append(int(self.via[node]))
+            node = int(self.parent[node])
+            people.append(node)
+
+        return people, movies
+
+
+class CollaborationGraph(InProcessIndex):
+    """Actors and directors linked by the published movies they share.
+
+    Nodes number the actors first, then the directors, each in id
+    order; movies are numbered in id order too.
+    """
+    generation_key = "movies:collaboration-graph:generation"
+
+    def __init__(self):
+        super().__init__()
+        self.person_ids = {
+            kind: np.empty(0, dtype=np.int64) for kind in KINDS
+        }
+        self.offsets = dict.fromkeys(KINDS, 0)
+        self.movie_ids = np.empty(0, dtype=np.int64)
+        self.person_indptr = np.zeros(1, dtype=np.int64)
+        self.person_movies = np.empty(0, dtype=np.int32)
+        self.movie_indptr = np.zeros(1, dtype=np.int64)
+        self.movie_people = np.empty(0, dtype=np.int32)
+
+    @property
+    def people(self):
+        return len(self.person_indptr) - 1
+
+    @property
+    def movies(self):
+        return len(self.movie_ids)
+
+    def build(self):
+        movie_ids = np.fromiter(
+            Movie.objects.filter(draft=False)
+            .order_by("id")
+            .values_list("id", flat=True)
+            .iterator(chunk_size=100_000),
+            dtype=np.int64,
+        )
+        person_ids, offsets = {}, {}
+        movie_rows, nodes = [], []
+        people = 0
+
+        for kind in KINDS:
+            field = Movie._meta.get_field(f"{kind}s")
+            pairs = np.array(
+                list(
+                    field.remote_field.through.objects.values_list(
+                        field.m2m_column_name(), field.m2m_reverse_name()
+                    ).iterator(chunk_size=100_000)
+                ),
+                dtype=np.int64,
+            ).reshape(-1, 2)
+
+            rows = np.searchsorted(movie_ids, pairs[:, 0])
+            published = rows < len(movie_ids)
+            published[published] = (
+                movie_ids[rows[published]] == pairs[published, 0]
+            )
+            ids, columns = np.unique(
+                pairs[published, 1], return_inverse=True
+            )
+
+            person_ids[kind], offsets[kind] = ids, people
+            movie_rows.append(rows[published])
+            nodes.append(columns + people)
+            people += len(ids)
+
+        movie_rows = np.concatenate(movie_rows)
+        nodes = np.concatenate(nodes)
+
+        self.person_indptr, self.person_movies = compressed(
+            nodes, movie_rows, people
+        )
+        self.movie_indptr, self.movie_people = compressed(
+            movie_rows, nodes, len(movie_ids)
+        )
+        self.person_ids = person_ids
+        self.offsets = offsets
+        self.movie_ids = movie_ids
+
+    def node(self, kind, person_id):
+        ids = self.person_ids[kind]
+        index = np.searchsorted(ids, person_id)
+
+        if index == len(ids) or ids[index] != person_id:
+            return None
+
+        return self.offsets[kind] + int(index)
+
+    def person(self, node):
+        for kind in reversed(KINDS):
+            index = node - self.offsets[kind]
+            if index >= 0:
+                return kind, int(self.person_ids[kind][index])
+
+    def path(self, source, target):
+        """People and movie ids of a shortest chain between the
+        ``source`` and ``target`` people, each given as (kind, id);
+        None when they share no chain of published movies.
+        """
+        self.ensure_fresh()
+
+        with self.lock:
+            start, goal = self.node(*source), self.node(*target)
+
+            if start is None or goal is None:
+                return None
+
+            if start == goal:
+                return [source], []
+
+            forward, backward = Search(self, start), Search(self, goal)
+
+            while len(forward.frontier) and len(backward.frontier):
+                side, other = (
+                    (forward, backward)
+                    if forward.cost() <= backward.cost()
+                    else (backward, forward)
+                )
+                found = side.expand()
+                met = found[other.depth[found] >= 0]
+
+                if len(met):
+                    meet = int(met[np.argmin(other.depth[met])])
+                    head, head_movies = forward.chain(meet)
+                    tail, tail_movies = backward.chain(meet)
+                    return (
+                        [self.person(node) for node in head[::-1] + tail[1:]],
+                        [
+                            int(self.movie_ids[row])
+                            for row in head_movies[::-1] + tail_movies
+                        ],
+                    )
+
+        return None
+
+
+collaboration_graph = CollaborationGraph()
@@ -0,0 +1,250 @@
+"""Personal recommendations from user and movie embeddings.
+
+``train_embeddings`` factorizes the ratings, centered on their global
+mean, into user and movie vectors by alternating least squares: with
+one side fixed, every vector of the other side is a small regularized
+least squares problem over the ratings it took part in, solved for
+many vectors at once. A user's predicted liking of a movie is then the
+dot product of their vectors.
+
+Each run is written as .npy files to a new directory under
+MOVIE_EMBEDDINGS_DIR and published by repointing the ``current``
+symlink. Web workers map the files read-only, so they share the same
+pages of the page cache instead of each loading a copy, and pick up a
+new run on the next request after the switch. The run published before
+is kept for workers that resolved the link just before it moved.
+"""
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+
+from movies.neighbors import read_ratings
+
+
+# cells of the zero-padded rating blocks a solve step holds at once
+SOLVE_CHUNK_CELLS = 2_000_000
+
+
+def solve_factors(ratings, fixed, regularization):
+    """Least squares vectors of the rows of CSR ``ratings`` given the
+    vectors ``fixed`` of its columns.
+
+    Rows are taken in chunks, their rated vectors zero-padded to the
+    longest row of the chunk, so that the normal equations of a chunk
+    come out of one batched matrix product. The penalty grows with the
+    number of ratings of the row (ALS-WR).
+    """
+    size, factors = ratings.shape[0], fixed.shape[1]
+    counts = np.diff(ratings.indptr)
+    identity = np.eye(factors, dtype=np.float32)
+    solved = np.empty((size, factors), dtype=np.float32)
+    start = 0
+
+    while start < size:
+        # a chunk has at most one cell per factor and row
+        ahead = counts[start:start + SOLVE_CHUNK_CELLS // factors + 1]
+        cells = (
+            np.maximum.accumulate(np.maximum(ahead, 1))
+            * factors
+            * np.arange(1, len(ahead) + 1)
+        )
+        stop = start + max(
+            1, np.searchsorted(cells, SOLVE_CHUNK_CELLS, side="right")
+        )
+        block = ratings[start:stop]
+        lengths = counts[start:stop]
+        rows = np.repeat(np.arange(stop - start), lengths)
+        positions = np.arange(block.nnz) - np.repeat(
+            block.indptr[:-1], lengths
+        )
+
+        rated = np.zeros(
+            (stop - start, max(lengths.max(), 1), factors), dtype=np.float32
+        )
+        rated[rows, positions] = fixed[block.indices]
+        values = np.zeros(rated.shape[:2], dtype=np.float32)
+        values[rows, positions] = block.data
+
+        covered = rated.transpose(0, 2, 1)
+        gram = covered @ rated
+        gram += regularization * np.maximum(lengths, 1)[:, None, None] * (
+            identity
+        )
+        solved[start:stop] = np.linalg.solve(
+            gram, covered @ values[..., None]
+        )[..., 0]
+        start = stop
+
+    return solved
+
+
+def factorize(ratings, factors=32, iterations=10, regularization=0.05,
+              seed=0):
+    """User and movie vectors whose products approximate CSR ``ratings``
+    (users x movies) on its stored entries.
+    """
+    rng = np.random.default_rng(seed)
+    by_movie = sparse.csr_matrix(ratings.T)
+    movie_factors = rng.normal(
+        scale=0.1, size=(ratings.shape[1], factors)
+    ).astype(np.float32)
+
+    for _ in range(iterations):
+        user_factors = solve_factors(ratings, movie_factors, regularization)
+        movie_factors = solve_factors(
+            by_movie, user_factors, regularization
+        )
+
+    return user_factors, movie_factors
+
+
+def save_embeddings(user_ids, user_factors, movie_ids, movie_factors):
+    """Write a run to a new directory and make it the current one,
+    dropping the runs before the previous one (workers still mapping
+    them keep their pages).
+
+    Files are written to a ``tmp-`` directory renamed to ``run-`` once
+    complete, so runs another trainer is still writing are left alone.
+    """
+    root = settings.MOVIE_EMBEDDINGS_DIR
+    current = os.path.join(root, "current")
+    os.makedirs(root, exist_ok=True)
+    partial = tempfile.mkdtemp(prefix="tmp-", dir=root)
+
+    for name, array in (
+        ("user_ids", user_ids),
+        ("user_factors", user_factors),
+        ("movie_ids", movie_ids),
+        ("movie_factors", movie_factors),
+    ):
+        np.save(os.path.join(partial, f"{name}.npy"), array)
+
+    run = os.path.join(root, "run-" + os.path.basename(partial)[4:])
+    os.rename(partial, run)
+    previous = os.path.realpath(current)
+    link = run + ".link"
+    os.symlink(os.path.basename(run), link)
+    os.replace(link, current)
+
+    for entry in os.scandir(root):
+        if (
+            entry.name.startswith("run-")
+            and entry.is_dir(follow_symlinks=False)
+            and entry.path not in (run, previous)
+        ):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def train_embeddings(factors=32, iterations=10, regularization=0.05):
+    """Factorize every rating of a published movie and publish the
+    vectors. Returns the number of users and movies embedded.
+    """
+    user_ids, movie_ids, values = read_ratings()
+    users, user_rows = np.unique(user_ids, return_inverse=True)
+    movies, movie_rows = np.unique(movie_ids, return_inverse=True)
+    ratings = sparse.csr_matrix(
+        (values - values.mean(dtype=np.float64), (user_rows, movie_rows)),
+        shape=(len(users), len(movies)),
+        dtype=np.float32,
+    )
+    user_factors, movie_factors = factorize(
+        ratings, factors, iterations, regularization
+    )
+    save_embeddings(users, user_factors, movies, movie_factors)
+
+    return len(users), len(movies)
+
+
+class EmbeddingStore:
+    """The current run's vectors, memory-mapped on first use and
+    remapped once the ``current`` symlink points elsewhere.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.run = None
+        self.arrays = None
+
+    def load(self, attempts=2):
+        for _ in range(attempts):
+            try:
+                run = os.path.realpath(
+                    os.path.join(settings.MOVIE_EMBEDDINGS_DIR, "current"),
+                    strict=True,
+                )
+            except OSError:
+                return None
+
+            if run == self.run:
+                return self.arrays
+
+            with self.lock:
+                if run == self.run:
+                    return self.arrays
+
+                try:
+                    arrays = tuple(
+                        np.load(
+                            os.path.join(run, f"{name}.npy"), mmap_mode="r"
+                        )
+                        for name in (
+                            "user_ids",
+                            "user_factors",
+                            "movie_ids",
+                            "movie_factors",
+                        )
+                    )
+                except OSError:
+                    # dropped by trainers publishing twice since the
+                    # link was read; read it again
+                    continue
+
+                self.arrays, self.run = arrays, run
+                return arrays
+
+        # keep serving the run mapped before
+        return self.arrays
+
+    def recommend(self, user_id, rated_ids, count):
+        """Ids and predicted scores of the ``count`` embedded movies the
+        user would like best, best first, leaving out ``rated_ids``.
+
+        Nothing for users who had no ratings when the run was trained.
+        """
+        arrays = self.load()
+        nothing = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if arrays is None or count <= 0:
+            return nothing
+
+        user_ids, user_factors, movie_ids, movie_factors = arrays
+        row = np.searchsorted(user_ids, user_id)
+
+        if row == len(user_ids) or user_ids[row] != user_id:
+            return nothing
+
+        # the one matrix-vector product of a request, over mapped pages
+        scores = movie_factors @ user_factors[row]
+        rated_ids = np.asarray(rated_ids, dtype=np.int64)
+        rated = np.searchsorted(movie_ids, rated_ids)
+        found = rated < len(movie_ids)
+        rated = rated[found][movie_ids[rated[found]] == rated_ids[found]]
+        scores[rated] = -np.inf
+
+        count = min(count, len(scores) - len(rated))
+        if count <= 0:
+            return nothing
+
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        return np.asarray(movie_ids[best]), scores[best]
+
+
+embedding_store = EmbeddingStore()
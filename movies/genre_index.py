@@ -0,0 +1,173 @@
+from movies.indexes import InProcessIndex
+from movies.models import Genre, Movie
+
+
+def bitmap_from_ids(ids):
+    """Integer with the bits of ``ids`` set, built in linear time"""
+    # sized from the ids themselves: a movie added while the index is
+    # read may be past any maximum taken before
+    buffer = bytearray(max(ids, default=0) // 8 + 1)
+
+    for object_id in ids:
+        buffer[object_id >> 3] |= 1 << (object_id & 7)
+
+    return int.from_bytes(buffer, "little")
+
+
+def ids_from_bitmap(bitmap):
+    """Positions of the set bits in ascending order"""
+    bits = bin(bitmap)[:1:-1]
+    ids = []
+    position = bits.find("1")
+
+    while position != -1:
+        ids.append(position)
+        position = bits.find("1", position + 1)
+
+    return ids
+
+
+class GenreIndex(InProcessIndex):
+    """Movie ids per genre and per year of release as bitmaps.
+
+    Bit ``n`` of a bitmap stands for the movie with id ``n``, so genre
+    and year filters become ``|`` and ``&`` over a few integers, and
+    movies matching several genres come out once.
+    """
+    generation_key = "movies:genre-index:generation"
+
+    def __init__(self):
+        super().__init__()
+        self.genre_ids = {}
+        self.genres = {}
+        self.years = {}
+        self.published = 0
+
+    def build(self):
+        members = {}
+        years = {}
+        published = []
+
+        for genre_id, movie_id in Movie.genres.through.objects.values_list(
+            "genre_id", "movie_id"
+        ).iterator():
+            members.setdefault(genre_id, []).append(movie_id)
+
+        for movie_id, year, draft in Movie.objects.values_list(
+            "id", "year_of_release", "draft"
+        ).order_by().iterator():
+            years.setdefault(year, []).append(movie_id)
+            if not draft:
+                published.append(movie_id)
+
+        self.genre_ids = dict(
+            Genre.objects.values_list("name", "id").order_by()
+        )
+        self.genres = {
+            genre_id: bitmap_from_ids(members.get(genre_id, ()))
+            for genre_id in self.genre_ids.values()
+        }
+        self.years = {
+            year: bitmap_from_ids(ids) for year, ids in years.items()
+        }
+        self.published = bitmap_from_ids(published)
+
+    def put_movie(self, movie_id, year, draft):
+        bit = 1 << movie_id
+
+        for key, bitmap in self.years.items():
+            if bitmap & bit:
+                self.years[key] = bitmap & ~bit
+
+        self.years[year] = self.years.get(year, 0) | bit
+
+        if draft:
+            self.published &= ~bit
+        else:
+            self.published |= bit
+
+    def remove_movie(self, movie_id):
+        bit = 1 << movie_id
+
+        for bitmaps in (self.genres, self.years):
+            for key, bitmap in bitmaps.items():
+                if bitmap & bit:
+                    bitmaps[key] = bitmap & ~bit
+
+        self.published &= ~bit
+
+    def put_genre(self, genre_id, name):
+        self.remove_genre(genre_id)
+        self.genre_ids[name] = genre_id
+        self.genres[genre_id] = self.genres.get(genre_id, 0)
+
+    def remove_genre(self, genre_id, members=False):
+        self.genre_ids = {
+            key: value
+            for key, value in self.genre_ids.items()
+            if value != genre_id
+        }
+        if members:
+            self.genres.pop(genre_id, None)
+
+    def link(self, genre_ids, movie_ids, linked):
+        """Add or drop genre membership of movies, ``None`` meaning all"""
+        if genre_ids is None:
+            genre_ids = list(self.genres)
+
+        if movie_ids is None:
+            bits = -1
+        else:
+            bits = 0
+            for movie_id in movie_ids:
+                bits |= 1 << movie_id
+
+        for genre_id in genre_ids:
+            bitmap = self.genres.get(genre_id, 0)
+            self.genres[genre_id] = (bitmap | bits) if linked else (
+                bitmap & ~bits
+            )
+
+    def genres_of(self, names):
+        return [
+            self.genres[self.genre_ids[name]]
+            for name in names
+            if name in self.genre_ids
+        ]
+
+    def select(self, any_genres=None, all_genres=None, years=None):
+        """Ids of published movies in any of ``any_genres``, all of
+        ``all_genres`` and released within the ``years`` slice.
+        """
+        self.ensure_fresh()
+
+        with self.lock:
+            selected = self.published
+
+            if any_genres:
+                matched = 0
+                for bitmap in self.genres_of(any_genres):
+                    matched |= bitmap
+                selected &= matched
+
+            if all_genres:
+                if any(name not in self.genre_ids for name in all_genres):
+                    return []
+                for bitmap in self.genres_of(all_genres):
+                    selected &= bitmap
+
+            if years is not None and (
+                years.start is not None or years.stop is not None
+            ):
+                released = 0
+                for year, bitmap in self.years.items():
+                    if (years.start is None or year >= years.start) and (
+                        years.stop is None or year <= years.stop
+                    ):
+                        released |= bitmap
+                selected &= released
+
+        return ids_from_bitmap(selected)
+
+
+genre_index = GenreIndex()
@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+
+def next_generation(key):
+    """Bump a generation counter in the shared cache.
+
+    A missing counter (evicted or cleared) restarts from a random value
+    rather than zero, so a copy built before is not mistaken for one of
+    the restarted generations.
+    """
+    cache.add(key, random.randrange(1 << 32), timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # evicted between add() and incr()
+        generation = random.randrange(1 << 32)
+        cache.set(key, generation, timeout=None)
+        return generation
+
+
+class InProcessIndex:
+    """Read-mostly structure built from the database and kept in memory.
+
+    Every worker process holds its own copy. Committed writes in this
+    process patch the copy in place; a generation counter in the shared
+    cache makes other processes rebuild theirs on next use, and
+    ``max_age`` bounds how stale derived values (e.g. popularity) get.
+
+    With INDEX_BACKGROUND_REBUILD a stale copy keeps answering while a
+    thread builds the next one aside and swaps it in; only a process
+    without any copy builds on the request path.
+    """
+    generation_key = None
+    max_age = None
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.generation = None
+        self.built_at = None
+        self.rebuilding = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def ensure_fresh(self):
+        generation = cache.get(self.generation_key, 0)
+
+        if generation == self.generation and not self.expired():
+            return
+
+        if settings.INDEX_BACKGROUND_REBUILD and self.generation is not None:
+            self.rebuild_in_background(generation)
+            return
+
+        with self.lock:
+            if generation != self.generation or self.expired():
+                self.build()
+                self.generation = generation
+                self.built_at = time.monotonic()
+
+    def rebuild_in_background(self, generation):
+        with self.lock:
+            if self.rebuilding is not None and self.rebuilding.is_alive():
+                return
+
+            self.rebuilding = threading.Thread(
+                target=self.rebuild, args=(generation,), daemon=True
+            )
+            self.rebuilding.start()
+
+    def rebuild(self, generation):
+        """Build a new copy aside, then swap its data in at once"""
+        try:
+            copy = type(self)()
+            copy.build()
+        finally:
+            # the thread's own connection
+            connection.close()
+
+        with self.lock:
+            for name, value in vars(copy).items():
+                if name not in ("lock", "generation", "built_at",
+                                "rebuilding"):
+                    setattr(self, name, value)
+
+            self.generation = generation
+            self.built_at = time.monotonic()
+
+    def expired(self):
+        return (
+            self.max_age is not None
+            and self.built_at is not None
+            and time.monotonic() - self.built_at > self.max_age
+        )
+
+    def changed(self, update):
+        """Record a committed write, applying ``update`` in place.
+
+        When another process wrote in between, the local copy is left
+        stale and gets rebuilt by the next ``ensure_fresh``.
+        """
+        generation = next_generation(self.generation_key)
+
+        with self.lock:
+            if (
+                self.generation is not None
+                and generation == self.generation + 1
+            ):
+                update()
+                self.generation = generation
+
+    def invalidate(self):
+        with self.lock:
+            self.generation = None
+
+    def reset(self):
+        """Make every process rebuild, e.g. after writes without signals;
+        this one too, as its copy falls behind the bumped generation
+        """
+        next_generation(self.generation_key)
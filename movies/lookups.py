@@ -0,0 +1,25 @@
+from django.db import models
+from django.db.models import Lookup
+
+
+@models.ForeignKey.register_lookup
+@models.IntegerField.register_lookup
+class InArray(Lookup):
+    """``field = ANY(array)`` with the ids sent as one array literal.
+
+    ``__in`` adds a parameter per id, which gets slow to compile, send
+    and plan for lists of tens of thousands of ids.
+    """
+    lookup_name = "in_array"
+
+    def get_prep_lookup(self):
+        return "{%s}" % ",".join(str(int(value)) for value in self.rhs)
+
+    def get_db_prep_lookup(self, value, connection):
+        return "%s", [value]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+
+        return f"{lhs} = ANY({rhs}::bigint[])", (*lhs_params, *rhs_params)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    """Django command to time a scenario on synthetic data"""
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=sorted(SCENARIOS))
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=100000,
+            help="Number of synthetic rows to seed",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Number of timed runs of every measured query",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Running {options['scenario']} on {options['rows']} rows..."
+        )
+
+        with transaction.atomic():
+            SCENARIOS[options["scenario"]](
+                rows=options["rows"],
+                repeat=options["repeat"],
+                stdout=self.stdout,
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished"))
@@ -0,0 +1,35 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from movies.neighbors import build_audience_neighbors
+
+
+class Command(BaseCommand):
+    """Django command to recompute "people who rated this also liked"
+    neighbors from the ratings
+    """
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            help="Number of neighbors kept per movie "
+            "(MOVIE_NEIGHBORS_TOP_K by default)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of processes scoring batches of movies",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Building audience neighbors...")
+
+        movies = build_audience_neighbors(
+            top_k=options["top_k"], workers=options["workers"]
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Stored neighbors of {movies} movies")
+        )
@@ -0,0 +1,27 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from movies.neighbors import build_text_neighbors
+
+
+class Command(BaseCommand):
+    """Django command to recompute the similar movies by the words of
+    their descriptions
+    """
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of processes scoring batches of movies",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Building text neighbors...")
+
+        movies = build_text_neighbors(workers=options["workers"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Stored neighbors of {movies} movies")
+        )
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from movies.catalog import export_movies, ndjson_chunks
+
+
+class Command(BaseCommand):
+    """Django command to write every movie to a JSON Lines file"""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default="-",
+            help="Output file, standard output by default",
+        )
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Compress the output with gzip",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of movies fetched per round trip",
+        )
+
+    def handle(self, *args, **options):
+        chunks = ndjson_chunks(
+            export_movies(chunk_size=options["chunk_size"]),
+            compress=options["gzip"],
+        )
+
+        if options["path"] == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            return
+
+        with open(options["path"], "wb") as file:
+            for chunk in chunks:
+                file.write(chunk)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Catalog exported to {options['path']}")
+        )
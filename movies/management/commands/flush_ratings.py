@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.service import flush_pending_ratings
+
+
+class Command(BaseCommand):
+    """Django command to apply ratings queued in write-behind mode"""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of queued ratings applied per transaction",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep running, checking an empty queue every this many "
+            "seconds (by default exit once the queue is empty)",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+
+        while True:
+            flushed = flush_pending_ratings(
+                batch_size=options["batch_size"]
+            )
+
+            if flushed is None:
+                self.stdout.write(
+                    self.style.WARNING("Another flush is running")
+                )
+            elif flushed:
+                total += flushed
+                self.stdout.write(f"Applied {flushed} queued ratings")
+                continue
+
+            if not options["interval"]:
+                break
+
+            time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Flushed {total} queued ratings")
+        )
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.catalog import (
+    FORMATS,
+    CatalogImportError,
+    import_catalog,
+    read_rows,
+)
+
+
+class Command(BaseCommand):
+    """Django command to load movies from a CSV or JSON Lines file"""
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, guessed from the extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of movies written per transaction",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "File recording the rows already imported, "
+                "<path>.checkpoint by default"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or os.path.splitext(path)[1][1:]
+        checkpoint = options["checkpoint"] or f"{path}.checkpoint"
+
+        if file_format not in FORMATS:
+            raise CommandError(
+                f"Unknown format '{file_format}', use --format"
+            )
+
+        skip = read_checkpoint(checkpoint)
+        if skip:
+            self.stdout.write(f"Resuming after row {skip}...")
+        else:
+            self.stdout.write(f"Importing {path}...")
+
+        started = time.perf_counter()
+
+        def report(done):
+            write_checkpoint(checkpoint, done)
+            rate = (done - skip) / (time.perf_counter() - started)
+            self.stdout.write(f"{done} rows imported ({rate:.0f} rows/s)")
+
+        try:
+            done = import_catalog(
+                read_rows(path, file_format),
+                batch_size=options["batch_size"],
+                skip=skip,
+                on_batch=report,
+            )
+        except (CatalogImportError, ValueError) as error:
+            raise CommandError(
+                f"{error}. Fix the file and run the command again "
+                f"to resume from {checkpoint}"
+            )
+
+        elapsed = time.perf_counter() - started
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {done - skip} rows in {elapsed:.1f} s "
+                f"({(done - skip) / elapsed:.0f} rows/s)"
+            )
+        )
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return 0
+
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)["rows"]
+
+
+def write_checkpoint(path, rows):
+    # written aside and renamed, so a crash never leaves half a file
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump({"rows": rows}, file)
+
+    os.replace(f"{path}.tmp", path)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies import cache
+from movies.models import MovieRanking
+from movies.ranking import refresh_movie_ranking
+
+
+class Command(BaseCommand):
+    """Django command to recompute the top movies ranking"""
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding movie ranking...")
+
+        with transaction.atomic():
+            refresh_movie_ranking()
+        cache.bump_ratings_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ranked {MovieRanking.objects.count()} movies"
+            )
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from movies.service import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    """Django command to recompute stored rating aggregates of movies"""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of movies updated per statement",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding rating aggregates...")
+
+        updated = rebuild_rating_aggregates(
+            batch_size=options["batch_size"]
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Corrected aggregates of {updated} movies")
+        )
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.neighbors import refresh_pending_neighbors
+
+
+class Command(BaseCommand):
+    """Django command to recompute the similar movies of movies queued
+    after their actors, directors, genres or description changed
+    """
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of queued movies refreshed per transaction",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep running, checking an empty queue every this many "
+            "seconds (by default exit once the queue is empty)",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+
+        while True:
+            refreshed = refresh_pending_neighbors(
+                batch_size=options["batch_size"]
+            )
+
+            if refreshed is None:
+                self.stdout.write(
+                    self.style.WARNING("Another refresh is running")
+                )
+            elif refreshed:
+                total += refreshed
+                self.stdout.write(f"Refreshed {refreshed} queued movies")
+                continue
+
+            if not options["interval"]:
+                break
+
+            time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed {total} queued movies")
+        )
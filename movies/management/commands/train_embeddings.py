@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from movies.embeddings import train_embeddings
+
+
+class Command(BaseCommand):
+    """Django command to factorize the ratings into the user and movie
+    embeddings behind /movies/for-you/
+    """
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--factors",
+            type=int,
+            default=32,
+            help="Length of the user and movie vectors",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=10,
+            help="Number of alternating least squares rounds",
+        )
+        parser.add_argument(
+            "--regularization",
+            type=float,
+            default=0.05,
+            help="Penalty on vector length per rating",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Training embeddings...")
+
+        users, movies = train_embeddings(
+            factors=options["factors"],
+            iterations=options["iterations"],
+            regularization=options["regularization"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Embedded {users} users and {movies} movies")
+        )
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.1 on 2026-10-18 13:10
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    Rating = apps.get_model("movies", "Rating")
+
+    totals = (
+        Rating.objects.values("movie")
+        .annotate(count=Count("id"), total=Sum("star__value"))
+        .order_by()
+    )
+
+    for row in totals.iterator():
+        average = (Decimal(row["total"]) / row["count"]).quantize(
+            Decimal("0.1"), rounding=ROUND_HALF_UP
+        )
+        Movie.objects.filter(id=row["movie"]).update(
+            rating_count=row["count"],
+            rating_sum=row["total"],
+            average_rating=average,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movies", "0008_alter_actor_image_alter_director_image_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="average_rating",
+            field=models.DecimalField(
+                decimal_places=1, editable=False, max_digits=3, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
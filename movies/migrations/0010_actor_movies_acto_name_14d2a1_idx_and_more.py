@@ -0,0 +1,30 @@
+# Generated by Django 4.2.1 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movies", "0009_movie_average_rating_movie_rating_count_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="actor",
+            index=models.Index(
+                fields=["name", "id"], name="movies_acto_name_14d2a1_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="director",
+            index=models.Index(
+                fields=["name", "id"], name="movies_dire_name_5014ec_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["title", "id"], name="movies_movi_title_5260dc_idx"
+            ),
+        ),
+    ]
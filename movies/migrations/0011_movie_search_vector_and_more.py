@@ -0,0 +1,43 @@
+# Generated by Django 4.2.1 on 2026-10-18 13:18
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def fill_search_vectors(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    config = settings.MOVIE_SEARCH_CONFIG
+
+    Movie.objects.update(
+        search_vector=(
+            SearchVector("title", weight="A", config=config)
+            + SearchVector("tagline", weight="B", config=config)
+            + SearchVector("description", weight="C", config=config)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movies", "0010_actor_movies_acto_name_14d2a1_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="movie",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="movies_movi_search__eaebc6_gin"
+            ),
+        ),
+    ]
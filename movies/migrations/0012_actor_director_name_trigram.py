@@ -0,0 +1,31 @@
+# Generated by Django 4.2.1 on 2026-10-18 13:42
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movies", "0011_movie_search_vector_and_more"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="actor",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"],
+                name="movies_actor_name_trgm",
+                opclasses=("gin_trgm_ops",),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="director",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"],
+                name="movies_director_name_trgm",
+                opclasses=("gin_trgm_ops",),
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.1 on 2026-10-18 15:20
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def remove_duplicate_ratings(apps, schema_editor):
+    """Keep the latest rating of every user for a movie"""
+    Movie = apps.get_model("movies", "Movie")
+    Rating = apps.get_model("movies", "Rating")
+
+    duplicates = (
+        Rating.objects.values("user", "movie")
+        .annotate(count=Count("id"), latest=Max("id"))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    movie_ids = set()
+
+    for row in duplicates.iterator():
+        Rating.objects.filter(user=row["user"], movie=row["movie"]).exclude(
+            id=row["latest"]
+        ).delete()
+        movie_ids.add(row["movie"])
+
+    totals = (
+        Rating.objects.filter(movie__in=movie_ids)
+        .values("movie")
+        .annotate(count=Count("id"), total=Sum("star__value"))
+        .order_by()
+    )
+
+    for row in totals.iterator():
+        average = (Decimal(row["total"]) / row["count"]).quantize(
+            Decimal("0.1"), rounding=ROUND_HALF_UP
+        )
+        Movie.objects.filter(id=row["movie"]).update(
+            rating_count=row["count"],
+            rating_sum=row["total"],
+            average_rating=average,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movies", "0013_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_ratings, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="rating",
+            constraint=models.UniqueConstraint(
+                fields=("user", "movie"), name="unique_user_movie_rating"
+            ),
+        ),
+    ]
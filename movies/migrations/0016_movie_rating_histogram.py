@@ -0,0 +1,41 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_rating_histograms(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    Rating = apps.get_model("movies", "Rating")
+
+    histograms = {}
+    counts = (
+        Rating.objects.values("movie", "star__value")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+
+    for row in counts.iterator():
+        histograms.setdefault(row["movie"], {})[
+            str(row["star__value"])
+        ] = row["count"]
+
+    for movie_id, histogram in histograms.items():
+        Movie.objects.filter(id=movie_id).update(rating_histogram=histogram)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movies", "0015_pendingrating"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="rating_histogram",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.RunPython(
+            fill_rating_histograms, migrations.RunPython.noop
+        ),
+    ]
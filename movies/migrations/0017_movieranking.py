@@ -0,0 +1,73 @@
+# Generated by Django 4.2.1 on 2026-10-18 15:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_movie_ranking(apps, schema_editor):
+    schema_editor.execute(
+        "INSERT INTO movies_movieranking "
+        "(movie_id, score, category_id, year_of_release) "
+        "SELECT id, (%s * %s + rating_sum)::float8 / (%s + rating_count), "
+        "category_id, year_of_release FROM movies_movie "
+        "WHERE NOT draft AND rating_count > 0",
+        [
+            settings.MOVIE_RANKING_PRIOR_MEAN,
+            settings.MOVIE_RANKING_PRIOR_VOTES,
+            settings.MOVIE_RANKING_PRIOR_VOTES,
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0016_movie_rating_histogram"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MovieRanking",
+            fields=[
+                (
+                    "movie",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="ranking",
+                        serialize=False,
+                        to="movies.movie",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("year_of_release", models.PositiveSmallIntegerField()),
+                (
+                    "category",
+                    models.ForeignKey(
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="movies.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-score", "movie"], name="movies_movi_score_ae0cc8_idx"
+                    ),
+                    models.Index(
+                        fields=["category", "-score", "movie"],
+                        name="movies_movi_categor_38327f_idx",
+                    ),
+                    models.Index(
+                        fields=["year_of_release", "-score", "movie"],
+                        name="movies_movi_year_of_4ecca7_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_movie_ranking, migrations.RunPython.noop),
+    ]
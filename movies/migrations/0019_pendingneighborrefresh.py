@@ -0,0 +1,85 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0018_movieneighbor"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="movieneighbor",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("audience", "Rated alike by the same users"),
+                    ("content", "Sharing actors, directors and genres"),
+                ],
+                max_length=16,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="movieneighbor",
+            name="movie",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="movies.movie",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="movieneighbor",
+            name="neighbor",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="movies.movie",
+            ),
+        ),
+        migrations.CreateModel(
+            name="PendingNeighborRefresh",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("audience", "Rated alike by the same users"),
+                            ("content", "Sharing actors, directors and genres"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="movies.movie",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="pendingneighborrefresh",
+            constraint=models.UniqueConstraint(
+                fields=("movie", "kind"), name="unique_movie_kind_neighbor_refresh"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0019_pendingneighborrefresh"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="movieneighbor",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("audience", "Rated alike by the same users"),
+                    ("content", "Sharing actors, directors and genres"),
+                    ("text", "Described alike"),
+                ],
+                max_length=16,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="pendingneighborrefresh",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("audience", "Rated alike by the same users"),
+                    ("content", "Sharing actors, directors and genres"),
+                    ("text", "Described alike"),
+                ],
+                max_length=16,
+            ),
+        ),
+    ]
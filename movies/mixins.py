@@ -0,0 +1,171 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.core.exceptions import ValidationError
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from movies import cache
+
+
+def get_cache_scopes(view):
+    """Version scopes the responses of the view's action depend on"""
+    if view.action in getattr(view, "rating_actions", ()):
+        return cache.CATALOG, cache.RATINGS
+
+    return (cache.CATALOG,)
+
+
+def get_validators(request, last_modified, version=None):
+    """Strong ETag and Last-Modified timestamp of a representation.
+
+    The ETag covers everything the rendered bytes depend on besides the
+    rows: the absolute URL (links include host and query) and the media
+    type picked by content negotiation.
+    """
+    source = "|".join(
+        (
+            request.build_absolute_uri(),
+            request.accepted_media_type,
+            last_modified.isoformat(),
+            str(version),
+        )
+    )
+    etag = f'"{hashlib.md5(source.encode()).hexdigest()}"'
+
+    return etag, int(last_modified.timestamp())
+
+
+class ConditionalGetMixin:
+    """Answer list and retrieve with 304 while the client's copy is
+    current, before any serializer runs.
+
+    Validators come from ``detail_last_modified`` of the object for
+    retrieve and from the versions of ``get_cache_scopes`` for list.
+    Every committed write bumps one, so additions, changes and deletions
+    all change the ETag, and reading them costs no query over the
+    filtered set.
+    """
+    detail_last_modified = Max("updated_at")
+
+    def get_list_state(self):
+        version, modified = cache.get_versions(get_cache_scopes(self))
+
+        return datetime.fromtimestamp(modified, timezone.utc), version
+
+    def get_detail_last_modified(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+
+        try:
+            return queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).aggregate(last_modified=self.detail_last_modified)[
+                "last_modified"
+            ]
+        except (TypeError, ValueError, ValidationError):
+            # get_object() turns the same errors into 404
+            return None
+
+    def conditional_response(self, request, last_modified, render,
+                             version=None):
+        """304 when the request's validators match, ``render()`` else"""
+        if last_modified is None:
+            return render()
+
+        etag, timestamp = get_validators(request, last_modified, version)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+
+        response = not_modified or render()
+
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(timestamp)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        last_modified, version = self.get_list_state()
+
+        return self.conditional_response(
+            request,
+            last_modified,
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs
+            ),
+            version=version,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request,
+            self.get_detail_last_modified(),
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
+
+class AnonymousResponseCacheMixin:
+    """Serve list and retrieve to anonymous clients from the shared cache.
+
+    Entries are keyed by the versions of ``get_cache_scopes``, which
+    committed writes bump, so nothing is ever deleted one by one.
+    Authentication, permissions and throttling still run on every
+    request.
+    """
+    cached_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if (
+            request.method == "GET"
+            and self.action in self.cached_actions
+            and not request.user.is_authenticated
+        ):
+            # the router bound the action to ``get`` on this instance
+            self.get = self.cache_response(self.get)
+
+    def cache_response(self, handler):
+        def cached_handler(request, *args, **kwargs):
+            key = cache.get_response_key(
+                request, get_cache_scopes(self)
+            )
+            entry = cache.get_response(key)
+
+            if entry is not None:
+                return self.cached_response(request, entry)
+
+            response = handler(request, *args, **kwargs)
+
+            if response.status_code == 200:
+                response.add_post_render_callback(
+                    lambda rendered: cache.set_response(key, rendered)
+                )
+
+            return response
+
+        return cached_handler
+
+    def cached_response(self, request, entry):
+        headers = entry["headers"]
+        not_modified = get_conditional_response(
+            request,
+            etag=headers.get("ETag"),
+            last_modified=parse_http_date_safe(
+                headers.get("Last-Modified", "")
+            ),
+        )
+        response = not_modified or HttpResponse(
+            entry["content"], content_type=entry["content_type"]
+        )
+
+        for header, value in headers.items():
+            response[header] = value
+
+        return response
@@ -2,6 +2,8 @@ import os
 import uuid
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.utils.text import slugify
 
@@ -9,6 +11,8 @@ from django.utils.text import slugify
 class Category(models.Model):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True)
+    # read by the validators of the category's movies
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ("name",)
@@ -31,9 +35,18 @@ class Actor(models.Model):
     age = models.PositiveSmallIntegerField(default=0)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to=actor_image_file_path, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ("name",)
+        indexes = (
+            models.Index(fields=("name", "id")),
+            GinIndex(
+                fields=("name",),
+                name="movies_actor_name_trgm",
+                opclasses=("gin_trgm_ops",),
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -51,9 +64,18 @@ class Director(models.Model):
     age = models.PositiveSmallIntegerField(default=0)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to=director_image_file_path, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ("name",)
+        indexes = (
+            models.Index(fields=("name", "id")),
+            GinIndex(
+                fields=("name",),
+                name="movies_director_name_trgm",
+                opclasses=("gin_trgm_ops",),
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -62,6 +84,8 @@ class Director(models.Model):
 class Genre(models.Model):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True)
+    # read by the validators of the genre's movies
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ("name",)
@@ -70,6 +94,17 @@ class Genre(models.Model):
         return self.name
 
 
+def movie_search_vector():
+    """Weighted document of a movie: title > tagline > description"""
+    config = settings.MOVIE_SEARCH_CONFIG
+
+    return (
+        SearchVector("title", weight="A", config=config)
+        + SearchVector("tagline", weight="B", config=config)
+        + SearchVector("description", weight="C", config=config)
+    )
+
+
 def movie_image_file_path(instance, filename):
     _, extension = os.path.splitext(filename)
     filename = f"{slugify(instance.title)}-{uuid.uuid4()}{extension}"
@@ -110,13 +145,45 @@ class Movie(models.Model):
         related_name="film_category"
     )
     draft = models.BooleanField(default=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.DecimalField(
+        max_digits=3, decimal_places=1, null=True, editable=False
+    )
+    # number of ratings per star value, e.g. {"5": 2, "3": 1}
+    rating_histogram = models.JSONField(default=dict, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # also touched when reviews, ratings or related objects change,
+    # except genre and category edits, which move their own stamps
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    SEARCH_FIELDS = ("title", "tagline", "description")
+    # stored on every movie and moved by each rating write
+    RATING_AGGREGATES = (
+        "rating_count", "rating_sum", "average_rating", "rating_histogram"
+    )
 
     class Meta:
         ordering = ("title",)
+        indexes = (
+            models.Index(fields=("title", "id")),
+            GinIndex(fields=("search_vector",)),
+        )
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or set(update_fields) & set(
+            self.SEARCH_FIELDS
+        ):
+            Movie.objects.filter(pk=self.pk).update(
+                search_vector=movie_search_vector()
+            )
+
     def get_review(self):
         return self.reviews.filter(parent__isnull=True)
 
@@ -170,10 +237,133 @@ class Rating(models.Model):
         Movie, on_delete=models.CASCADE, related_name="film_rating"
     )
 
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "movie"), name="unique_user_movie_rating"
+            ),
+        )
+
     def __str__(self):
         return f"{self.star} - {self.movie}"
 
 
+class MovieRanking(models.Model):
+    """Bayesian score of a published, rated movie, kept current by
+    ``movies.ranking`` for the top movies listing.
+
+    Category and year are copied from the movie so that filtered pages
+    are read off one index in score order.
+    """
+    movie = models.OneToOneField(
+        Movie,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="ranking",
+    )
+    score = models.FloatField()
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="+",
+        db_index=False,
+    )
+    year_of_release = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=("-score", "movie")),
+            models.Index(fields=("category", "-score", "movie")),
+            models.Index(fields=("year_of_release", "-score", "movie")),
+        )
+
+    def __str__(self):
+        return f"{self.movie} ({self.score:.2f})"
+
+
+class MovieNeighbor(models.Model):
+    """One of the movies most similar to a movie by one measure,
+    precomputed offline by ``movies.neighbors``.
+
+    The index serves a movie's neighbors of a kind, best first, off a
+    single range scan. The foreign keys are left unenforced by the
+    database: checking them would lock both movies of each of the
+    millions of rows a rebuild writes, and the rows are derived anyway.
+    """
+    AUDIENCE = "audience"
+    CONTENT = "content"
+    TEXT = "text"
+    KINDS = (
+        (AUDIENCE, "Rated alike by the same users"),
+        (CONTENT, "Sharing actors, directors and genres"),
+        (TEXT, "Described alike"),
+    )
+
+    kind = models.CharField(max_length=16, choices=KINDS)
+    movie = models.ForeignKey(
+        Movie,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,
+        db_constraint=False,
+    )
+    neighbor = models.ForeignKey(
+        Movie,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_constraint=False,
+    )
+    score = models.FloatField()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=("movie", "kind", "-score")),
+        )
+
+    def __str__(self):
+        return f"{self.movie} ~ {self.neighbor} ({self.score:.2f})"
+
+
+class PendingNeighborRefresh(models.Model):
+    """Movie whose neighbors of a kind went stale, waiting for
+    ``refresh_neighbors`` to recompute them.
+    """
+    kind = models.CharField(max_length=16, choices=MovieNeighbor.KINDS)
+    movie = models.ForeignKey(
+        Movie, on_delete=models.CASCADE, related_name="+", db_index=False
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("movie", "kind"),
+                name="unique_movie_kind_neighbor_refresh",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.movie} ({self.kind}, pending)"
+
+
+class PendingRating(models.Model):
+    """Rating accepted while RATING_WRITE_BEHIND is on, waiting for
+    ``flush_ratings`` to apply it to Rating.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    star = models.ForeignKey(
+        RatingStar, on_delete=models.CASCADE, related_name="+"
+    )
+    movie = models.ForeignKey(
+        Movie, on_delete=models.CASCADE, related_name="+"
+    )
+
+    def __str__(self):
+        return f"{self.star} - {self.movie} (pending)"
+
+
 class Review(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
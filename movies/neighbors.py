@@ -0,0 +1,865 @@
+"""Most similar movies, computed offline into MovieNeighbor.
+
+Movies are rows of a sparse matrix whose columns are whatever makes two
+movies alike for a kind of neighbor. Rows are L2-normalized, so the
+cosine similarity of every pair in a batch of rows is one sparse
+product; only the best ``top_k`` of each row are kept. Batches are
+spread over a process pool, each worker holding its own copy of the
+matrix.
+
+Audience neighbors use the ratings: a column per user, mean-centered
+per user so that a movie rated above a user's own average counts for
+it and one rated below counts against it ("people who rated this also
+liked").
+
+Content neighbors use a 0/1 column per actor, director and genre and
+weighted Jaccard similarity instead of cosine. Changing a movie's
+people or genres queues it in PendingNeighborRefresh, and
+``refresh_pending_neighbors`` recomputes the lists it may have entered
+or left rather than all of them.
+
+Text neighbors use the words of the descriptions: the HTML is stripped,
+and each movie becomes a TF-IDF vector over the vocabulary, compared by
+cosine over the words of at most TEXT_SIMILARITY_MAX_CANDIDATES movies.
+Editing a description queues the movie the same way.
+"""
+import html
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count, Min
+from django.utils.html import strip_tags
+
+from movies import cache
+from movies.catalog import batches
+from movies.indexes import next_generation
+from movies.models import (
+    Movie,
+    MovieNeighbor,
+    PendingNeighborRefresh,
+    Rating,
+)
+from movies.rating_stars import rating_star_index
+
+
+# key of the advisory lock held while queued movies are refreshed
+NEIGHBOR_REFRESH_LOCK = 7_104_262
+
+# cells of the dense similarity block a batch works on, 32 MB of float32
+BATCH_CELLS = 8_000_000
+
+# rows per batch of the sparse measures, which only score candidate pairs
+CANDIDATE_BATCH_ROWS = 5000
+
+# a word of a description: two letters or more, no digits
+WORD = re.compile(r"[^\W\d_]{2,}")
+
+# batch function and matrices of a worker process, handed over once by
+# the pool initializer
+_worker_task = None
+
+
+def normalize_rows(matrix):
+    """CSR ``matrix`` with its rows scaled to unit length, empty rows
+    left empty.
+    """
+    matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)))
+    norms = norms.ravel()
+    scale = np.divide(
+        1, norms, out=np.zeros_like(norms), where=norms > 0
+    )
+
+    return sparse.csr_matrix(sparse.diags(scale) @ matrix)
+
+
+def batch_cosine_neighbors(matrix, transposed, rows, top_k):
+    """Best ``top_k`` neighbors by cosine of ``rows`` of a row-normalized
+    ``matrix``, given its ``transposed`` CSR as well.
+
+    Returns rows, neighbors and scores as flat arrays, best first per
+    row. A row is never its own neighbor and only positive scores are
+    kept.
+    """
+    block = (matrix[rows] @ transposed).toarray()
+    block[np.arange(len(rows)), rows] = 0
+    top_k = min(top_k, block.shape[1])
+
+    if block.shape[1] > top_k:
+        best = np.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+    else:
+        best = np.broadcast_to(np.arange(top_k), (len(rows), top_k))
+
+    scores = np.take_along_axis(block, best, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    best = np.take_along_axis(best, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    kept = scores > 0
+
+    return (
+        np.broadcast_to(rows[:, None], best.shape)[kept],
+        best[kept],
+        scores[kept],
+    )
+
+
+def batch_candidate_neighbors(rare, rare_weighted, common,
+                              common_weighted, sizes, rows, top_k):
+    """Best ``top_k`` neighbors of ``rows``, split into ``rare`` and
+    ``common`` columns, each given with its weighted matrix (transposed
+    for the rare one) as well.
+
+    The score of a pair is its weighted product, over the union of the
+    two ``sizes`` (weighted Jaccard) unless they are None. Only pairs
+    sharing a rare column are scored, so the work follows the number of
+    such pairs instead of the number of movies squared; common columns
+    count towards their scores. Returns the same as
+    ``batch_cosine_neighbors``, ties broken by lower neighbor first.
+    """
+    shared = sparse.csr_matrix(rare[rows] @ rare_weighted)
+    shared.sort_indices()
+    positions = np.repeat(np.arange(len(rows)), np.diff(shared.indptr))
+    pairs = rows[positions]
+    neighbors = shared.indices
+    weight = shared.data + np.asarray(
+        common[pairs].multiply(common_weighted[neighbors]).sum(axis=1),
+        dtype=np.float32,
+    ).ravel()
+    scores = (
+        weight if sizes is None
+        else weight / (sizes[pairs] + sizes[neighbors] - weight)
+    )
+
+    kept = (neighbors != pairs) & (scores > 0)
+    positions, pairs = positions[kept], pairs[kept]
+    neighbors, scores = neighbors[kept], scores[kept]
+    # scores are at most 1: one stable sort on a key per row position
+    # orders each row best first and keeps ties by lower neighbor, far
+    # quicker than a lexsort
+    order = np.argsort(
+        positions * 4.0 - scores.astype(np.float64), kind="stable"
+    )
+    positions, pairs = positions[order], pairs[order]
+    neighbors, scores = neighbors[order], scores[order]
+
+    starts = np.flatnonzero(np.r_[True, positions[1:] != positions[:-1]])
+    lengths = np.diff(np.r_[starts, len(positions)])
+    rank = np.arange(len(positions)) - np.repeat(starts, lengths)
+    kept = rank < top_k
+
+    return pairs[kept], neighbors[kept], scores[kept]
+
+
+def _init_worker(function, matrices):
+    global _worker_task
+    _worker_task = (function, matrices)
+
+
+def _worker_batch_neighbors(rows, top_k):
+    function, matrices = _worker_task
+    return function(*matrices, rows, top_k)
+
+
+def nearest_neighbors(function, matrices, size, batch, top_k, workers=1,
+                      rows=None):
+    """Batch ``function`` over ``rows`` of the ``size`` rows of
+    ``matrices`` (all by default), ``batch`` rows at a time, spread over
+    ``workers`` processes.
+    """
+    if rows is None:
+        rows = np.arange(size)
+
+    chunks = [
+        rows[start:start + batch] for start in range(0, len(rows), batch)
+    ]
+
+    if workers <= 1 or len(chunks) <= 1:
+        results = [function(*matrices, chunk, top_k) for chunk in chunks]
+    else:
+        # forked workers must not share the parent's database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(function, matrices),
+        ) as pool:
+            results = list(
+                pool.map(
+                    _worker_batch_neighbors,
+                    chunks,
+                    [top_k] * len(chunks),
+                )
+            )
+
+    if not results:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+
+    return tuple(np.concatenate(part) for part in zip(*results))
+
+
+def top_k_neighbors(matrix, top_k, workers=1, rows=None):
+    """Neighbors of the rows of ``matrix`` by cosine similarity"""
+    matrix = normalize_rows(matrix)
+    size = matrix.shape[0]
+
+    return nearest_neighbors(
+        batch_cosine_neighbors,
+        (matrix, sparse.csr_matrix(matrix.T)),
+        size,
+        max(1, BATCH_CELLS // max(size, 1)),
+        top_k,
+        workers,
+        rows,
+    )
+
+
+def candidate_neighbors(matrix, weighted, sizes, top_k, workers=1,
+                        rows=None, max_candidates=None):
+    """Neighbors of the rows of ``matrix`` by ``batch_candidate_neighbors``
+
+    Columns set in more than ``max_candidates`` rows still weigh in but
+    do not make two rows neighbors on their own.
+    """
+    matrix = sparse.csc_matrix(matrix, dtype=np.float32)
+    weighted = sparse.csc_matrix(weighted, dtype=np.float32)
+    common = np.diff(matrix.indptr) > (
+        matrix.shape[0] if max_candidates is None else max_candidates
+    )
+
+    return nearest_neighbors(
+        batch_candidate_neighbors,
+        (
+            sparse.csr_matrix(matrix[:, ~common]),
+            sparse.csr_matrix(weighted[:, ~common].T),
+            sparse.csr_matrix(matrix[:, common]),
+            sparse.csr_matrix(weighted[:, common]),
+            sizes,
+        ),
+        matrix.shape[0],
+        CANDIDATE_BATCH_ROWS,
+        top_k,
+        workers,
+        rows,
+    )
+
+
+def jaccard_neighbors(incidence, weights, top_k, workers=1, rows=None,
+                      max_candidates=None):
+    """Neighbors of the rows of a 0/1 ``incidence`` matrix by weighted
+    Jaccard similarity: the weight of the columns two rows share over
+    the weight of the columns either has.
+    """
+    weighted = sparse.csr_matrix(incidence, dtype=np.float32) @ (
+        sparse.diags(weights)
+    )
+
+    return candidate_neighbors(
+        incidence,
+        weighted,
+        np.asarray(weighted.sum(axis=1), dtype=np.float32).ravel(),
+        top_k,
+        workers,
+        rows,
+        max_candidates,
+    )
+
+
+def sparse_cosine_neighbors(matrix, top_k, workers=1, rows=None,
+                            max_candidates=None):
+    """Neighbors of the rows of ``matrix`` by cosine similarity, scoring
+    only pairs that share a column instead of every pair as
+    ``top_k_neighbors`` does.
+
+    Columns set in more than ``max_candidates`` rows are left out of
+    the scores but not of the row lengths, like stop words: nearly
+    every pair shares one, so counting them would mean scoring nearly
+    every pair.
+    """
+    matrix = normalize_rows(matrix)
+
+    if max_candidates is not None:
+        movies_with = np.diff(sparse.csc_matrix(matrix).indptr)
+        matrix = sparse.csr_matrix(matrix[:, movies_with <= max_candidates])
+
+    return candidate_neighbors(matrix, matrix, None, top_k, workers, rows)
+
+
+def store_neighbors(kind, movie_ids, neighbor_ids, scores, replaced=None,
+                    batch_size=10000):
+    """Replace the MovieNeighbor rows of ``kind`` of the ``replaced``
+    movies, every movie's for None, in one transaction.
+
+    Pairs naming a movie deleted since the matrix was read are skipped.
+    """
+    table = MovieNeighbor._meta.db_table
+    movies = Movie._meta.db_table
+    replaced = None if replaced is None else list(replaced)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # a plain DELETE: the ORM would collect every row for signals
+        cursor.execute(
+            f"DELETE FROM {table} WHERE kind = %(kind)s AND "
+            "(%(ids)s::bigint[] IS NULL OR movie_id = ANY(%(ids)s))",
+            {"kind": kind, "ids": replaced},
+        )
+
+        for start in range(0, len(movie_ids), batch_size):
+            stop = start + batch_size
+            cursor.execute(
+                f"INSERT INTO {table} (kind, movie_id, neighbor_id, score) "
+                "SELECT %s, p.movie_id, p.neighbor_id, p.score "
+                "FROM unnest(%s::bigint[], %s::bigint[], %s::float8[]) "
+                "AS p(movie_id, neighbor_id, score) "
+                f"WHERE EXISTS (SELECT 1 FROM {movies} m "
+                "WHERE m.id = p.movie_id) "
+                f"AND EXISTS (SELECT 1 FROM {movies} m "
+                "WHERE m.id = p.neighbor_id)",
+                [
+                    kind,
+                    movie_ids[start:stop].tolist(),
+                    neighbor_ids[start:stop].tolist(),
+                    scores[start:stop].tolist(),
+                ],
+            )
+
+        transaction.on_commit(cache.bump_catalog_version)
+
+
+def read_ratings(chunk_size=100_000):
+    """User ids, movie ids and star values of every rating of a
+    published movie, streamed in chunks of ``chunk_size``.
+    """
+    star_values = rating_star_index.by_id()
+    values = np.zeros(max(star_values, default=0) + 1, dtype=np.float32)
+    values[list(star_values)] = list(star_values.values())
+    rows = Rating.objects.filter(movie__draft=False).values_list(
+        "user_id", "movie_id", "star_id"
+    ).order_by().iterator(chunk_size=chunk_size)
+    ratings = np.concatenate(
+        [np.empty((0, 3), dtype=np.int64)]
+        + [
+            np.array(batch, dtype=np.int64)
+            for batch in batches(rows, chunk_size)
+        ]
+    )
+
+    return ratings[:, 0], ratings[:, 1], values[ratings[:, 2]]
+
+
+def audience_matrix(user_ids, movie_ids, values):
+    """Movie x user matrix of the ratings, centered on each user's mean,
+    with the movie id of every row.
+    """
+    users, user_rows = np.unique(user_ids, return_inverse=True)
+    movies, movie_rows = np.unique(movie_ids, return_inverse=True)
+    ratings = sparse.csr_matrix(
+        (values, (user_rows, movie_rows)),
+        shape=(len(users), len(movies)),
+        dtype=np.float32,
+    )
+    counts = np.diff(ratings.indptr)
+    means = np.asarray(ratings.sum(axis=1)).ravel() / np.maximum(counts, 1)
+    ratings.data -= np.repeat(means, counts).astype(np.float32)
+    ratings.eliminate_zeros()
+
+    return sparse.csr_matrix(ratings.T), movies
+
+
+def build_audience_neighbors(top_k=None, workers=1):
+    """Recompute the audience neighbors of every rated published movie.
+
+    Returns the number of movies that got at least one neighbor.
+    """
+    matrix, movie_ids = audience_matrix(*read_ratings())
+    rows, neighbors, scores = top_k_neighbors(
+        matrix, top_k or settings.MOVIE_NEIGHBORS_TOP_K, workers
+    )
+    store_neighbors(
+        MovieNeighbor.AUDIENCE, movie_ids[rows], movie_ids[neighbors], scores
+    )
+
+    return len(np.unique(rows))
+
+
+def read_links(name, movie_ids=None, chunk_size=10_000):
+    """(movie id, attribute id) pairs of the many-to-many field ``name``,
+    of every movie or of ``movie_ids`` only
+    """
+    field = Movie._meta.get_field(name)
+    links = field.remote_field.through.objects.values_list(
+        field.m2m_column_name(), field.m2m_reverse_name()
+    )
+    querysets = (
+        [links]
+        if movie_ids is None
+        else (
+            links.filter(**{f"{field.m2m_column_name()}__in_array": chunk})
+            for chunk in batches(movie_ids, chunk_size)
+        )
+    )
+
+    return np.array(
+        [
+            pair
+            for queryset in querysets
+            for pair in queryset.iterator(chunk_size=100_000)
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+
+def published_movie_ids():
+    """Ids of the published movies in ascending order"""
+    return np.fromiter(
+        Movie.objects.filter(draft=False)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .iterator(chunk_size=100_000),
+        dtype=np.int64,
+    )
+
+
+def content_matrix():
+    """Movie x attribute incidence of the published movies, a column per
+    actor, director and genre, with the weight of every column and the
+    movie id of every row.
+    """
+    links = {
+        name: read_links(name) for name in settings.CONTENT_SIMILARITY_WEIGHTS
+    }
+
+    return content_incidence(published_movie_ids(), links)
+
+
+def content_incidence(movie_ids, links):
+    """``content_matrix`` of the movies ``movie_ids`` from the links of
+    every field, whose pairs of other movies are left out.
+
+    A column weighs its kind's CONTENT_SIMILARITY_WEIGHTS times how rare
+    the attribute is, so sharing an actor of a few movies counts for
+    more than sharing a genre of thousands.
+    """
+    blocks = [sparse.csr_matrix((len(movie_ids), 0), dtype=np.float32)]
+    weights = [np.empty(0, dtype=np.float32)]
+
+    for name, weight in settings.CONTENT_SIMILARITY_WEIGHTS.items():
+        pairs = links[name]
+        rows = np.searchsorted(movie_ids, pairs[:, 0])
+        published = rows < len(movie_ids)
+        published[published] = (
+            movie_ids[rows[published]] == pairs[published, 0]
+        )
+        attributes, columns = np.unique(
+            pairs[published, 1], return_inverse=True
+        )
+        block = sparse.csr_matrix(
+            (
+                np.ones(len(columns), dtype=np.float32),
+                (rows[published], columns),
+            ),
+            shape=(len(movie_ids), len(attributes)),
+        )
+        movies_with = np.diff(sparse.csc_matrix(block).indptr)
+
+        blocks.append(block)
+        weights.append(
+            (weight * np.log1p(len(movie_ids) / movies_with)).astype(
+                np.float32
+            )
+        )
+
+    return (
+        sparse.hstack(blocks, format="csr"),
+        np.concatenate(weights),
+        movie_ids,
+    )
+
+
+def pop_pending_refreshes(kind=None, limit=None):
+    """Take queued refreshes off the queue, of ``kind`` or any kind, at
+    most ``limit``; returns (kind, movie id) pairs.
+    """
+    table = PendingNeighborRefresh._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id IN ("
+            f"SELECT id FROM {table} "
+            "WHERE %(kind)s::varchar IS NULL OR kind = %(kind)s "
+            "ORDER BY id LIMIT %(limit)s"
+            ") RETURNING kind, movie_id",
+            {"kind": kind, "limit": limit},
+        )
+        return cursor.fetchall()
+
+
+def build_content_neighbors(top_k=None, workers=1):
+    """Recompute the content neighbors of every published movie.
+
+    Returns the number of movies that got at least one neighbor.
+    """
+    # anything queued from here on is refreshed after this build
+    pop_pending_refreshes(MovieNeighbor.CONTENT)
+
+    incidence, weights, movie_ids = content_matrix()
+    rows, neighbors, scores = jaccard_neighbors(
+        incidence,
+        weights,
+        top_k or settings.MOVIE_NEIGHBORS_TOP_K,
+        workers,
+        max_candidates=settings.CONTENT_SIMILARITY_MAX_CANDIDATES,
+    )
+    store_neighbors(
+        MovieNeighbor.CONTENT, movie_ids[rows], movie_ids[neighbors], scores
+    )
+
+    return len(np.unique(rows))
+
+
+class ContentLinks:
+    """Actor, director and genre links of the published movies.
+
+    Like the word counts of DescriptionWords they are kept between
+    calls, so that a long-running ``refresh_neighbors`` only reads again
+    the links of the movies queued for a refresh and of newly published
+    ones, not the whole through tables per refresh. A shared generation
+    moved by every refresh tells when another process took queued
+    movies in between; the links are then read in full.
+    """
+    generation_key = "movies:content-links:generation"
+
+    def __init__(self):
+        self.generation = None
+        # published movie ids at the last update
+        self.movie_ids = np.empty(0, dtype=np.int64)
+        # field name: (movie id, attribute id) pairs
+        self.links = {}
+
+    def update(self, changed_ids=()):
+        """Catch up with the published movies, given the ids of those
+        queued since the last call; returns the published ids
+        """
+        movie_ids = published_movie_ids()
+        generation = next_generation(self.generation_key)
+
+        if (
+            self.generation is None
+            or generation != self.generation + 1
+            or self.links.keys() != settings.CONTENT_SIMILARITY_WEIGHTS.keys()
+        ):
+            self.links = {
+                name: read_links(name)
+                for name in settings.CONTENT_SIMILARITY_WEIGHTS
+            }
+            changed = np.empty(0, dtype=np.int64)
+        else:
+            changed = np.union1d(
+                np.asarray(list(changed_ids), dtype=np.int64),
+                np.setdiff1d(movie_ids, self.movie_ids),
+            )
+            fresh = np.intersect1d(changed, movie_ids).tolist()
+
+            for name, pairs in self.links.items():
+                self.links[name] = np.concatenate(
+                    (
+                        pairs[~np.isin(pairs[:, 0], changed)],
+                        read_links(name, fresh),
+                    )
+                )
+
+        # links of drafted and deleted movies go
+        for name, pairs in self.links.items():
+            self.links[name] = pairs[np.isin(pairs[:, 0], movie_ids)]
+
+        self.generation = generation
+        self.movie_ids = movie_ids
+
+        return movie_ids
+
+    def matrix(self, changed_ids=()):
+        """``content_matrix`` from the kept links"""
+        return content_incidence(self.update(changed_ids), self.links)
+
+
+content_links = ContentLinks()
+
+
+def refresh_neighbor_lists(kind, changed_ids, movie_ids, neighbors_of):
+    """Recompute the neighbors of ``kind`` of the changed movies, and of
+    the movies whose lists they enter or leave; returns how many lists
+    were recomputed.
+
+    ``neighbors_of(top_k, rows)`` scores rows of the current matrix,
+    whose rows are ``movie_ids``. A changed movie enters a list when it
+    now scores above the list's last entry, or the list is short; it
+    may leave any list holding it. Lists left alone keep scores weighed
+    by the column counts of their last computation, which drift slowly;
+    a periodic full build realigns them.
+    """
+    top_k = settings.MOVIE_NEIGHBORS_TOP_K
+    changed_ids = np.unique(np.asarray(list(changed_ids), dtype=np.int64))
+    rows = np.searchsorted(movie_ids, changed_ids)
+    present = rows < len(movie_ids)
+    present[present] = movie_ids[rows[present]] == changed_ids[present]
+
+    # every positive similarity of the changed movies, not just the best
+    _, candidates, scores = neighbors_of(len(movie_ids), rows[present])
+    lists = {
+        row["movie_id"]: (row["size"], row["last"])
+        for row in MovieNeighbor.objects.filter(
+            kind=kind,
+            movie_id__in_array=np.unique(movie_ids[candidates]),
+        )
+        .values("movie_id")
+        .annotate(size=Count("id"), last=Min("score"))
+        .order_by()
+    }
+    stale = set(changed_ids.tolist())
+    stale.update(
+        MovieNeighbor.objects.filter(
+            kind=kind, neighbor_id__in_array=changed_ids
+        ).values_list("movie_id", flat=True)
+    )
+
+    for movie_id, score in zip(movie_ids[candidates].tolist(), scores):
+        size, last = lists.get(movie_id, (0, 0))
+        if size < top_k or score > last:
+            stale.add(movie_id)
+
+    stale = np.array(sorted(stale), dtype=np.int64)
+    rows = np.searchsorted(movie_ids, stale)
+    rows = rows[rows < len(movie_ids)]
+    rows = rows[np.isin(movie_ids[rows], stale)]
+    rows, neighbors, scores = neighbors_of(top_k, rows)
+    store_neighbors(
+        kind,
+        movie_ids[rows],
+        movie_ids[neighbors],
+        scores,
+        replaced=stale.tolist(),
+    )
+
+    return len(stale)
+
+
+def refresh_content_neighbors(changed_ids):
+    """Recompute the content neighbors affected by the movies whose
+    people or genres changed.
+    """
+    incidence, weights, movie_ids = content_links.matrix(changed_ids)
+
+    def neighbors_of(top_k, rows):
+        return jaccard_neighbors(
+            incidence,
+            weights,
+            top_k,
+            rows=rows,
+            max_candidates=settings.CONTENT_SIMILARITY_MAX_CANDIDATES,
+        )
+
+    return refresh_neighbor_lists(
+        MovieNeighbor.CONTENT, changed_ids, movie_ids, neighbors_of
+    )
+
+
+def words(text):
+    """Lowercased words of an HTML ``text``, markup and entities aside"""
+    return WORD.findall(html.unescape(strip_tags(text)).lower())
+
+
+class DescriptionWords:
+    """Word counts of the descriptions of the published movies.
+
+    They are kept between calls, so that a long-running
+    ``refresh_neighbors`` only tokenizes again the descriptions of the
+    movies queued for a refresh and of newly published ones, not all of
+    them per refresh. Like ContentLinks, they are counted in full when
+    another process took queued movies in between.
+    """
+    generation_key = "movies:description-words:generation"
+
+    def __init__(self):
+        self.generation = None
+        self.vocabulary = {}
+        # movie id: (word columns, occurrences)
+        self.movies = {}
+
+    def count(self, description):
+        columns, counts = np.unique(
+            np.array(
+                [
+                    self.vocabulary.setdefault(word, len(self.vocabulary))
+                    for word in words(description)
+                ],
+                dtype=np.int32,
+            ),
+            return_counts=True,
+        )
+
+        return columns, counts.astype(np.float32)
+
+    def update(self, changed_ids=None, chunk_size=10_000):
+        """Catch up with the published movies, given the ids of those
+        queued since the last call, all of them for None; returns the
+        published ids
+        """
+        movie_ids = published_movie_ids()
+        generation = next_generation(self.generation_key)
+
+        if (
+            changed_ids is None
+            or self.generation is None
+            or generation != self.generation + 1
+        ):
+            self.vocabulary, self.movies = {}, {}
+        else:
+            for movie_id in changed_ids:
+                self.movies.pop(movie_id, None)
+
+        published = set(movie_ids.tolist())
+        self.movies = {
+            movie_id: counted
+            for movie_id, counted in self.movies.items()
+            if movie_id in published
+        }
+        stale = [
+            movie_id for movie_id in published if movie_id not in self.movies
+        ]
+
+        for chunk in batches(stale, chunk_size):
+            for movie_id, description in Movie.objects.filter(
+                id__in_array=chunk
+            ).values_list("id", "description"):
+                self.movies[movie_id] = self.count(description)
+
+        self.generation = generation
+
+        return movie_ids
+
+    def matrix(self, changed_ids=None):
+        """Movie x word TF-IDF matrix of the descriptions of the
+        published movies, with the movie id of every row.
+
+        A word counts for the logarithm of its occurrences in the
+        description, times how rare it is across descriptions, so words
+        of every description weigh next to nothing. ``changed_ids`` are
+        passed to ``update``.
+        """
+        movie_ids = self.update(changed_ids)
+        counted = [self.movies[movie_id] for movie_id in movie_ids]
+        matrix = sparse.csr_matrix(
+            (
+                np.concatenate(
+                    [np.empty(0, dtype=np.float32)]
+                    + [counts for _, counts in counted]
+                ),
+                np.concatenate(
+                    [np.empty(0, dtype=np.int32)]
+                    + [columns for columns, _ in counted]
+                ),
+                np.r_[
+                    0,
+                    np.cumsum(
+                        [len(columns) for columns, _ in counted],
+                        dtype=np.int64,
+                    ),
+                ],
+            ),
+            shape=(len(movie_ids), len(self.vocabulary)),
+        )
+        matrix.data = 1 + np.log(matrix.data)
+        movies_with = np.diff(sparse.csc_matrix(matrix).indptr)
+        rarity = np.log((1 + len(movie_ids)) / (1 + movies_with)) + 1
+
+        return (
+            sparse.csr_matrix(
+                matrix @ sparse.diags(rarity.astype(np.float32))
+            ),
+            movie_ids,
+        )
+
+
+description_words = DescriptionWords()
+
+
+def build_text_neighbors(top_k=None, workers=1):
+    """Recompute the text neighbors of every published movie.
+
+    Returns the number of movies that got at least one neighbor.
+    """
+    pop_pending_refreshes(MovieNeighbor.TEXT)
+
+    matrix, movie_ids = description_words.matrix()
+    rows, neighbors, scores = sparse_cosine_neighbors(
+        matrix,
+        top_k or settings.MOVIE_NEIGHBORS_TOP_K,
+        workers,
+        max_candidates=settings.TEXT_SIMILARITY_MAX_CANDIDATES,
+    )
+    store_neighbors(
+        MovieNeighbor.TEXT, movie_ids[rows], movie_ids[neighbors], scores
+    )
+
+    return len(np.unique(rows))
+
+
+def refresh_text_neighbors(changed_ids):
+    """Recompute the text neighbors affected by the movies whose
+    descriptions changed.
+    """
+    matrix, movie_ids = description_words.matrix(changed_ids)
+
+    def neighbors_of(top_k, rows):
+        return sparse_cosine_neighbors(
+            matrix,
+            top_k,
+            rows=rows,
+            max_candidates=settings.TEXT_SIMILARITY_MAX_CANDIDATES,
+        )
+
+    return refresh_neighbor_lists(
+        MovieNeighbor.TEXT, changed_ids, movie_ids, neighbors_of
+    )
+
+
+# how the queued movies of a kind are brought up to date
+REFRESHERS = {
+    MovieNeighbor.CONTENT: refresh_content_neighbors,
+    MovieNeighbor.TEXT: refresh_text_neighbors,
+}
+
+
+def refresh_pending_neighbors(batch_size=1000):
+    """Refresh the oldest queued movies, returning how many were taken,
+    or None while another refresh holds the lock.
+
+    An advisory lock keeps refreshes one at a time, as each reads the
+    lists the others write.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_try_advisory_xact_lock(%s)",
+                [NEIGHBOR_REFRESH_LOCK],
+            )
+            if not cursor.fetchone()[0]:
+                return None
+
+        pending = pop_pending_refreshes(limit=batch_size)
+        changed = {}
+
+        for kind, movie_id in pending:
+            changed.setdefault(kind, set()).add(movie_id)
+
+        for kind, movie_ids in changed.items():
+            REFRESHERS[kind](movie_ids)
+
+    return len(pending)
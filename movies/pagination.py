@@ -1,6 +1,105 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+)
 
 
 class ApiPagination(PageNumberPagination):
     page_size = 5
     max_page_size = 100
+
+
+class ApiCursorPagination(CursorPagination):
+    """Keyset pagination on the view's ``cursor_ordering``"""
+    page_size = 5
+    max_page_size = 100
+    ordering = ("id",)
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, "cursor_ordering", self.ordering)
+
+
+class CatalogPagination(BasePagination):
+    """Page numbers by default, keyset pagination on request.
+
+    Clients opt into cursors with ?pagination=cursor and then follow the
+    returned links, which carry the ?cursor= parameter. Cursor pages
+    skip the COUNT(*) and the OFFSET scan of page numbers.
+
+    Results ordered by relevance to one of the view's
+    ``ranked_query_params`` only come in page numbers: a cursor would
+    reorder them on ``cursor_ordering``.
+    """
+    mode_query_param = "pagination"
+
+    def __init__(self):
+        self.paginator = ApiPagination()
+
+    def uses_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or ApiCursorPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.uses_cursor(request):
+            for param in getattr(view, "ranked_query_params", ()):
+                if request.query_params.get(param):
+                    raise ValidationError(
+                        {
+                            self.mode_query_param: (
+                                "Cursor pagination is not available for "
+                                f"results ranked by ?{param}=."
+                            )
+                        }
+                    )
+
+            self.paginator = ApiCursorPagination()
+
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *ApiPagination().get_schema_operation_parameters(view),
+            *ApiCursorPagination().get_schema_operation_parameters(view),
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": (
+                    "Set to 'cursor' for keyset pagination "
+                    "(ex. ?pagination=cursor)"
+                ),
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+        ]
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+
+class RankingPagination(CursorPagination):
+    """Keyset pages of the top movies, read off the score indexes"""
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-score", "movie_id")
+
+
+class ReviewPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "id"
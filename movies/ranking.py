@@ -0,0 +1,55 @@
+"""Top movies ranked by a Bayesian average of their ratings.
+
+A movie's score is its average rating pulled towards a prior mean as if
+it had MOVIE_RANKING_PRIOR_VOTES extra votes of that value, so a single
+5-star vote does not outrank hundreds of 4-star ones. With a fixed
+prior a score depends on the movie's own aggregates only, so a rating
+write refreshes just the row of the rated movie.
+"""
+from django.conf import settings
+from django.db import connection
+
+from movies.models import Movie, MovieRanking
+
+
+def refresh_movie_ranking(movie_ids=None):
+    """Bring the ranking rows of the movies in line with them, every
+    movie's for None.
+
+    Published movies with ratings get a row, others lose theirs. Rows
+    that would not change are not rewritten.
+    """
+    ranking = MovieRanking._meta.db_table
+    movies = Movie._meta.db_table
+    params = {
+        "votes": settings.MOVIE_RANKING_PRIOR_VOTES,
+        "mean": settings.MOVIE_RANKING_PRIOR_MEAN,
+        "ids": None if movie_ids is None else list(movie_ids),
+    }
+    selected = "(%(ids)s::bigint[] IS NULL OR m.id = ANY(%(ids)s))"
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {ranking} r USING {movies} m "
+            f"WHERE r.movie_id = m.id AND {selected} "
+            "AND (m.draft OR m.rating_count = 0)",
+            params,
+        )
+        cursor.execute(
+            f"INSERT INTO {ranking} AS r "
+            "(movie_id, score, category_id, year_of_release) "
+            "SELECT m.id, "
+            "(%(mean)s * %(votes)s + m.rating_sum)::float8 "
+            "/ (%(votes)s + m.rating_count), "
+            "m.category_id, m.year_of_release "
+            f"FROM {movies} m WHERE {selected} "
+            "AND NOT m.draft AND m.rating_count > 0 "
+            "ON CONFLICT (movie_id) DO UPDATE SET "
+            "score = EXCLUDED.score, "
+            "category_id = EXCLUDED.category_id, "
+            "year_of_release = EXCLUDED.year_of_release "
+            "WHERE (r.score, r.category_id, r.year_of_release) "
+            "IS DISTINCT FROM (EXCLUDED.score, EXCLUDED.category_id, "
+            "EXCLUDED.year_of_release)",
+            params,
+        )
@@ -0,0 +1,48 @@
+"""Rating aggregates stored on every movie: count, sum, average and
+the number of ratings per star value.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from movies.models import Movie
+
+
+def get_average_rating(rating_sum, rating_count):
+    """Average star value rounded the way the API renders it"""
+    if not rating_count:
+        return None
+
+    average = Decimal(rating_sum) / rating_count
+    return average.quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
+
+
+def change_rating_aggregates(movie, old_value, new_value):
+    """Move a locked movie's aggregates from one star value to another
+    without saving.
+
+    ``old_value`` is None for a first rating, ``new_value`` is None
+    for a removed one.
+    """
+    histogram = dict(movie.rating_histogram)
+
+    if old_value is not None:
+        movie.rating_count -= 1
+        movie.rating_sum -= old_value
+        histogram[str(old_value)] = histogram.get(str(old_value), 0) - 1
+        if histogram[str(old_value)] <= 0:
+            del histogram[str(old_value)]
+
+    if new_value is not None:
+        movie.rating_count += 1
+        movie.rating_sum += new_value
+        histogram[str(new_value)] = histogram.get(str(new_value), 0) + 1
+
+    movie.rating_histogram = histogram
+    movie.average_rating = get_average_rating(
+        movie.rating_sum, movie.rating_count
+    )
+
+
+def apply_rating_change(movie, old_value, new_value):
+    """Move a locked movie's aggregates and save them"""
+    change_rating_aggregates(movie, old_value, new_value)
+    movie.save(update_fields=(*Movie.RATING_AGGREGATES, "updated_at"))
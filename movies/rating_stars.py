@@ -0,0 +1,58 @@
+from movies.indexes import InProcessIndex
+from movies.models import RatingStar
+
+
+class RatingStarIndex(InProcessIndex):
+    """Rating star ids by value and values by id.
+
+    The table holds a handful of rows that hardly ever change, so
+    validating a vote or rendering a rating needs no query for them.
+    """
+    generation_key = "movies:rating-stars:generation"
+
+    def __init__(self):
+        super().__init__()
+        self.ids = {}
+        self.values = {}
+
+    def build(self):
+        self.values = dict(RatingStar.objects.values_list("id", "value"))
+        self.ids = {value: star_id for star_id, value in self.values.items()}
+
+    def put(self, star_id, value):
+        self.remove(star_id)
+        self.values[star_id] = value
+        self.ids[value] = star_id
+
+    def remove(self, star_id):
+        value = self.values.pop(star_id, None)
+
+        if self.ids.get(value) == star_id:
+            del self.ids[value]
+
+    def by_value(self):
+        """Ids of the stars by value"""
+        self.ensure_fresh()
+
+        with self.lock:
+            return dict(self.ids)
+
+    def by_id(self):
+        """Values of the stars by id"""
+        self.ensure_fresh()
+
+        with self.lock:
+            return dict(self.values)
+
+    def id_of(self, value):
+        self.ensure_fresh()
+
+        return self.ids.get(value)
+
+    def value_of(self, star_id):
+        self.ensure_fresh()
+
+        return self.values.get(star_id)
+
+
+rating_star_index = RatingStarIndex()
@@ -1,7 +1,15 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models
 from rest_framework import serializers
 
+from movies import service
+from movies.rating_stars import rating_star_index
 from movies.models import (
     Movie,
+    MovieNeighbor,
+    MovieRanking,
     Review,
     Rating,
     RatingStar,
@@ -69,13 +77,38 @@ class DirectorDetailSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "age", "image", "description")
 
 
+class RatingStarField(serializers.Field):
+    """Star of a rating by value, read from the process-wide star index
+    instead of the RatingStar table.
+    """
+    default_error_messages = {
+        "invalid": "A valid integer is required.",
+        "does_not_exist": "Object with value={value} does not exist.",
+    }
+
+    def to_representation(self, value):
+        if isinstance(value, RatingStar):
+            return value.value
+
+        return rating_star_index.value_of(value)
+
+    def to_internal_value(self, data):
+        value = service.parse_integer(data)
+        if value is None:
+            self.fail("invalid")
+
+        star_id = rating_star_index.id_of(value)
+        if star_id is None:
+            self.fail("does_not_exist", value=data)
+
+        return RatingStar(id=star_id, value=value)
+
+
 class RatingSerializer(serializers.ModelSerializer):
     user = serializers.SlugRelatedField(
         slug_field="first_name", read_only=True
     )
-    star = serializers.SlugRelatedField(
-        slug_field="value", read_only=True
-    )
+    star = RatingStarField(source="star_id", read_only=True)
 
     class Meta:
         model = Rating
@@ -86,51 +119,76 @@ class RatingCreateSerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(
         default=serializers.CurrentUserDefault()
     )
-    star = serializers.SlugRelatedField(
-        slug_field="value", queryset=RatingStar.objects.all()
-    )
+    star = RatingStarField()
 
     class Meta:
         model = Rating
         fields = ("user", "star", "movie")
 
     def create(self, validated_data):
-        rating, created = Rating.objects.update_or_create(
+        return service.rate_movie(
             user=validated_data.get("user", None),
             movie=validated_data.get("movie", None),
-            defaults={"star": validated_data.get("star")}
+            star=validated_data.get("star"),
         )
 
-        return rating
+
+class RatingBatchSerializer(serializers.Serializer):
+    ratings = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.RATING_BATCH_MAX_SIZE,
+    )
 
 
-class FilterReviewListSerializer(serializers.ListSerializer):
-    """Comment filter, only parents"""
+class ReviewTreeListSerializer(serializers.ListSerializer):
+    """Top-level reviews with replies nested from a single query"""
 
     def to_representation(self, data):
-        data = data.filter(parent=None)
-        return super(FilterReviewListSerializer, self).to_representation(data)
+        if isinstance(data, models.Manager):
+            data = data.all()
 
+        roots = []
+        children = defaultdict(list)
+        for review in data:
+            if review.parent_id is None:
+                roots.append(review)
+            else:
+                children[review.parent_id].append(review)
 
-class RecursiveSerializer(serializers.Serializer):
-    """Recursive children output"""
+        for review in data:
+            review.tree_children = children[review.id]
 
-    def to_representation(self, value):
-        serializer = self.parent.parent.__class__(value, context=self.context)
-        return serializer.data
+        return [self.child.to_representation(review) for review in roots]
 
 
 class ReviewSerializer(serializers.ModelSerializer):
     user = serializers.SlugRelatedField(
         slug_field="first_name", read_only=True
     )
-    children = RecursiveSerializer(many=True)
+    children = serializers.SerializerMethodField()
 
     class Meta:
-        list_serializer_class = FilterReviewListSerializer
+        list_serializer_class = ReviewTreeListSerializer
         model = Review
         fields = ("id", "user", "text", "children")
 
+    def get_children(self, obj):
+        children = getattr(obj, "tree_children", None)
+        if children is None:
+            children = obj.children.all()
+
+        return [self.to_representation(child) for child in children]
+
+
+class ReviewThreadSerializer(ReviewSerializer):
+    """Review with replies loaded down to a limited depth"""
+    replies_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ReviewSerializer.Meta):
+        list_serializer_class = serializers.ListSerializer
+        fields = ("id", "user", "text", "replies_count", "children")
+
 
 class ReviewCreateSerializer(serializers.ModelSerializer):
     user = serializers.SlugRelatedField(
@@ -140,6 +198,10 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         data = super(ReviewCreateSerializer, self).validate(attrs=attrs)
         if attrs["parent"]:
+            if attrs["parent"].movie_id != attrs["movie"].id:
+                raise serializers.ValidationError(
+                    {"message": "You can only reply to reviews of this movie"}
+                )
             if (
                 attrs["parent"].user.email
                 == self.context["request"].user.email
@@ -186,7 +248,7 @@ class MovieSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Movie
-        exclude = ("poster",)
+        exclude = ("poster", "search_vector")
 
 
 class MoviePosterSerializer(serializers.ModelSerializer):
@@ -197,7 +259,6 @@ class MoviePosterSerializer(serializers.ModelSerializer):
 
 
 class MovieListSerializer(serializers.ModelSerializer):
-    film_rating = RatingSerializer(many=True)
     average_rating = serializers.DecimalField(
         max_digits=3, decimal_places=1, read_only=True, coerce_to_string=False
     )
@@ -208,11 +269,66 @@ class MovieListSerializer(serializers.ModelSerializer):
             "id",
             "title",
             "tagline",
-            "film_rating",
             "average_rating",
         )
 
 
+class MovieRankingSerializer(serializers.ModelSerializer):
+    movie = serializers.IntegerField(source="movie_id")
+    title = serializers.CharField(source="movie.title")
+    average_rating = serializers.DecimalField(
+        source="movie.average_rating",
+        max_digits=3,
+        decimal_places=1,
+        coerce_to_string=False,
+    )
+    rating_count = serializers.IntegerField(source="movie.rating_count")
+
+    class Meta:
+        model = MovieRanking
+        fields = (
+            "movie", "title", "score", "average_rating", "rating_count"
+        )
+
+
+class MovieNeighborSerializer(serializers.ModelSerializer):
+    movie = serializers.IntegerField(source="neighbor_id")
+    title = serializers.CharField(source="neighbor.title")
+
+    class Meta:
+        model = MovieNeighbor
+        fields = ("movie", "title", "score")
+
+
+class MovieRecommendationSerializer(serializers.ModelSerializer):
+    movie = serializers.IntegerField(source="id")
+    score = serializers.FloatField()
+
+    class Meta:
+        model = Movie
+        fields = ("movie", "title", "score")
+
+
+class MovieRatingHistogramSerializer(serializers.ModelSerializer):
+    average_rating = serializers.DecimalField(
+        max_digits=3, decimal_places=1, read_only=True, coerce_to_string=False
+    )
+    rating_histogram = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Movie
+        fields = ("id", "rating_count", "average_rating", "rating_histogram")
+
+    def get_rating_histogram(self, movie):
+        """Number of ratings per star value, zero for unused values"""
+        counts = movie.rating_histogram
+        values = set(rating_star_index.by_value()) | set(map(int, counts))
+
+        return {
+            str(value): counts.get(str(value), 0) for value in sorted(values)
+        }
+
+
 class MovieDetailSerializer(serializers.ModelSerializer):
     category = serializers.SlugRelatedField(
         slug_field="name", read_only=True
@@ -256,6 +372,32 @@ class MovieDetailSerializer(serializers.ModelSerializer):
             "reviews"
         )
 
+    def get_fields(self):
+        fields = super().get_fields()
+        reviews_limit = self.context.get("reviews_limit")
+
+        if reviews_limit == 0:
+            del fields["reviews"]
+        elif reviews_limit:
+            fields["reviews"] = serializers.SerializerMethodField(
+                method_name="get_review_threads"
+            )
+
+        return fields
+
+    def get_review_threads(self, obj):
+        """First top-level reviews with replies down to the depth limit"""
+        reviews = list(
+            obj.reviews.filter(parent__isnull=True)
+            .select_related("user")
+            .order_by("id")[:self.context["reviews_limit"]]
+        )
+        service.attach_review_replies(reviews, settings.REVIEWS_MAX_DEPTH)
+
+        return ReviewThreadSerializer(
+            reviews, many=True, context=self.context
+        ).data
+
     @staticmethod
     def get_budget(obj):
         budget = obj.budget
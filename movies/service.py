@@ -1,6 +1,39 @@
+import re
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
 from django_filters import rest_framework as filters
 
-from movies.models import Movie
+from movies import cache
+from movies.genre_index import genre_index
+from movies.ranking import refresh_movie_ranking
+from movies.rating_aggregates import apply_rating_change, get_average_rating
+from movies.rating_stars import rating_star_index
+from movies.models import (
+    Movie,
+    MovieRanking,
+    PendingRating,
+    Rating,
+    RatingStar,
+    Review,
+)
+from movies.signals import movies_changed
+
+
+# key of the advisory lock held while pending ratings are applied
+RATING_FLUSH_LOCK = 7_104_261
+
+# largest value of a bigint column
+MAX_ID = 2**63 - 1
 
 
 class CharFilterInFilter(
@@ -10,11 +43,480 @@ class CharFilterInFilter(
 
 
 class MovieFilter(filters.FilterSet):
-    genres = CharFilterInFilter(
-        field_name="genres__name", lookup_expr="in"
+    """Genre and year filters answered by the in-process genre index.
+
+    ``genres`` keeps movies in any of the listed genres, ``genres_all``
+    movies in every one of them.
+    """
+    genres = CharFilterInFilter(method="filter_by_index")
+    genres_all = CharFilterInFilter(method="filter_by_index")
+    year_of_release = filters.RangeFilter(method="filter_by_index")
+
+    class Meta:
+        model = Movie
+        fields = ("genres", "genres_all", "year_of_release")
+
+    def filter_by_index(self, queryset, name, value):
+        # the filters are combined in filter_queryset
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        any_genres = self.form.cleaned_data.get("genres")
+        all_genres = self.form.cleaned_data.get("genres_all")
+        years = self.form.cleaned_data.get("year_of_release")
+
+        if any_genres or all_genres:
+            return queryset.filter(
+                id__in_array=genre_index.select(
+                    any_genres, all_genres, years
+                )
+            )
+
+        # a year range alone keeps a large part of the catalog, an id
+        # list of it would cost more than the range condition
+        if years and years.start is not None:
+            queryset = queryset.filter(year_of_release__gte=years.start)
+        if years and years.stop is not None:
+            queryset = queryset.filter(year_of_release__lte=years.stop)
+
+        return queryset
+
+
+class MovieRankingFilter(filters.FilterSet):
+    """Filters of the top movies; genres are answered by the genre index"""
+    genres = CharFilterInFilter(method="filter_genres")
+    category = filters.CharFilter(
+        field_name="category__name", lookup_expr="iexact"
     )
     year_of_release = filters.RangeFilter()
 
     class Meta:
-        model = Movie
-        fields = ("genres", "year_of_release")
+        model = MovieRanking
+        fields = ("genres", "category", "year_of_release")
+
+    def filter_genres(self, queryset, name, value):
+        return queryset.filter(
+            movie_id__in_array=genre_index.select(any_genres=value)
+        )
+
+
+def search_movies(queryset, text):
+    """Movies matching the web-style query, most relevant first"""
+    query = SearchQuery(
+        text, search_type="websearch", config=settings.MOVIE_SEARCH_CONFIG
+    )
+
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "title", "id")
+    )
+
+
+def search_people(queryset, name):
+    """Actors or directors whose name contains or resembles ``name``.
+
+    Misspelled names match through trigram word similarity. The index
+    only returns rows above pg_trgm.word_similarity_threshold (0.6 by
+    default), so PEOPLE_NAME_SIMILARITY_THRESHOLD can only raise it.
+    """
+    return (
+        queryset.annotate(similarity=TrigramWordSimilarity(name, "name"))
+        .filter(
+            # ~* rather than icontains' UPPER() LIKE, which the index
+            # on the raw name cannot serve
+            Q(name__iregex=re.escape(name))
+            | Q(
+                name__trigram_word_similar=name,
+                similarity__gte=settings.PEOPLE_NAME_SIMILARITY_THRESHOLD,
+            )
+        )
+        .order_by("-similarity", "name", "id")
+    )
+
+
+def upsert_ratings(ratings):
+    """Insert ratings or change the star of existing ones, in one
+    INSERT ... ON CONFLICT DO UPDATE statement.
+    """
+    Rating.objects.bulk_create(
+        ratings,
+        update_conflicts=True,
+        unique_fields=("user", "movie"),
+        update_fields=("star",),
+    )
+
+
+@transaction.atomic
+def rate_movie(user, movie, star):
+    """Create or change the user's rating and the movie's aggregates"""
+    # the movie lock orders concurrent votes on it; the previous star
+    # is read after taking it, as a subquery of the locking statement
+    # would still see the snapshot from before the wait
+    movie = Movie.objects.select_for_update().get(pk=movie.pk)
+    old_value = rating_star_index.value_of(
+        Rating.objects.filter(user=user, movie=movie)
+        .values_list("star_id", flat=True)
+        .first()
+    )
+    rating = Rating(user=user, movie=movie, star=star)
+    upsert_ratings([rating])
+
+    if old_value != star.value:
+        apply_rating_change(movie, old_value, star.value)
+
+    return rating
+
+
+def parse_integer(value):
+    """Integer from JSON or form input, None when it is not one.
+
+    Floats count only when integral and strings only when made of ASCII
+    digits, so e.g. 4.7, True or "\u00b2" are not read as numbers.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+        return int(value) if value.isascii() and value.isdigit() else None
+    if isinstance(value, bool) or not isinstance(value, int):
+        return None
+
+    return value
+
+
+def parse_id(value):
+    """Positive integer from JSON input, None when it is not one; ids
+    past the bigint range are rejected before any query
+    """
+    value = parse_integer(value)
+
+    return value if value is not None and 0 < value <= MAX_ID else None
+
+
+def read_rating_items(items, stars):
+    """Validate ``{"movie": id, "star": value}`` items in one pass.
+
+    Returns the results in input order and the valid items by movie
+    id. A later item for the same movie supersedes an earlier one.
+    """
+    results = []
+    wanted = {}
+
+    for item in items:
+        movie_id = parse_id(item.get("movie"))
+        value = parse_id(item.get("star"))
+        result = {"movie": item.get("movie"), "star": item.get("star")}
+        errors = {}
+
+        if movie_id is None:
+            errors["movie"] = ["A valid integer is required."]
+        if value not in stars:
+            errors["star"] = [
+                f"Object with value={item.get('star')} does not exist."
+            ]
+
+        if errors:
+            result.update(status="invalid", errors=errors)
+        else:
+            if movie_id in wanted:
+                wanted[movie_id][0]["status"] = "superseded"
+            wanted[movie_id] = (result, value)
+
+        results.append(result)
+
+    return results, wanted
+
+
+def write_ratings(ratings):
+    """Upsert ``{(user_id, movie_id): star_id}`` and move the aggregates
+    of the rated movies in one statement, after locking the movies.
+
+    Runs in the caller's transaction. Returns the status of every pair:
+    "created", "updated", "unchanged" or None when the movie is gone.
+    No Rating signals are sent.
+    """
+    # locking in id order keeps concurrent writers from deadlocking;
+    # the previous stars are read by the next statement, as one taking
+    # the locks itself would still see the snapshot from before a wait
+    list(
+        Movie.objects.select_for_update()
+        .filter(id__in={movie_id for _, movie_id in ratings})
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+    movies = Movie._meta.db_table
+    table = Rating._meta.db_table
+    stars = RatingStar._meta.db_table
+    pairs = list(ratings.items())
+    params = {
+        "users": [user_id for (user_id, _), _ in pairs],
+        "movies": [movie_id for (_, movie_id), _ in pairs],
+        "stars": [star_id for _, star_id in pairs],
+        "now": timezone.now(),
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "WITH wanted AS ("
+            "SELECT w.user_id, w.movie_id, w.star_id, r.star_id AS old_id "
+            "FROM unnest(%(users)s::bigint[], %(movies)s::bigint[], "
+            "%(stars)s::bigint[]) AS w (user_id, movie_id, star_id) "
+            f"JOIN {movies} m ON m.id = w.movie_id "
+            f"LEFT JOIN {table} r "
+            "ON r.user_id = w.user_id AND r.movie_id = w.movie_id"
+            "), changed AS ("
+            "SELECT * FROM wanted WHERE old_id IS DISTINCT FROM star_id"
+            "), upserted AS ("
+            f"INSERT INTO {table} (user_id, movie_id, star_id) "
+            "SELECT user_id, movie_id, star_id FROM changed "
+            "ON CONFLICT (user_id, movie_id) DO UPDATE SET "
+            "star_id = EXCLUDED.star_id"
+            "), moves AS ("
+            "SELECT c.movie_id, s.value, 1 AS count FROM changed c "
+            f"JOIN {stars} s ON s.id = c.star_id "
+            "UNION ALL "
+            "SELECT c.movie_id, s.value, -1 FROM changed c "
+            f"JOIN {stars} s ON s.id = c.old_id"
+            "), totals AS ("
+            "SELECT movie_id, sum(count) AS count, "
+            "sum(count * value) AS sum FROM moves GROUP BY movie_id"
+            f"), updated AS (UPDATE {movies} m SET "
+            "rating_count = m.rating_count + t.count, "
+            "rating_sum = m.rating_sum + t.sum, "
+            "average_rating = round("
+            "(m.rating_sum + t.sum)::numeric "
+            "/ nullif(m.rating_count + t.count, 0), 1), "
+            "rating_histogram = ("
+            "SELECT coalesce(jsonb_object_agg(key, count), '{}') FROM ("
+            "SELECT key, sum(count) AS count FROM ("
+            "SELECT key, value::int AS count "
+            "FROM jsonb_each_text(m.rating_histogram) "
+            "UNION ALL SELECT value::text, count FROM moves "
+            "WHERE moves.movie_id = m.id"
+            ") AS h GROUP BY key HAVING sum(count) > 0) AS h), "
+            "updated_at = %(now)s "
+            "FROM totals t WHERE m.id = t.movie_id"
+            ") SELECT user_id, movie_id, old_id, star_id FROM wanted",
+            params,
+        )
+        found = cursor.fetchall()
+
+    statuses = dict.fromkeys(ratings)
+    for user_id, movie_id, old_id, star_id in found:
+        statuses[user_id, movie_id] = (
+            "unchanged"
+            if old_id == star_id
+            else "created" if old_id is None else "updated"
+        )
+
+    changed = {
+        movie_id
+        for (_, movie_id), status in statuses.items()
+        if status in ("created", "updated")
+    }
+
+    # the raw statement sends no signals
+    if changed:
+        refresh_movie_ranking(changed)
+        movies_changed(changed, touch=False)
+        transaction.on_commit(cache.bump_ratings_version)
+
+    return statuses
+
+
+@transaction.atomic
+def rate_movies(user, items):
+    """Create or change many of the user's ratings at once.
+
+    Every table is written with one statement whatever the number of
+    items, ratings with a single upsert. Invalid items are reported
+    and skipped, the rest are written; the result of each item comes
+    back in input order.
+    """
+    stars = rating_star_index.by_value()
+    results, wanted = read_rating_items(items, stars)
+    statuses = write_ratings(
+        {
+            (user.pk, movie_id): stars[value]
+            for movie_id, (result, value) in wanted.items()
+        }
+    )
+
+    for movie_id, (result, value) in wanted.items():
+        result_status = statuses[user.pk, movie_id]
+
+        if result_status is None:
+            result.update(
+                status="invalid",
+                errors={
+                    "movie": [
+                        f'Invalid pk "{movie_id}" - object does not exist.'
+                    ]
+                },
+            )
+        else:
+            result["status"] = result_status
+
+    return results
+
+
+def enqueue_rating(user, movie, star):
+    """Queue the user's rating for ``flush_pending_ratings``"""
+    return PendingRating.objects.create(user=user, movie=movie, star=star)
+
+
+def flush_pending_ratings(batch_size=1000):
+    """Apply the oldest queued ratings, returning how many were taken,
+    or None while another flush holds the lock.
+
+    The latest queued rating of a user for a movie wins over earlier
+    ones. An advisory lock keeps flushes one at a time, as two of them
+    could otherwise apply a user's votes out of order.
+    """
+    table = PendingRating._meta.db_table
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_try_advisory_xact_lock(%s)",
+                [RATING_FLUSH_LOCK],
+            )
+            if not cursor.fetchone()[0]:
+                return None
+
+            # taken off the queue in the statement that reads them
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id IN ("
+                f"SELECT id FROM {table} ORDER BY id LIMIT %s"
+                ") RETURNING id, user_id, movie_id, star_id",
+                [batch_size],
+            )
+            pending = sorted(cursor.fetchall())
+
+        if not pending:
+            return 0
+
+        latest = {}
+        for _, user_id, movie_id, star_id in pending:
+            latest[user_id, movie_id] = star_id
+
+        write_ratings(latest)
+
+    return len(pending)
+
+
+def rebuild_rating_aggregates(batch_size=1000):
+    """Recompute stored aggregates of all movies from the ratings table.
+
+    Only movies whose aggregates were off are written; they get a new
+    ``updated_at`` and lose their cached details, like after a vote.
+    Returns the number of movies corrected.
+    """
+    last_id = 0
+    updated = 0
+
+    while True:
+        stored = {
+            movie_id: aggregates
+            for movie_id, *aggregates in Movie.objects.filter(
+                id__gt=last_id
+            )
+            .order_by("id")
+            .values_list("id", *Movie.RATING_AGGREGATES)[:batch_size]
+        }
+        if not stored:
+            break
+
+        batch_ids = list(stored)
+
+        histograms = defaultdict(dict)
+        for movie_id, value, count in (
+            Rating.objects.filter(movie_id__in=batch_ids)
+            .values_list("movie", "star__value")
+            .annotate(count=Count("id"))
+            .order_by()
+        ):
+            histograms[movie_id][str(value)] = count
+
+        movies = []
+        now = timezone.now()
+        for movie_id in batch_ids:
+            histogram = histograms.get(movie_id, {})
+            rating_count = sum(histogram.values())
+            rating_sum = sum(
+                int(value) * count for value, count in histogram.items()
+            )
+            aggregates = [
+                rating_count,
+                rating_sum,
+                get_average_rating(rating_sum, rating_count),
+                histogram,
+            ]
+            if aggregates != stored[movie_id]:
+                movies.append(
+                    Movie(
+                        id=movie_id,
+                        **dict(zip(Movie.RATING_AGGREGATES, aggregates)),
+                        updated_at=now,
+                    )
+                )
+
+        with transaction.atomic():
+            Movie.objects.bulk_update(
+                movies, (*Movie.RATING_AGGREGATES, "updated_at")
+            )
+            movies_changed([movie.id for movie in movies], touch=False)
+        updated += len(movies)
+        last_id = batch_ids[-1]
+
+    # bulk_update sends no signals
+    refresh_movie_ranking()
+    cache.bump_ratings_version()
+
+    return updated
+
+
+def attach_review_replies(reviews, depth):
+    """Load replies of the reviews level by level, ``depth`` levels deep.
+
+    Every loaded review gets ``tree_children`` (empty past the depth
+    limit) and ``replies_count``, the number of its direct replies.
+    """
+    level = list(reviews)
+
+    for current_depth in range(depth + 1):
+        if not level:
+            return
+
+        level_ids = [review.id for review in level]
+
+        if current_depth == depth:
+            counts = dict(
+                Review.objects.filter(parent_id__in=level_ids)
+                .values("parent")
+                .annotate(count=Count("id"))
+                .values_list("parent", "count")
+                .order_by()
+            )
+            for review in level:
+                review.tree_children = []
+                review.replies_count = counts.get(review.id, 0)
+            return
+
+        replies = list(
+            Review.objects.filter(parent_id__in=level_ids)
+            .select_related("user")
+            .order_by("id")
+        )
+        children = defaultdict(list)
+        for reply in replies:
+            children[reply.parent_id].append(reply)
+
+        for review in level:
+            review.tree_children = children[review.id]
+            review.replies_count = len(review.tree_children)
+
+        level = replies
@@ -0,0 +1,467 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from movies import cache
+from movies.autocomplete import autocomplete_index
+from movies.collaboration import collaboration_graph
+from movies.genre_index import genre_index
+from movies.ranking import refresh_movie_ranking
+from movies.rating_aggregates import apply_rating_change
+from movies.rating_stars import rating_star_index
+from movies.models import (
+    Actor,
+    Category,
+    Director,
+    Genre,
+    Movie,
+    MovieFrames,
+    MovieNeighbor,
+    PendingNeighborRefresh,
+    PendingRating,
+    Rating,
+    RatingStar,
+    Review,
+)
+
+
+def movies_changed(movie_ids, touch=True):
+    """Move the version stamp of the movies and drop their cached
+    representations once the change is committed.
+    """
+    movie_ids = set(movie_ids)
+
+    if not movie_ids:
+        return
+
+    if touch:
+        Movie.objects.filter(id__in=movie_ids).update(
+            updated_at=timezone.now()
+        )
+
+    transaction.on_commit(lambda: cache.invalidate_movie_details(movie_ids))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(m2m_changed)
+def catalog_changed(sender, update_fields=None, **kwargs):
+    """Any committed write to the app retires the cached responses of
+    its scope
+    """
+    # queued work shows nowhere until applied
+    if sender._meta.app_label != "movies" or sender in (
+        PendingNeighborRefresh,
+        PendingRating,
+    ):
+        return
+
+    if sender is Rating or (
+        sender is Movie
+        and update_fields
+        and set(update_fields) <= {*Movie.RATING_AGGREGATES, "updated_at"}
+    ):
+        transaction.on_commit(cache.bump_ratings_version)
+    else:
+        transaction.on_commit(cache.bump_catalog_version)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def movie_changed(sender, instance, update_fields=None, **kwargs):
+    # saving stamps the movie itself unless update_fields leaves it out
+    touch = update_fields is not None and "updated_at" not in update_fields
+    movies_changed([instance.pk], touch=touch)
+
+
+@receiver(post_save, sender=MovieFrames)
+@receiver(post_delete, sender=MovieFrames)
+def movie_frame_changed(sender, instance, **kwargs):
+    movies_changed([instance.movies_id])
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def movie_feedback_changed(sender, instance, **kwargs):
+    movies_changed([instance.movie_id])
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Movie.directors.through)
+@receiver(m2m_changed, sender=Movie.actors.through)
+def movie_relations_changed(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            movies_changed([instance.pk])
+        return
+
+    if action in ("post_add", "post_remove"):
+        movies_changed(pk_set)
+    elif action == "pre_clear":
+        # auto-created through tables name their columns after the models
+        movies_changed(
+            sender.objects.filter(
+                **{instance._meta.model_name: instance}
+            ).values_list("movie_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Actor)
+@receiver(pre_delete, sender=Actor)
+def actor_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        movies_changed(instance.film_actor.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Director)
+@receiver(pre_delete, sender=Director)
+def director_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        movies_changed(instance.film_director.values_list("id", flat=True))
+
+
+# an edit moves the genre's or category's own stamp, which the movies'
+# validators read; a delete rewrites every linked movie anyway
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def genre_changed(sender, instance, signal, created=False, **kwargs):
+    if not created:
+        movies_changed(
+            instance.film_genre.values_list("id", flat=True),
+            touch=signal is pre_delete,
+        )
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_changed(sender, instance, signal, created=False, **kwargs):
+    if not created:
+        movies_changed(
+            instance.film_category.values_list("id", flat=True),
+            touch=signal is pre_delete,
+        )
+
+
+@receiver(post_save, sender=RatingStar)
+@receiver(pre_delete, sender=RatingStar)
+def rating_star_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        movies_changed(
+            instance.star_rating.values_list("movie_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=get_user_model())
+def user_changed(sender, instance, created, update_fields, **kwargs):
+    """Ratings and reviews render the author's first name"""
+    if created or (update_fields and "first_name" not in update_fields):
+        return
+
+    transaction.on_commit(cache.bump_catalog_version)
+
+    movies_changed(
+        instance.user_rating.values_list("movie_id", flat=True).union(
+            instance.user_review.values_list("movie_id", flat=True)
+        )
+    )
+
+
+def autocomplete_changed(update):
+    transaction.on_commit(lambda: autocomplete_index.changed(update))
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved_for_autocomplete(sender, instance, update_fields, **kwargs):
+    # rating updates only move popularity, which the index may lag on
+    # for up to AUTOCOMPLETE_INDEX_MAX_AGE instead of a rebuild per vote
+    if update_fields and not {"title", "draft"} & set(update_fields):
+        return
+
+    ref = ("movie", instance.pk)
+
+    if instance.draft:
+        autocomplete_changed(lambda: autocomplete_index.remove(ref))
+    else:
+        title, popularity = instance.title, instance.rating_count
+        autocomplete_changed(
+            lambda: autocomplete_index.put(ref, title, popularity)
+        )
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_save, sender=Director)
+def person_saved_for_autocomplete(sender, instance, **kwargs):
+    ref = (sender._meta.model_name, instance.pk)
+    name = instance.name
+
+    autocomplete_changed(lambda: autocomplete_index.put(ref, name))
+
+
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=Actor)
+@receiver(post_delete, sender=Director)
+def deleted_for_autocomplete(sender, instance, **kwargs):
+    ref = (sender._meta.model_name, instance.pk)
+
+    autocomplete_changed(lambda: autocomplete_index.remove(ref))
+
+
+def genre_index_changed(update):
+    transaction.on_commit(lambda: genre_index.changed(update))
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved_for_genre_index(sender, instance, update_fields, **kwargs):
+    if update_fields and not {"year_of_release", "draft"} & set(
+        update_fields
+    ):
+        return
+
+    movie_id, year, draft = (
+        instance.pk, instance.year_of_release, instance.draft
+    )
+
+    genre_index_changed(lambda: genre_index.put_movie(movie_id, year, draft))
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted_for_genre_index(sender, instance, **kwargs):
+    movie_id = instance.pk
+
+    genre_index_changed(lambda: genre_index.remove_movie(movie_id))
+
+
+@receiver(post_save, sender=Genre)
+def genre_saved_for_genre_index(sender, instance, **kwargs):
+    genre_id, name = instance.pk, instance.name
+
+    genre_index_changed(lambda: genre_index.put_genre(genre_id, name))
+
+
+@receiver(post_delete, sender=Genre)
+def genre_deleted_for_genre_index(sender, instance, **kwargs):
+    genre_id = instance.pk
+
+    genre_index_changed(
+        lambda: genre_index.remove_genre(genre_id, members=True)
+    )
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def movie_genres_changed_for_genre_index(sender, instance, action, reverse,
+                                         pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if action == "post_clear":
+        pk_set = None
+
+    genre_ids, movie_ids = (
+        ([instance.pk], pk_set) if reverse else (pk_set, [instance.pk])
+    )
+    linked = action == "post_add"
+
+    genre_index_changed(
+        lambda: genre_index.link(genre_ids, movie_ids, linked)
+    )
+
+
+def rating_star_index_changed(update):
+    transaction.on_commit(lambda: rating_star_index.changed(update))
+
+
+@receiver(post_save, sender=RatingStar)
+def rating_star_saved_for_index(sender, instance, **kwargs):
+    star_id, value = instance.pk, instance.value
+
+    rating_star_index_changed(lambda: rating_star_index.put(star_id, value))
+
+
+@receiver(post_delete, sender=RatingStar)
+def rating_star_deleted_for_index(sender, instance, **kwargs):
+    star_id = instance.pk
+
+    rating_star_index_changed(lambda: rating_star_index.remove(star_id))
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved_for_ranking(sender, instance, update_fields, **kwargs):
+    ranked_fields = {
+        "rating_count",
+        "rating_sum",
+        "draft",
+        "category",
+        "category_id",
+        "year_of_release",
+    }
+    if update_fields and not ranked_fields & set(update_fields):
+        return
+
+    refresh_movie_ranking([instance.pk])
+
+
+def rating_moved(old, new):
+    """Move the aggregates of the movies of a rating saved or deleted
+    through the ORM from ``old`` to ``new``, (movie id, star id) pairs
+    or None.
+
+    The vote endpoints upsert without signals and move the aggregates
+    themselves; this covers the admin and cascades, e.g. of a deleted
+    user.
+    """
+    values = rating_star_index.by_id()
+    # a star created in this transaction reaches the index on commit
+    missing = {
+        pair[1] for pair in (old, new) if pair is not None
+    } - set(values)
+    if missing:
+        values.update(
+            RatingStar.objects.filter(id__in=missing).values_list(
+                "id", "value"
+            )
+        )
+    changes = {}
+
+    if old is not None:
+        changes.setdefault(old[0], [None, None])[0] = values.get(old[1])
+    if new is not None:
+        changes.setdefault(new[0], [None, None])[1] = values.get(new[1])
+
+    with transaction.atomic():
+        for movie_id, (old_value, new_value) in sorted(changes.items()):
+            if old_value == new_value:
+                continue
+
+            movie = Movie.objects.select_for_update().filter(
+                pk=movie_id
+            ).first()
+            if movie is not None:
+                apply_rating_change(movie, old_value, new_value)
+
+
+@receiver(pre_save, sender=Rating)
+def rating_saving(sender, instance, raw=False, **kwargs):
+    instance.stored_rating = (
+        None
+        if raw or instance.pk is None
+        else Rating.objects.filter(pk=instance.pk)
+        .values_list("movie_id", "star_id")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved_for_aggregates(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rating_moved(
+            instance.stored_rating, (instance.movie_id, instance.star_id)
+        )
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted_for_aggregates(sender, instance, origin=None,
+                                  **kwargs):
+    # the movies going with their ratings need no aggregates
+    if isinstance(origin, Movie) or (
+        isinstance(origin, QuerySet) and origin.model is Movie
+    ):
+        return
+
+    rating_moved((instance.movie_id, instance.star_id), None)
+
+
+def neighbors_stale(kind, movie_ids):
+    """Queue the movies for ``refresh_neighbors`` along with the write"""
+    PendingNeighborRefresh.objects.bulk_create(
+        [
+            PendingNeighborRefresh(kind=kind, movie_id=movie_id)
+            for movie_id in set(movie_ids)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def content_neighbors_stale(movie_ids):
+    neighbors_stale(MovieNeighbor.CONTENT, movie_ids)
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Movie.directors.through)
+@receiver(m2m_changed, sender=Movie.actors.through)
+def movie_relations_changed_for_neighbors(sender, instance, action, reverse,
+                                          pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            content_neighbors_stale([instance.pk])
+        return
+
+    if action in ("post_add", "post_remove"):
+        content_neighbors_stale(pk_set)
+    elif action == "pre_clear":
+        content_neighbors_stale(
+            sender.objects.filter(
+                **{instance._meta.model_name: instance}
+            ).values_list("movie_id", flat=True)
+        )
+
+
+@receiver(pre_delete, sender=Actor)
+@receiver(pre_delete, sender=Director)
+@receiver(pre_delete, sender=Genre)
+def attribute_deleted_for_neighbors(sender, instance, **kwargs):
+    # the through rows go without m2m_changed
+    content_neighbors_stale(
+        Movie.objects.filter(
+            **{f"{sender._meta.model_name}s": instance}
+        ).values_list("id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved_for_neighbors(sender, instance, created, update_fields,
+                              **kwargs):
+    # publishing adds a movie to the lists, drafting takes it off
+    if not created and (update_fields is None or "draft" in update_fields):
+        content_neighbors_stale([instance.pk])
+
+    if created or update_fields is None or {"description", "draft"} & set(
+        update_fields
+    ):
+        neighbors_stale(MovieNeighbor.TEXT, [instance.pk])
+
+
+def collaboration_graph_changed():
+    transaction.on_commit(collaboration_graph.reset)
+
+
+@receiver(m2m_changed, sender=Movie.directors.through)
+@receiver(m2m_changed, sender=Movie.actors.through)
+def movie_people_changed_for_graph(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        collaboration_graph_changed()
+
+
+@receiver(post_delete, sender=Actor)
+@receiver(post_delete, sender=Director)
+@receiver(post_delete, sender=Movie)
+def deleted_for_graph(sender, **kwargs):
+    collaboration_graph_changed()
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved_for_graph(sender, created, update_fields, **kwargs):
+    # a new movie has no people yet; the graph holds published ones only
+    if not created and (update_fields is None or "draft" in update_fields):
+        collaboration_graph_changed()
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
@@ -31,6 +32,7 @@ def detail_url(actor_id):
 class UnauthenticatedActorApiTests(TestCase):
     def setUp(self) -> None:
         self.client = APIClient()
+        cache.clear()
 
     def test_list_actors(self):
         sample_actor()
@@ -45,6 +47,33 @@ class UnauthenticatedActorApiTests(TestCase):
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             self.assertEqual(response.data, serializer.data)
 
+    def test_list_actors_cursor_pagination(self):
+        actors = [
+            sample_actor(name=name)
+            for name in ("Tom Hanks", "Tom Hanks", "Al Pacino", "Meryl Streep")
+        ]
+        expected_ids = [
+            actor.id for actor in sorted(actors, key=lambda a: (a.name, a.id))
+        ]
+
+        response = self.client.get(ACTOR_URL, {"pagination": "cursor"})
+        ids = [actor["id"] for actor in response.data["results"]]
+
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            ids += [actor["id"] for actor in response.data["results"]]
+
+        self.assertEqual(ids, expected_ids)
+
+    def test_name_search_cursor_pagination_rejected(self):
+        sample_actor(name="Tom Hanks")
+
+        response = self.client.get(
+            ACTOR_URL, {"name": "Tom", "pagination": "cursor"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_filter_actors_by_name(self):
         sample_actor(name="Tom Cruise")
         sample_actor(name="Arnold Schwarzenegger")
@@ -58,6 +87,25 @@ class UnauthenticatedActorApiTests(TestCase):
         if serializer.is_valid():
             self.assertEqual(response.data, serializer.data)
 
+    def test_filter_actors_by_misspelled_name(self):
+        tom_cruise = sample_actor(name="Tom Cruise")
+        tom_hanks = sample_actor(name="Tom Hanks")
+        sample_actor(name="Arnold Schwarzenegger")
+
+        response = self.client.get(ACTOR_URL, {"name": "Tom Cruse"})
+
+        self.assertEqual(
+            [actor["id"] for actor in response.data["results"]],
+            [tom_cruise.id],
+        )
+
+        response = self.client.get(ACTOR_URL, {"name": "tom"})
+
+        self.assertEqual(
+            {actor["id"] for actor in response.data["results"]},
+            {tom_cruise.id, tom_hanks.id},
+        )
+
     def test_retrieve_actor_detail(self):
         actor = sample_actor()
 
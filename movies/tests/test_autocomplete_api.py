@@ -0,0 +1,110 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies.autocomplete import autocomplete_index
+from movies.models import Movie, Actor, Director
+
+
+AUTOCOMPLETE_URL = reverse("movies:autocomplete-list")
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+class AutocompleteApiTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        autocomplete_index.invalidate()
+        self.client = APIClient()
+
+    def tearDown(self) -> None:
+        autocomplete_index.invalidate()
+
+    def test_matches_beginning_of_any_word(self):
+        actor = Actor.objects.create(name="Tom Cruise")
+        Actor.objects.create(name="Brad Pitt")
+        movie = sample_movie(title="Top Gun")
+
+        response = self.client.get(AUTOCOMPLETE_URL, {"q": "cru"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["actors"], [{"id": actor.id, "name": "Tom Cruise"}]
+        )
+        self.assertEqual(response.data["movies"], [])
+
+        response = self.client.get(AUTOCOMPLETE_URL, {"q": "TOP g"})
+
+        self.assertEqual(
+            response.data["movies"], [{"id": movie.id, "title": "Top Gun"}]
+        )
+
+    def test_more_popular_entries_come_first(self):
+        sample_movie(title="Alien")
+        more_popular = sample_movie(title="Aliens")
+        Movie.objects.filter(id=more_popular.id).update(rating_count=10)
+
+        response = self.client.get(AUTOCOMPLETE_URL, {"q": "ali", "limit": 1})
+
+        self.assertEqual(
+            [movie["id"] for movie in response.data["movies"]],
+            [more_popular.id],
+        )
+
+    def test_draft_movies_are_not_suggested(self):
+        sample_movie(title="Unreleased", draft=True)
+
+        response = self.client.get(AUTOCOMPLETE_URL, {"q": "unr"})
+
+        self.assertEqual(response.data["movies"], [])
+
+    def test_index_follows_committed_writes(self):
+        self.client.get(AUTOCOMPLETE_URL, {"q": "a"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            director = Director.objects.create(name="James Cameron")
+
+        response = self.client.get(AUTOCOMPLETE_URL, {"q": "cam"})
+
+        self.assertEqual(
+            response.data["directors"],
+            [{"id": director.id, "name": "James Cameron"}],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            director.delete()
+
+        response = self.client.get(AUTOCOMPLETE_URL, {"q": "cam"})
+
+        self.assertEqual(response.data["directors"], [])
+
+    def test_warm_index_answers_without_queries(self):
+        sample_movie(title="Titanic")
+        self.client.get(AUTOCOMPLETE_URL, {"q": "t"})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(AUTOCOMPLETE_URL, {"q": "tit"})
+
+        self.assertEqual(len(response.data["movies"]), 1)
+
+    def test_invalid_limit_rejected(self):
+        for limit in ("x", "\u00b2"):
+            response = self.client.get(
+                AUTOCOMPLETE_URL, {"q": "a", "limit": limit}
+            )
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from movies.models import Genre, Movie, Rating
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_movie_search_benchmark_leaves_no_rows(self):
+        output = StringIO()
+
+        call_command(
+            "benchmark", "movie_search", rows=50, repeat=2, stdout=output
+        )
+
+        self.assertIn("search", output.getvalue())
+        self.assertFalse(Movie.objects.exists())
+
+    def test_genre_filter_benchmark_leaves_no_rows(self):
+        output = StringIO()
+
+        call_command(
+            "benchmark", "genre_filter", rows=50, repeat=2, stdout=output
+        )
+
+        self.assertIn("bitmap", output.getvalue())
+        self.assertFalse(Genre.objects.exists())
+
+    def test_rating_writes_benchmark_leaves_no_rows(self):
+        output = StringIO()
+
+        call_command(
+            "benchmark", "rating_writes", rows=50, repeat=2, stdout=output
+        )
+
+        self.assertIn("flush", output.getvalue())
+        self.assertNotIn("left behind", output.getvalue())
+        self.assertFalse(Rating.objects.exists())
@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies.models import Movie, Actor, Director, Genre, Review
+
+
+MOVIE_URL = reverse("movies:movie-list")
+ACTOR_URL = reverse("movies:actor-list")
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.movie = sample_movie()
+
+    def test_retrieve_movie_not_modified(self):
+        url = reverse("movies:movie-detail", args=[self.movie.id])
+        response = self.client.get(url)
+
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_review_changes_movie_etag(self):
+        url = reverse("movies:movie-detail", args=[self.movie.id])
+        etag = self.client.get(url)["ETag"]
+        user = get_user_model().objects.create_user(
+            "test@test.com", "testpass", username="test"
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=user, text="Good", movie=self.movie)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["reviews"]), 1)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_movies_not_modified_until_set_changes(self):
+        other = sample_movie(title="Other movie")
+        etag = self.client.get(MOVIE_URL)["ETag"]
+
+        response = self.client.get(MOVIE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+
+        response = self.client.get(MOVIE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+
+    def test_list_validators_depend_on_query(self):
+        first = self.client.get(MOVIE_URL)
+        second = self.client.get(MOVIE_URL, {"page": 1})
+
+        self.assertNotEqual(first["ETag"], second["ETag"])
+
+    def test_actor_not_modified_since(self):
+        actor = Actor.objects.create(name="Tom Cruise")
+        url = reverse("movies:actor-detail", args=[actor.id])
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_director_list_etag_follows_changes(self):
+        director = Director.objects.create(name="James Cameron")
+        url = reverse("movies:director-list")
+        etag = self.client.get(url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            director.name = "Jim Cameron"
+            director.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["name"], "Jim Cameron")
+
+    def test_empty_list_not_modified(self):
+        etag = self.client.get(ACTOR_URL)["ETag"]
+
+        response = self.client.get(ACTOR_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_genre_rename_changes_movie_etag(self):
+        genre = Genre.objects.create(name="Drama")
+        self.movie.genres.add(genre)
+        url = reverse("movies:movie-detail", args=[self.movie.id])
+        etag = self.client.get(url)["ETag"]
+        updated_at = Movie.objects.get(id=self.movie.id).updated_at
+
+        with self.captureOnCommitCallbacks(execute=True):
+            genre.name = "Melodrama"
+            genre.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["genres"], ["Melodrama"])
+        self.assertEqual(
+            Movie.objects.get(id=self.movie.id).updated_at, updated_at
+        )
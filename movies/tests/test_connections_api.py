@@ -0,0 +1,132 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies.collaboration import collaboration_graph
+from movies.models import Actor, Director, Movie
+
+
+CONNECTIONS_URL = reverse("movies:connections-list")
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+class ConnectionsApiTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        collaboration_graph.invalidate()
+        self.client = APIClient()
+
+        self.actors = [
+            Actor.objects.create(name=f"Actor {number}")
+            for number in range(5)
+        ]
+        self.movies = [
+            sample_movie(title=f"Movie {number}") for number in range(4)
+        ]
+        # a chain: actor 0 - movie 0 - actor 1 - movie 1 - ... - actor 4
+        for number, movie in enumerate(self.movies):
+            movie.actors.add(self.actors[number], self.actors[number + 1])
+
+        self.cameron = Director.objects.create(name="James Cameron")
+        self.movies[3].directors.add(self.cameron)
+
+    def tearDown(self) -> None:
+        collaboration_graph.invalidate()
+
+    def connection(self, source, target):
+        return self.client.get(
+            CONNECTIONS_URL, {"from": source, "to": target}
+        )
+
+    def test_chain_of_movies_between_people(self):
+        response = self.connection(
+            f"actor:{self.actors[0].id}", f"actor:{self.actors[4].id}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["degrees"], 4)
+        self.assertEqual(
+            [person["id"] for person in response.data["people"]],
+            [actor.id for actor in self.actors],
+        )
+        self.assertEqual(
+            [movie["title"] for movie in response.data["movies"]],
+            ["Movie 0", "Movie 1", "Movie 2", "Movie 3"],
+        )
+
+    def test_shortest_chain_wins(self):
+        shortcut = sample_movie(title="Shortcut")
+        shortcut.actors.add(self.actors[1])
+        shortcut.directors.add(self.cameron)
+
+        response = self.connection(
+            f"director:{self.cameron.id}", f"actor:{self.actors[0].id}"
+        )
+
+        self.assertEqual(
+            response.data["people"],
+            [
+                {
+                    "kind": "director",
+                    "id": self.cameron.id,
+                    "name": "James Cameron",
+                },
+                {"kind": "actor", "id": self.actors[1].id, "name": "Actor 1"},
+                {"kind": "actor", "id": self.actors[0].id, "name": "Actor 0"},
+            ],
+        )
+        self.assertEqual(
+            [movie["id"] for movie in response.data["movies"]],
+            [shortcut.id, self.movies[0].id],
+        )
+
+    def test_person_to_themselves(self):
+        response = self.connection(
+            f"actor:{self.actors[2].id}", f"actor:{self.actors[2].id}"
+        )
+
+        self.assertEqual(response.data["degrees"], 0)
+        self.assertEqual(response.data["movies"], [])
+
+    def test_unconnected_people_not_found(self):
+        loner = Actor.objects.create(name="Loner")
+        sample_movie(title="Solo").actors.add(loner)
+
+        response = self.connection(
+            f"actor:{self.actors[0].id}", f"actor:{loner.id}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_drafted_movie_breaks_chain(self):
+        self.connection(
+            f"actor:{self.actors[0].id}", f"actor:{self.actors[4].id}"
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movies[2].draft = True
+            self.movies[2].save()
+
+        response = self.connection(
+            f"actor:{self.actors[0].id}", f"actor:{self.actors[4].id}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_person_rejected(self):
+        response = self.connection("actor:x", f"actor:{self.actors[0].id}")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
@@ -31,6 +32,7 @@ def detail_url(director_id):
 class UnauthenticatedDirectorApiTests(TestCase):
     def setUp(self) -> None:
         self.client = APIClient()
+        cache.clear()
 
     def test_list_directors(self):
         sample_director()
@@ -58,6 +60,17 @@ class UnauthenticatedDirectorApiTests(TestCase):
         if serializer.is_valid():
             self.assertEqual(response.data, serializer.data)
 
+    def test_filter_directors_by_misspelled_name(self):
+        spielberg = sample_director(name="Steven Spielberg")
+        sample_director(name="James Cameron")
+
+        response = self.client.get(DIRECTOR_URL, {"name": "Steven Spilberg"})
+
+        self.assertEqual(
+            [director["id"] for director in response.data["results"]],
+            [spielberg.id],
+        )
+
     def test_retrieve_director_detail(self):
         director = sample_director()
 
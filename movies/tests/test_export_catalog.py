@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies.models import Movie, Genre, Actor
+
+
+EXPORT_URL = reverse("movies:movie-export")
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+class ExportCatalogTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(
+            "admin@test.com", "adminpass", username="admin", is_staff=True
+        )
+        self.movie = sample_movie(title="Top Gun")
+        self.movie.genres.add(Genre.objects.create(name="Action"))
+        self.movie.actors.add(Actor.objects.create(name="Tom Cruise"))
+        sample_movie(title="Draft", draft=True)
+
+    def test_export_requires_staff(self):
+        user = get_user_model().objects.create_user(
+            "test@test.com", "testpass", username="test"
+        )
+        self.client.force_authenticate(user)
+
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_streams_every_movie(self):
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        records = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [record["title"] for record in records], ["Top Gun", "Draft"]
+        )
+        self.assertEqual(records[0]["genres"], ["Action"])
+        self.assertEqual(records[0]["actors"], ["Tom Cruise"])
+        self.assertEqual(records[0]["rating_count"], 0)
+        self.assertTrue(records[1]["draft"])
+
+    def test_export_gzipped_when_accepted(self):
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(
+            b"".join(response.streaming_content)
+        ).splitlines()
+        self.assertEqual(len(lines), 2)
+
+    def test_export_command_writes_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "catalog.ndjson.gz")
+
+        call_command(
+            "export_catalog", path, gzip=True, chunk_size=1, stdout=StringIO()
+        )
+
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]["id"], self.movie.id)
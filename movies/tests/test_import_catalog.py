@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from movies.models import (
+    Movie,
+    Actor,
+    Category,
+    Genre,
+    MovieNeighbor,
+    PendingNeighborRefresh,
+)
+
+
+CSV_HEADER = "title,year_of_release,category,genres,directors,actors\n"
+
+
+class ImportCatalogCommandTests(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+
+        return path
+
+    def test_import_csv_resolves_names(self):
+        existing = Actor.objects.create(name="Tom Cruise")
+        path = self.write_file(
+            "catalog.csv",
+            CSV_HEADER
+            + "Top Gun,1986,Films,Action|Drama,Tony Scott,Tom Cruise\n"
+            + "Rain Man,1988,Films,Drama,,Tom Cruise|Dustin Hoffman\n",
+        )
+
+        call_command("import_catalog", path, batch_size=1, stdout=StringIO())
+
+        top_gun = Movie.objects.get(title="Top Gun")
+        rain_man = Movie.objects.get(title="Rain Man")
+        self.assertEqual(top_gun.year_of_release, 1986)
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertEqual(top_gun.category, rain_man.category)
+        self.assertEqual(
+            sorted(top_gun.genres.values_list("name", flat=True)),
+            ["Action", "Drama"],
+        )
+        self.assertEqual(Genre.objects.count(), 2)
+        self.assertEqual(list(top_gun.actors.all()), [existing])
+        self.assertEqual(rain_man.actors.count(), 2)
+        self.assertFalse(rain_man.directors.exists())
+        self.assertIsNotNone(top_gun.search_vector)
+        for kind in (MovieNeighbor.CONTENT, MovieNeighbor.TEXT):
+            self.assertEqual(
+                set(
+                    PendingNeighborRefresh.objects.filter(
+                        kind=kind
+                    ).values_list("movie_id", flat=True)
+                ),
+                {top_gun.id, rain_man.id},
+            )
+
+    def test_import_jsonl(self):
+        path = self.write_file(
+            "catalog.jsonl",
+            json.dumps(
+                {
+                    "title": "Alien",
+                    "year_of_release": 1979,
+                    "genres": ["Horror", "Sci-fi"],
+                    "draft": True,
+                }
+            )
+            + "\n",
+        )
+
+        call_command("import_catalog", path, stdout=StringIO())
+
+        movie = Movie.objects.get(title="Alien")
+        self.assertTrue(movie.draft)
+        self.assertEqual(movie.genres.count(), 2)
+        self.assertIsNone(movie.category)
+
+    def test_resume_from_checkpoint(self):
+        path = self.write_file(
+            "catalog.csv",
+            CSV_HEADER + "First,1990,,,,\n" + "Second,1991,,,,\n",
+        )
+        self.write_file("catalog.csv.checkpoint", json.dumps({"rows": 1}))
+
+        call_command("import_catalog", path, stdout=StringIO())
+
+        self.assertEqual(
+            list(Movie.objects.values_list("title", flat=True)), ["Second"]
+        )
+        self.assertFalse(os.path.exists(f"{path}.checkpoint"))
+
+    def test_failed_batch_keeps_checkpoint(self):
+        path = self.write_file(
+            "catalog.csv",
+            CSV_HEADER + "First,1990,,,,\n" + "Second,soon,,,,\n",
+        )
+
+        with self.assertRaisesMessage(CommandError, "Row 2"):
+            call_command(
+                "import_catalog", path, batch_size=1, stdout=StringIO()
+            )
+
+        self.assertEqual(Movie.objects.count(), 1)
+        with open(f"{path}.checkpoint", encoding="utf-8") as file:
+            self.assertEqual(json.load(file), {"rows": 1})
+
+    def test_malformed_jsonl_rows_named(self):
+        first = json.dumps({"title": "Alien"})
+
+        for line, message in (
+            ("[1, 2]", "Row 3: a row must be an object"),
+            ('"Aliens"', "Row 3: a row must be an object"),
+            ('{"title": "Aliens", "genres": 5}', "Row 3: genres must be"),
+            ('{"title": "Aliens",', "Line 4: "),
+        ):
+            with self.subTest(line=line):
+                path = self.write_file(
+                    "catalog.jsonl", f"{first}\n{first}\n\n{line}\n"
+                )
+
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command(
+                        "import_catalog", path, stdout=StringIO()
+                    )
+
+        self.assertFalse(Movie.objects.exists())
+
+    def test_rejected_batch_names_its_rows(self):
+        path = self.write_file(
+            "catalog.csv",
+            CSV_HEADER
+            + "First,1990,,,,\n"
+            + "Second,1991,,,,\n"
+            + f"{'x' * 300},1992,,,,\n"
+            + "Fourth,1993,,,,\n",
+        )
+
+        with self.assertRaisesMessage(CommandError, "Rows 3-4"):
+            call_command(
+                "import_catalog", path, batch_size=2, stdout=StringIO()
+            )
+
+        self.assertEqual(Movie.objects.count(), 2)
+        with open(f"{path}.checkpoint", encoding="utf-8") as file:
+            self.assertEqual(json.load(file), {"rows": 2})
@@ -0,0 +1,88 @@
+import threading
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from movies.genre_index import bitmap_from_ids, ids_from_bitmap
+from movies.indexes import InProcessIndex, next_generation
+
+
+class GatedIndex(InProcessIndex):
+    """Copies ``source`` once ``gate`` opens"""
+    generation_key = "movies:gated-index:generation"
+    source = None
+    gate = None
+
+    def __init__(self):
+        super().__init__()
+        self.value = None
+
+    def build(self):
+        self.gate.wait(timeout=5)
+        self.value = GatedIndex.source
+
+
+class InProcessIndexTests(SimpleTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        GatedIndex.source = "old"
+        GatedIndex.gate = threading.Event()
+        GatedIndex.gate.set()
+        self.index = GatedIndex()
+        self.index.ensure_fresh()
+
+    def test_stale_copy_rebuilt_in_place_by_default(self):
+        GatedIndex.source = "new"
+        self.index.reset()
+
+        self.index.ensure_fresh()
+
+        self.assertEqual(self.index.value, "new")
+        self.assertIsNone(self.index.rebuilding)
+
+    def test_cleared_generation_counter_not_reused(self):
+        self.index.changed(lambda: None)
+        cache.clear()
+        GatedIndex.source = "new"
+
+        # another process writes after the counter is gone
+        next_generation(GatedIndex.generation_key)
+        self.index.ensure_fresh()
+
+        self.assertEqual(self.index.value, "new")
+
+    @override_settings(INDEX_BACKGROUND_REBUILD=True)
+    def test_stale_copy_served_while_rebuilt_in_background(self):
+        GatedIndex.source = "new"
+        GatedIndex.gate.clear()
+        self.index.reset()
+
+        self.index.ensure_fresh()
+
+        self.assertEqual(self.index.value, "old")
+
+        GatedIndex.gate.set()
+        self.index.rebuilding.join(timeout=5)
+
+        self.assertEqual(self.index.value, "new")
+        self.assertEqual(
+            self.index.generation, cache.get(GatedIndex.generation_key)
+        )
+
+    @override_settings(INDEX_BACKGROUND_REBUILD=True)
+    def test_invalidated_copy_rebuilt_in_place(self):
+        GatedIndex.source = "new"
+        self.index.invalidate()
+
+        self.index.ensure_fresh()
+
+        self.assertEqual(self.index.value, "new")
+
+
+class GenreBitmapTests(SimpleTestCase):
+    def test_bitmap_holds_any_ids(self):
+        self.assertEqual(
+            ids_from_bitmap(bitmap_from_ids([3, 70, 1_000_003])),
+            [3, 70, 1_000_003],
+        )
+        self.assertEqual(bitmap_from_ids([]), 0)
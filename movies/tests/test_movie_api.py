@@ -1,11 +1,24 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 
 from rest_framework.test import APIClient
 
-from movies.models import Movie, Genre, Category, Actor, Director
+from movies.models import (
+    Movie,
+    Genre,
+    Category,
+    Actor,
+    Director,
+    MovieFrames,
+    Rating,
+    RatingStar,
+    Review,
+)
+from movies.genre_index import genre_index
+from movies.rating_stars import rating_star_index
 from movies.pagination import ApiPagination
 from movies.serializers import MovieListSerializer, MovieDetailSerializer
 
@@ -16,6 +29,9 @@ MOVIE_URL = reverse("movies:movie-list")
 class UnauthenticatedMovieApiTests(TestCase):
     def setUp(self) -> None:
         self.client = APIClient()
+        cache.clear()
+        genre_index.invalidate()
+        rating_star_index.invalidate()
 
     def test_list_movies(self):
         sample_movie()
@@ -81,6 +97,95 @@ class UnauthenticatedMovieApiTests(TestCase):
         if serializer3.is_valid():
             self.assertNotIn(serializer3.data, response.data)
 
+    def test_filter_movies_in_any_genre_listed_once(self):
+        both = sample_movie(title="Both")
+        one = sample_movie(title="One")
+        sample_movie(title="None")
+        action = sample_genre(name="Action")
+        drama = sample_genre(name="Drama")
+        both.genres.add(action, drama)
+        one.genres.add(drama)
+
+        response = self.client.get(MOVIE_URL, {"genres": "Action,Drama"})
+
+        self.assertEqual(
+            [movie["id"] for movie in response.data["results"]],
+            [both.id, one.id],
+        )
+
+    def test_filter_movies_in_all_genres_within_years(self):
+        old = sample_movie(title="Old", year_of_release=1980)
+        new = sample_movie(title="New", year_of_release=2010)
+        other = sample_movie(title="Other", year_of_release=2010)
+        action = sample_genre(name="Action")
+        drama = sample_genre(name="Drama")
+        old.genres.add(action, drama)
+        new.genres.add(action, drama)
+        other.genres.add(action)
+
+        response = self.client.get(
+            MOVIE_URL,
+            {"genres_all": "Action,Drama", "year_of_release_min": 2000},
+        )
+
+        self.assertEqual(
+            [movie["id"] for movie in response.data["results"]], [new.id]
+        )
+
+        response = self.client.get(
+            MOVIE_URL, {"genres_all": "Action,Western"}
+        )
+
+        self.assertEqual(response.data["results"], [])
+
+    def test_genre_filter_follows_committed_changes(self):
+        movie = sample_movie(title="Movie")
+        action = sample_genre(name="Action")
+        self.client.get(MOVIE_URL, {"genres": "Action"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            movie.genres.add(action)
+
+        response = self.client.get(MOVIE_URL, {"genres": "Action"})
+
+        self.assertEqual(len(response.data["results"]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            action.film_genre.clear()
+
+        response = self.client.get(MOVIE_URL, {"genres": "Action"})
+
+        self.assertEqual(response.data["results"], [])
+
+    def test_search_movies_ranked_by_field_weight(self):
+        description_match = sample_movie(
+            title="Quiet evening", description="A robot learns to paint"
+        )
+        title_match = sample_movie(title="Robot uprising")
+        tagline_match = sample_movie(
+            title="Metal hearts", tagline="Robots fall in love"
+        )
+        sample_movie(title="Unrelated")
+
+        response = self.client.get(MOVIE_URL, {"search": "robots"})
+
+        self.assertEqual(
+            [movie["id"] for movie in response.data["results"]],
+            [title_match.id, tagline_match.id, description_match.id],
+        )
+
+    def test_search_vector_follows_movie_edits(self):
+        movie = sample_movie(title="Old title")
+
+        movie.title = "Brand new adventure"
+        movie.save()
+
+        response = self.client.get(MOVIE_URL, {"search": "adventure"})
+
+        self.assertEqual(
+            [movie["id"] for movie in response.data["results"]], [movie.id]
+        )
+
     def test_filter_movie_by_category(self):
         category1 = sample_category(name="Films")
         category2 = sample_category(name="Anime")
@@ -128,6 +233,135 @@ class UnauthenticatedMovieApiTests(TestCase):
             remove_average_rating(serializer.data)
         )
 
+    def test_list_movies_query_count(self):
+        for index in range(5):
+            movie = sample_movie(title=f"Movie {index}")
+            for user_index in range(3):
+                sample_rating(movie, email=f"user{index}{user_index}@test.com")
+
+        # count, page of movies; ratings are not listed
+        with self.assertNumQueries(2):
+            response = self.client.get(MOVIE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_retrieve_movie_query_count(self):
+        movie = sample_movie()
+
+        for index in range(5):
+            movie.directors.add(sample_director(name=f"Director {index}"))
+            movie.actors.add(sample_actor(name=f"Actor {index}"))
+            movie.genres.add(sample_genre(name=f"Genre {index}"))
+            MovieFrames.objects.create(title=f"Frame {index}", movies=movie)
+            sample_rating(movie, email=f"user{index}@test.com")
+
+        author = get_user_model().objects.create_user(
+            "author@test.com", "testpass", username="author"
+        )
+        parent = None
+        for index in range(5):
+            parent = Review.objects.create(
+                user=author, text=f"Reply {index}", movie=movie, parent=parent
+            )
+
+        rating_star_index.ensure_fresh()
+
+        # validator, movie with category, genres, directors, actors,
+        # frames, ratings with users, all reviews with users
+        with self.assertNumQueries(8):
+            response = self.client.get(detail_url(movie.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["actors"]), 5)
+        self.assertEqual(len(response.data["film_rating"]), 5)
+
+    def test_list_movies_cursor_pagination(self):
+        movies = [
+            sample_movie(title=title)
+            for title in ("Alien", *["Brave"] * 5, "Cars")
+        ]
+        expected_ids = [
+            movie.id for movie in sorted(movies, key=lambda m: (m.title, m.id))
+        ]
+
+        # page of movies, no page count
+        with self.assertNumQueries(1):
+            response = self.client.get(MOVIE_URL, {"pagination": "cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        ids = [movie["id"] for movie in response.data["results"]]
+
+        response = self.client.get(response.data["next"])
+        ids += [movie["id"] for movie in response.data["results"]]
+
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(ids, expected_ids)
+
+    def test_search_movies_cursor_pagination_rejected(self):
+        sample_movie(title="Robots")
+
+        response = self.client.get(
+            MOVIE_URL, {"search": "robots", "pagination": "cursor"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_movie_reviews_tree(self):
+        movie = sample_movie()
+        other_movie = sample_movie(title="Other movie")
+        alice = get_user_model().objects.create_user(
+            "alice@test.com", "testpass", username="alice", first_name="Alice"
+        )
+        bob = get_user_model().objects.create_user(
+            "bob@test.com", "testpass", username="bob", first_name="Bob"
+        )
+
+        first = Review.objects.create(user=alice, text="First", movie=movie)
+        second = Review.objects.create(user=bob, text="Second", movie=movie)
+        reply = Review.objects.create(
+            user=bob, text="Reply", movie=movie, parent=first
+        )
+        nested_reply = Review.objects.create(
+            user=alice, text="Nested", movie=movie, parent=reply
+        )
+        Review.objects.create(user=alice, text="Other", movie=other_movie)
+
+        response = self.client.get(detail_url(movie.id))
+
+        self.assertEqual(
+            response.data["reviews"],
+            [
+                {
+                    "id": first.id,
+                    "user": "Alice",
+                    "text": "First",
+                    "children": [
+                        {
+                            "id": reply.id,
+                            "user": "Bob",
+                            "text": "Reply",
+                            "children": [
+                                {
+                                    "id": nested_reply.id,
+                                    "user": "Alice",
+                                    "text": "Nested",
+                                    "children": [],
+                                },
+                            ],
+                        },
+                    ],
+                },
+                {
+                    "id": second.id,
+                    "user": "Bob",
+                    "text": "Second",
+                    "children": [],
+                },
+            ],
+        )
+
 
 class AuthenticatedMovieApiTests(TestCase):
     def setUp(self) -> None:
@@ -278,6 +512,15 @@ def sample_actor(**params):
     return Actor.objects.create(**defaults)
 
 
+def sample_rating(movie, email="rater@test.com", value=4):
+    user = get_user_model().objects.create_user(
+        email, "testpass", username=email, first_name="Rater"
+    )
+    star, _ = RatingStar.objects.get_or_create(value=value)
+
+    return Rating.objects.create(user=user, star=star, movie=movie)
+
+
 def remove_average_rating(data):
     data_without_average_rating = dict(data)
     data_without_average_rating.pop("average_rating", None)
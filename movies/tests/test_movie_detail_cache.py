@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies import cache as movie_cache
+from movies.models import Movie, Actor, Rating, RatingStar, Review
+from movies.rating_stars import rating_star_index
+
+
+CACHE_STATS_URL = reverse("movies:movie-cache-stats")
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+def detail_url(movie_id):
+    return reverse("movies:movie-detail", args=[movie_id])
+
+
+class MovieDetailCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        rating_star_index.invalidate()
+        self.client = APIClient()
+        self.movie = sample_movie()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass", first_name="Bob"
+        )
+        # anonymous reads would be answered by the response cache first
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_retrieve_served_from_cache(self):
+        first_response = self.client.get(detail_url(self.movie.id))
+
+        with self.assertNumQueries(0):
+            second_response = self.client.get(detail_url(self.movie.id))
+
+        self.assertEqual(second_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(second_response.data, first_response.data)
+
+    def test_non_ascii_digit_id_not_found(self):
+        response = self.client.get(detail_url("\u00b2"))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_movie_change_invalidates_cache(self):
+        self.client.get(detail_url(self.movie.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.title = "New title"
+            self.movie.save()
+
+        response = self.client.get(detail_url(self.movie.id))
+
+        self.assertEqual(response.data["title"], "New title")
+
+    def test_linked_actor_change_invalidates_cache(self):
+        actor = Actor.objects.create(name="Tom Cruise")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.actors.add(actor)
+        self.client.get(detail_url(self.movie.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            actor.name = "Thomas Cruise"
+            actor.save()
+
+        response = self.client.get(detail_url(self.movie.id))
+
+        self.assertEqual(response.data["actors"][0]["name"], "Thomas Cruise")
+
+    def test_detail_rendered_during_change_not_cached(self):
+        # the view reads the generation before rendering
+        generation = movie_cache.get_movie_detail_generation(self.movie.id)
+        updated_at = self.movie.updated_at
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.title = "New title"
+            self.movie.save()
+
+        movie_cache.set_movie_detail(
+            self.movie.id,
+            generation,
+            "http://testserver/",
+            "None",
+            {"title": "Sample movie"},
+            updated_at,
+        )
+        response = self.client.get(detail_url(self.movie.id))
+
+        self.assertEqual(response.data["title"], "New title")
+
+    def test_rating_and_review_invalidate_cache(self):
+        self.client.get(detail_url(self.movie.id))
+        star = RatingStar.objects.create(value=5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user=self.user, star=star, movie=self.movie)
+            Review.objects.create(user=self.user, text="Good", movie=self.movie)
+
+        response = self.client.get(detail_url(self.movie.id))
+
+        self.assertEqual(len(response.data["film_rating"]), 1)
+        self.assertEqual(response.data["reviews"][0]["text"], "Good")
+
+    def test_cache_stats_count_hits_and_misses(self):
+        admin = get_user_model().objects.create_user(
+            "admin@test.com", "adminpass", username="admin", is_staff=True
+        )
+        self.client.get(detail_url(self.movie.id))
+        self.client.get(detail_url(self.movie.id))
+        self.client.get(detail_url(self.movie.id))
+
+        self.client.force_authenticate(admin)
+        response = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(response.data["hits"], 2)
+        self.assertEqual(response.data["misses"], 1)
+
+    def test_cache_stats_admin_required(self):
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
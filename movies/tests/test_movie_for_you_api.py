@@ -0,0 +1,156 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies.embeddings import embedding_store
+from movies.models import Movie, Rating, RatingStar
+from movies.rating_stars import rating_star_index
+
+
+FOR_YOU_URL = reverse("movies:movie-for-you")
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+class ForYouApiTests(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(MOVIE_EMBEDDINGS_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        rating_star_index.invalidate()
+        self.stars = {
+            value: RatingStar.objects.create(value=value)
+            for value in (1, 2, 3, 4, 5)
+        }
+        self.space = [sample_movie(title=f"Space {n}") for n in range(3)]
+        self.romance = [sample_movie(title=f"Romance {n}") for n in range(3)]
+
+        for number in range(6):
+            liked, disliked = (
+                (self.space, self.romance) if number % 2
+                else (self.romance, self.space)
+            )
+            self.rate(
+                self.create_user(number),
+                {**dict.fromkeys(liked, 5), **dict.fromkeys(disliked, 1)},
+            )
+
+        self.user = self.create_user("reader")
+        self.rate(self.user, {self.space[0]: 5, self.romance[0]: 1})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_user(self, name):
+        return get_user_model().objects.create_user(
+            f"{name}@test.com", "testpass", username=f"user-{name}"
+        )
+
+    def rate(self, user, ratings):
+        Rating.objects.bulk_create(
+            Rating(user=user, movie=movie, star=self.stars[value])
+            for movie, value in ratings.items()
+        )
+
+    def train(self):
+        call_command(
+            "train_embeddings", factors=4, iterations=15, stdout=StringIO()
+        )
+
+    def test_unrated_movies_liked_by_similar_users_first(self):
+        self.train()
+
+        response = self.client.get(FOR_YOU_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {movie["movie"] for movie in response.data[:2]},
+            {movie.id for movie in self.space[1:]},
+        )
+        self.assertEqual(len(response.data), 4)
+        self.assertNotIn(
+            self.space[0].id, [movie["movie"] for movie in response.data]
+        )
+
+    def test_draft_movies_left_out(self):
+        self.train()
+        Movie.objects.filter(id=self.space[1].id).update(draft=True)
+
+        response = self.client.get(FOR_YOU_URL, {"limit": 1})
+
+        self.assertEqual(
+            [movie["movie"] for movie in response.data], [self.space[2].id]
+        )
+
+    def test_new_run_replaces_mapped_one(self):
+        self.train()
+        self.client.get(FOR_YOU_URL)
+        first_run = embedding_store.run
+
+        self.train()
+        self.client.get(FOR_YOU_URL)
+        second_run = embedding_store.run
+        self.train()
+
+        self.assertNotEqual(second_run, first_run)
+        # the run before the current one stays for late readers
+        self.assertFalse(os.path.exists(first_run))
+        self.assertTrue(os.path.exists(second_run))
+
+    def test_run_being_written_kept(self):
+        partial = tempfile.mkdtemp(prefix="tmp-", dir=self.directory)
+
+        self.train()
+
+        self.assertTrue(os.path.exists(partial))
+
+    def test_unreadable_run_keeps_mapped_one(self):
+        self.train()
+        self.client.get(FOR_YOU_URL)
+        arrays = embedding_store.arrays
+        self.train()
+        os.remove(os.path.join(self.directory, "current", "movie_ids.npy"))
+
+        response = self.client.get(FOR_YOU_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIs(embedding_store.arrays, arrays)
+
+    def test_user_unknown_to_training_gets_empty_list(self):
+        self.train()
+        self.client.force_authenticate(self.create_user("newcomer"))
+
+        response = self.client.get(FOR_YOU_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_empty_list_before_first_training(self):
+        response = self.client.get(FOR_YOU_URL)
+
+        self.assertEqual(response.data, [])
+
+    def test_login_required(self):
+        response = APIClient().get(FOR_YOU_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
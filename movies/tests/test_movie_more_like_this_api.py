@@ -0,0 +1,196 @@
+from io import StringIO
+
+import numpy as np
+from scipy import sparse
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies import neighbors
+from movies.models import Movie, MovieNeighbor, PendingNeighborRefresh
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+def more_like_this_url(movie_id):
+    return reverse("movies:movie-more-like-this", args=[movie_id])
+
+
+class TextNeighborsTests(SimpleTestCase):
+    def test_words_leave_out_markup(self):
+        self.assertEqual(
+            neighbors.words(
+                '<p>Sci-fi&nbsp;<a href="/space/">classic</a> of 1979</p>'
+            ),
+            ["sci", "fi", "classic", "of"],
+        )
+
+    def test_sparse_cosine_matches_dense(self):
+        matrix = sparse.csr_matrix(
+            np.array(
+                [[1, 2, 0, 0], [2, 1, 1, 0], [0, 0, 1, 3], [0, 0, 0, 0]],
+                dtype=np.float32,
+            )
+        )
+
+        found = neighbors.sparse_cosine_neighbors(matrix, 2)
+
+        for part, dense_part in zip(
+            found, neighbors.top_k_neighbors(matrix, 2)
+        ):
+            np.testing.assert_allclose(part, dense_part, rtol=1e-5)
+
+
+class TextNeighborsApiTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.alien = sample_movie(
+            title="Alien",
+            description=(
+                "<p>The crew of a <b>space</b> freighter meets "
+                "an alien creature.</p>"
+            ),
+        )
+        self.aliens = sample_movie(
+            title="Aliens",
+            description=(
+                "<p>Marines return to the <i>alien</i> planet "
+                "to fight the creature.</p>"
+            ),
+        )
+        self.titanic = sample_movie(
+            title="Titanic",
+            description="<p>A love story aboard a doomed ship.</p>",
+        )
+        self.notebook = sample_movie(
+            title="The Notebook",
+            description="<p>A love story of a poor man&nbsp;and a girl.</p>",
+        )
+
+    def build(self):
+        call_command("build_text_neighbors", workers=1, stdout=StringIO())
+
+    def refresh(self):
+        call_command("refresh_neighbors", stdout=StringIO())
+
+    def more_like_this_ids(self, movie):
+        response = self.client.get(more_like_this_url(movie.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [neighbor["movie"] for neighbor in response.data]
+
+    def stored(self):
+        return set(
+            MovieNeighbor.objects.filter(kind=MovieNeighbor.TEXT).values_list(
+                "movie", "neighbor"
+            )
+        )
+
+    def test_movies_described_alike_come_first(self):
+        self.build()
+
+        self.assertEqual(
+            self.more_like_this_ids(self.alien)[0], self.aliens.id
+        )
+        self.assertEqual(
+            self.more_like_this_ids(self.titanic), [self.notebook.id]
+        )
+
+    def test_edited_description_refreshes_lists(self):
+        self.build()
+
+        self.titanic.description = "<p>An alien creature on a ship.</p>"
+        self.titanic.save()
+        self.refresh()
+
+        self.assertIn(self.titanic.id, self.more_like_this_ids(self.alien))
+        self.assertNotIn(
+            self.titanic.id, self.more_like_this_ids(self.notebook)
+        )
+
+    def test_refresh_finds_pairs_of_full_build(self):
+        # scores of untouched lists may lag on word rarity until a build
+        self.build()
+        self.notebook.description = "<p>A space freighter love story.</p>"
+        self.notebook.save()
+        self.refresh()
+        refreshed = self.stored()
+
+        self.build()
+
+        self.assertEqual(refreshed, self.stored())
+
+    def test_saving_other_fields_queues_nothing(self):
+        self.build()
+
+        self.alien.rating_count = 3
+        self.alien.save(update_fields=["rating_count"])
+
+        self.assertFalse(
+            PendingNeighborRefresh.objects.filter(
+                kind=MovieNeighbor.TEXT
+            ).exists()
+        )
+
+    def test_vote_tokenizes_nothing(self):
+        neighbors.description_words.matrix()
+        Movie.objects.filter(id=self.alien.id).update(
+            rating_count=1, updated_at=timezone.now()
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            neighbors.description_words.matrix([])
+
+        self.assertEqual(len(queries), 1)
+
+    def test_kept_words_follow_changes(self):
+        neighbors.description_words.matrix()
+        self.titanic.description = "<p>An alien creature on a ship.</p>"
+        self.titanic.save()
+        self.aliens.draft = True
+        self.aliens.save()
+        sample_movie(title="Alien 3", description="<p>Alien prison.</p>")
+
+        kept, kept_ids = neighbors.description_words.matrix(
+            PendingNeighborRefresh.objects.filter(
+                kind=MovieNeighbor.TEXT
+            ).values_list("movie_id", flat=True)
+        )
+        read, read_ids = neighbors.DescriptionWords().matrix()
+
+        np.testing.assert_array_equal(kept_ids, read_ids)
+        # the vocabularies number the words in different orders, and the
+        # kept one still holds words no description uses any more
+        self.assertEqual(
+            [sorted(row.data.round(5)) for row in kept],
+            [sorted(row.data.round(5)) for row in read],
+        )
+
+    def test_drafted_movie_leaves_lists(self):
+        self.build()
+        self.aliens.draft = True
+        self.aliens.save()
+
+        self.refresh()
+
+        self.assertFalse(
+            MovieNeighbor.objects.filter(neighbor=self.aliens).exists()
+        )
@@ -0,0 +1,157 @@
+from io import StringIO
+
+import numpy as np
+from scipy import sparse
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies import neighbors
+from movies.models import Movie, MovieNeighbor, Rating, RatingStar
+from movies.rating_stars import rating_star_index
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+def similar_by_audience_url(movie_id):
+    return reverse("movies:movie-similar-by-audience", args=[movie_id])
+
+
+class TopKNeighborsTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.matrix = sparse.csr_matrix(
+            np.array(
+                [
+                    [1, 1, 0, 0],
+                    [1, 1, 1, 0],
+                    [0, 0, 1, 1],
+                    [0, 0, 0, 0],
+                    [-1, -1, 0, 0],
+                ],
+                dtype=np.float32,
+            )
+        )
+
+    def test_best_neighbors_first_without_self(self):
+        rows, found, scores = neighbors.top_k_neighbors(self.matrix, 2)
+
+        self.assertEqual(
+            list(zip(rows.tolist(), found.tolist())),
+            [(0, 1), (1, 0), (1, 2), (2, 1)],
+        )
+        self.assertAlmostEqual(float(scores[0]), 2 / np.sqrt(6), places=5)
+
+    def test_process_pool_matches_single_process(self):
+        neighbors.BATCH_CELLS, batch_cells = 5, neighbors.BATCH_CELLS
+
+        try:
+            pooled = neighbors.top_k_neighbors(self.matrix, 2, workers=2)
+        finally:
+            neighbors.BATCH_CELLS = batch_cells
+
+        single = neighbors.top_k_neighbors(self.matrix, 2)
+
+        for pooled_part, single_part in zip(pooled, single):
+            np.testing.assert_allclose(pooled_part, single_part)
+
+
+class AudienceNeighborsApiTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        rating_star_index.invalidate()
+        self.client = APIClient()
+        self.stars = {
+            value: RatingStar.objects.create(value=value)
+            for value in (1, 2, 3, 4, 5)
+        }
+        self.alien = sample_movie(title="Alien")
+        self.aliens = sample_movie(title="Aliens")
+        self.amelie = sample_movie(title="Amelie")
+        self.rate(
+            {self.alien: 5, self.aliens: 5, self.amelie: 1},
+            {self.alien: 4, self.aliens: 5, self.amelie: 2},
+            {self.alien: 1, self.aliens: 2, self.amelie: 5},
+        )
+
+    def rate(self, *users):
+        for number, ratings in enumerate(users):
+            user = get_user_model().objects.create_user(
+                f"user{number}@test.com", "testpass", username=f"u{number}"
+            )
+            Rating.objects.bulk_create(
+                Rating(user=user, movie=movie, star=self.stars[value])
+                for movie, value in ratings.items()
+            )
+
+    def build(self):
+        call_command("build_audience_neighbors", workers=1, stdout=StringIO())
+
+    def test_movies_rated_alike_are_neighbors(self):
+        self.build()
+
+        response = self.client.get(similar_by_audience_url(self.alien.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(movie["movie"], movie["title"]) for movie in response.data],
+            [(self.aliens.id, "Aliens")],
+        )
+        self.assertGreater(response.data[0]["score"], 0)
+
+    def test_rebuild_replaces_previous_neighbors(self):
+        self.build()
+        self.build()
+
+        self.assertEqual(
+            MovieNeighbor.objects.filter(movie=self.alien).count(), 1
+        )
+
+    def test_draft_neighbors_are_hidden(self):
+        self.build()
+        Movie.objects.filter(id=self.aliens.id).update(draft=True)
+
+        response = self.client.get(similar_by_audience_url(self.alien.id))
+
+        self.assertEqual(response.data, [])
+
+    def test_neighbors_read_in_one_query(self):
+        self.build()
+
+        with self.assertNumQueries(1):
+            self.client.get(similar_by_audience_url(self.alien.id))
+
+    def test_movie_without_neighbors_gets_empty_list(self):
+        response = self.client.get(similar_by_audience_url(self.amelie.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_invalid_limit_rejected(self):
+        for limit in ("x", "\u00b2"):
+            response = self.client.get(
+                similar_by_audience_url(self.alien.id), {"limit": limit}
+            )
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_non_ascii_digit_id_not_found(self):
+        response = self.client.get(similar_by_audience_url("\u00b2"))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
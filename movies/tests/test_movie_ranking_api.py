@@ -0,0 +1,148 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies import service
+from movies.genre_index import genre_index
+from movies.models import Category, Genre, Movie, MovieRanking, RatingStar
+from movies.rating_stars import rating_star_index
+
+
+TOP_URL = reverse("movies:movie-top")
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+class MovieRankingApiTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        genre_index.invalidate()
+        rating_star_index.invalidate()
+        self.client = APIClient()
+        # anonymous reads would be answered by the response cache first
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("reader@test.com", "pass")
+        )
+        self.stars = {
+            value: RatingStar.objects.create(value=value)
+            for value in (1, 2, 3, 4, 5)
+        }
+        self.users = []
+
+    def rate(self, movie, *values):
+        for value in values:
+            number = len(self.users)
+            user = get_user_model().objects.create_user(
+                f"user{number}@test.com", "testpass", username=f"u{number}"
+            )
+            self.users.append(user)
+            service.rate_movie(user, movie, self.stars[value])
+
+    def top_titles(self, **params):
+        response = self.client.get(TOP_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [movie["title"] for movie in response.data["results"]]
+
+    def test_many_good_ratings_outrank_one_perfect_rating(self):
+        self.rate(sample_movie(title="One vote"), 5)
+        self.rate(sample_movie(title="Many votes"), *[4] * 20)
+        self.rate(sample_movie(title="Poor"), 1, 2)
+
+        response = self.client.get(TOP_URL)
+
+        self.assertEqual(
+            [movie["title"] for movie in response.data["results"]],
+            ["Many votes", "One vote", "Poor"],
+        )
+        self.assertAlmostEqual(
+            response.data["results"][0]["score"], (3 * 10 + 80) / 30
+        )
+        self.assertEqual(response.data["results"][0]["rating_count"], 20)
+
+    def test_unrated_and_draft_movies_not_ranked(self):
+        sample_movie(title="Unrated")
+        draft = sample_movie(title="Draft", draft=True)
+        self.rate(draft, 5)
+        self.rate(sample_movie(title="Rated"), 3)
+
+        self.assertEqual(self.top_titles(), ["Rated"])
+
+        draft.refresh_from_db()
+        draft.draft = False
+        draft.save()
+
+        self.assertEqual(self.top_titles(), ["Draft", "Rated"])
+
+        draft.draft = True
+        draft.save(update_fields=("draft",))
+
+        self.assertEqual(self.top_titles(), ["Rated"])
+
+    def test_ranking_follows_rating_changes(self):
+        first = sample_movie(title="First")
+        second = sample_movie(title="Second")
+        self.rate(first, 4)
+        self.rate(second, 3)
+
+        service.rate_movies(
+            self.users[1], [{"movie": second.id, "star": 5}]
+        )
+
+        self.assertEqual(self.top_titles(), ["Second", "First"])
+
+    def test_filter_by_genre_category_and_year(self):
+        drama = Genre.objects.create(name="Drama")
+        cartoon = Category.objects.create(name="Cartoon")
+        old_drama = sample_movie(title="Old drama", year_of_release=1960)
+        old_drama.genres.add(drama)
+        new_cartoon = sample_movie(
+            title="New cartoon", year_of_release=2010, category=cartoon
+        )
+        for movie in (old_drama, new_cartoon):
+            self.rate(movie, 4)
+
+        self.assertEqual(self.top_titles(genres="Drama"), ["Old drama"])
+        self.assertEqual(self.top_titles(category="cartoon"), ["New cartoon"])
+        self.assertEqual(
+            self.top_titles(year_of_release_min=2000), ["New cartoon"]
+        )
+
+    def test_pages_follow_cursor(self):
+        for index, value in enumerate((5, 4, 3)):
+            self.rate(sample_movie(title=f"Movie {index}"), value)
+
+        response = self.client.get(TOP_URL, {"page_size": 2})
+        next_page = self.client.get(response.data["next"])
+
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(
+            [movie["title"] for movie in next_page.data["results"]],
+            ["Movie 2"],
+        )
+
+    def test_rebuild_movie_ranking(self):
+        movie = sample_movie()
+        Movie.objects.filter(id=movie.id).update(rating_count=2, rating_sum=10)
+
+        call_command("rebuild_movie_ranking", stdout=StringIO())
+
+        self.assertAlmostEqual(
+            MovieRanking.objects.get(movie=movie).score, 40 / 12
+        )
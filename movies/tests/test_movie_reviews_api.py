@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies.models import Movie, Review
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+def reviews_url(movie_id):
+    return reverse("movies:movie-reviews", args=[movie_id])
+
+
+def detail_url(movie_id):
+    return reverse("movies:movie-detail", args=[movie_id])
+
+
+@override_settings(REVIEWS_MAX_DEPTH=2)
+class MovieReviewsApiTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.movie = sample_movie()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass", first_name="Bob"
+        )
+
+    def sample_thread(self, length):
+        parent = None
+        thread = []
+        for index in range(length):
+            parent = Review.objects.create(
+                user=self.user,
+                text=f"Review {index}",
+                movie=self.movie,
+                parent=parent,
+            )
+            thread.append(parent)
+
+        return thread
+
+    def test_reviews_paginated_by_cursor(self):
+        roots = [self.sample_thread(1)[0] for _ in range(3)]
+
+        response = self.client.get(
+            reviews_url(self.movie.id), {"page_size": 2}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [review["id"] for review in response.data["results"]],
+            [roots[0].id, roots[1].id],
+        )
+
+        response = self.client.get(response.data["next"])
+
+        self.assertEqual(
+            [review["id"] for review in response.data["results"]],
+            [roots[2].id],
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_reviews_depth_limited_with_reply_counts(self):
+        thread = self.sample_thread(4)
+
+        response = self.client.get(reviews_url(self.movie.id))
+
+        root = response.data["results"][0]
+        reply = root["children"][0]
+        nested_reply = reply["children"][0]
+        self.assertEqual(root["id"], thread[0].id)
+        self.assertEqual(root["replies_count"], 1)
+        self.assertEqual(nested_reply["id"], thread[2].id)
+        self.assertEqual(nested_reply["replies_count"], 1)
+        self.assertEqual(nested_reply["children"], [])
+
+    def test_reviews_depth_parameter(self):
+        self.sample_thread(3)
+
+        response = self.client.get(reviews_url(self.movie.id), {"depth": 0})
+
+        root = response.data["results"][0]
+        self.assertEqual(root["replies_count"], 1)
+        self.assertEqual(root["children"], [])
+
+    def test_reviews_invalid_depth(self):
+        response = self.client.get(
+            reviews_url(self.movie.id), {"depth": "deep"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_ascii_digits_rejected(self):
+        for url, params in (
+            (reviews_url(self.movie.id), {"depth": "\u00b2"}),
+            (detail_url(self.movie.id), {"reviews": "\u00b2"}),
+        ):
+            response = self.client.get(url, params)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_detail_without_reviews(self):
+        self.sample_thread(2)
+
+        response = self.client.get(
+            detail_url(self.movie.id), {"reviews": "none"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("reviews", response.data)
+
+    def test_detail_with_truncated_reviews(self):
+        first_thread = self.sample_thread(4)
+        self.sample_thread(1)
+
+        response = self.client.get(detail_url(self.movie.id), {"reviews": 1})
+
+        self.assertEqual(len(response.data["reviews"]), 1)
+        root = response.data["reviews"][0]
+        self.assertEqual(root["id"], first_thread[0].id)
+        self.assertEqual(root["children"][0]["children"][0]["children"], [])
+
+        full_response = self.client.get(detail_url(self.movie.id))
+
+        self.assertEqual(len(full_response.data["reviews"]), 2)
+
+    @override_settings(REVIEWS_MAX_LIMIT=1)
+    def test_detail_reviews_limit_capped(self):
+        self.sample_thread(1)
+        self.sample_thread(1)
+
+        response = self.client.get(detail_url(self.movie.id), {"reviews": 9})
+
+        self.assertEqual(len(response.data["reviews"]), 1)
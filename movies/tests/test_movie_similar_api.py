@@ -0,0 +1,265 @@
+from io import StringIO
+
+import numpy as np
+from scipy import sparse
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies import neighbors
+from movies.indexes import next_generation
+from movies.models import (
+    Actor,
+    Director,
+    Genre,
+    Movie,
+    MovieNeighbor,
+    PendingNeighborRefresh,
+)
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+def similar_url(movie_id):
+    return reverse("movies:movie-similar", args=[movie_id])
+
+
+class JaccardNeighborsTests(SimpleTestCase):
+    def test_shared_weight_over_union_weight(self):
+        incidence = sparse.csr_matrix(
+            np.array([[1, 1, 0], [1, 0, 1], [0, 0, 1]], dtype=np.float32)
+        )
+        weights = np.array([1, 3, 2], dtype=np.float32)
+
+        rows, found, scores = neighbors.jaccard_neighbors(
+            incidence, weights, 2
+        )
+
+        self.assertEqual(
+            list(zip(rows.tolist(), found.tolist())),
+            [(0, 1), (1, 2), (1, 0), (2, 1)],
+        )
+        np.testing.assert_allclose(
+            scores, [1 / 6, 2 / 3, 1 / 6, 2 / 3], rtol=1e-5
+        )
+
+    def test_common_columns_only_weigh_in(self):
+        incidence = sparse.csr_matrix(
+            np.array([[1, 1, 0], [1, 1, 0], [1, 0, 1]], dtype=np.float32)
+        )
+        weights = np.ones(3, dtype=np.float32)
+
+        rows, found, scores = neighbors.jaccard_neighbors(
+            incidence, weights, 2, max_candidates=2
+        )
+
+        self.assertEqual(
+            list(zip(rows.tolist(), found.tolist())), [(0, 1), (1, 0)]
+        )
+        np.testing.assert_allclose(scores, [1, 1])
+
+
+class ContentNeighborsApiTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.cameron = Director.objects.create(name="James Cameron")
+        self.weaver = Actor.objects.create(name="Sigourney Weaver")
+        self.scifi = Genre.objects.create(name="Sci-fi")
+        self.drama = Genre.objects.create(name="Drama")
+
+        self.aliens = sample_movie(title="Aliens")
+        self.avatar = sample_movie(title="Avatar")
+        self.titanic = sample_movie(title="Titanic")
+        self.amelie = sample_movie(title="Amelie")
+        self.aliens.directors.add(self.cameron)
+        self.aliens.actors.add(self.weaver)
+        self.aliens.genres.add(self.scifi)
+        self.avatar.directors.add(self.cameron)
+        self.avatar.actors.add(self.weaver)
+        self.avatar.genres.add(self.scifi)
+        self.titanic.directors.add(self.cameron)
+        self.titanic.genres.add(self.drama)
+        self.amelie.genres.add(self.drama)
+
+        crime = Genre.objects.create(name="Crime")
+        self.heat = sample_movie(title="Heat")
+        self.heat.genres.add(crime)
+        sample_movie(title="Ronin").genres.add(crime)
+
+    def build(self):
+        call_command("build_content_neighbors", workers=1, stdout=StringIO())
+
+    def refresh(self):
+        call_command("refresh_neighbors", stdout=StringIO())
+
+    def queued(self):
+        return PendingNeighborRefresh.objects.filter(
+            kind=MovieNeighbor.CONTENT
+        )
+
+    def similar_ids(self, movie):
+        response = self.client.get(similar_url(movie.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [neighbor["movie"] for neighbor in response.data]
+
+    def test_movies_sharing_more_come_first(self):
+        self.build()
+
+        self.assertEqual(
+            self.similar_ids(self.aliens), [self.avatar.id, self.titanic.id]
+        )
+        # a shared director outweighs a shared genre
+        self.assertEqual(
+            self.similar_ids(self.titanic),
+            [self.aliens.id, self.avatar.id, self.amelie.id],
+        )
+
+    def test_build_takes_queued_refreshes(self):
+        self.assertTrue(self.queued().exists())
+
+        self.build()
+
+        self.assertFalse(self.queued().exists())
+
+    def test_changed_people_refresh_affected_lists_only(self):
+        self.build()
+        untouched = MovieNeighbor.objects.get(movie=self.heat)
+
+        self.amelie.actors.add(self.weaver)
+
+        self.assertEqual(
+            list(self.queued().values_list("movie_id")),
+            [(self.amelie.id,)],
+        )
+
+        self.refresh()
+
+        self.assertIn(self.amelie.id, self.similar_ids(self.aliens))
+        self.assertEqual(
+            self.similar_ids(self.amelie),
+            [self.aliens.id, self.avatar.id, self.titanic.id],
+        )
+        self.assertFalse(PendingNeighborRefresh.objects.exists())
+        self.assertTrue(
+            MovieNeighbor.objects.filter(id=untouched.id).exists()
+        )
+
+    def test_refresh_matches_full_build(self):
+        self.build()
+        self.titanic.genres.add(self.scifi)
+        self.weaver.film_actor.remove(self.avatar)
+        self.refresh()
+        refreshed = set(
+            MovieNeighbor.objects.values_list("movie", "neighbor", "score")
+        )
+
+        self.build()
+
+        self.assertEqual(
+            refreshed,
+            set(
+                MovieNeighbor.objects.values_list(
+                    "movie", "neighbor", "score"
+                )
+            ),
+        )
+
+    def test_deleted_attribute_queues_its_movies(self):
+        self.build()
+
+        self.weaver.delete()
+
+        self.assertEqual(
+            set(self.queued().values_list("movie_id", flat=True)),
+            {self.aliens.id, self.avatar.id},
+        )
+
+    def test_drafted_movie_leaves_lists(self):
+        self.build()
+        self.avatar.draft = True
+        self.avatar.save()
+
+        self.refresh()
+
+        self.assertFalse(
+            MovieNeighbor.objects.filter(neighbor=self.avatar).exists()
+        )
+        self.assertFalse(
+            MovieNeighbor.objects.filter(movie=self.avatar).exists()
+        )
+
+    def test_kept_links_follow_changes(self):
+        neighbors.content_links.matrix()
+        self.queued().delete()
+
+        self.titanic.genres.add(self.scifi)
+        self.weaver.delete()
+        self.avatar.draft = True
+        self.avatar.save()
+        sample_movie(title="Terminator").directors.add(self.cameron)
+
+        kept = neighbors.content_links.matrix(
+            self.queued().values_list("movie_id", flat=True)
+        )
+        read = neighbors.content_matrix()
+
+        np.testing.assert_array_equal(kept[0].toarray(), read[0].toarray())
+        np.testing.assert_array_equal(kept[1], read[1])
+        np.testing.assert_array_equal(kept[2], read[2])
+
+    def test_vote_reads_no_links(self):
+        neighbors.content_links.matrix()
+        Movie.objects.filter(id=self.heat.id).update(
+            rating_count=1, updated_at=timezone.now()
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            neighbors.content_links.matrix([])
+
+        self.assertEqual(len(queries), 1)
+
+    def test_other_refresh_rereads_links(self):
+        neighbors.content_links.matrix()
+        self.titanic.genres.add(self.scifi)
+        # another process refreshed the queued movies
+        next_generation(neighbors.ContentLinks.generation_key)
+
+        kept = neighbors.content_links.matrix([])
+
+        np.testing.assert_array_equal(
+            kept[0].toarray(), neighbors.content_matrix()[0].toarray()
+        )
+
+    def test_refresh_reports_running_refresh(self):
+        other = connections.create_connection("default")
+        self.addCleanup(other.close)
+        with other.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_lock(%s)",
+                [neighbors.NEIGHBOR_REFRESH_LOCK],
+            )
+        out = StringIO()
+
+        call_command("refresh_neighbors", stdout=out)
+
+        self.assertIn("Another refresh is running", out.getvalue())
+        self.assertTrue(self.queued().exists())
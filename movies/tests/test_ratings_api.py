@@ -1,15 +1,30 @@
+import threading
+
+from decimal import Decimal
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
 from rest_framework.test import APIClient
 
 
-from movies.models import Movie, RatingStar, Rating
+from movies import service
+from movies.models import Movie, PendingRating, RatingStar, Rating
+from movies.rating_stars import rating_star_index
 
 
 RATING_URL = reverse("movies:ratings-list")
+BATCH_URL = reverse("movies:ratings-batch")
+
+
+def histogram_url(movie_id):
+    return reverse("movies:movie-rating-histogram", args=[movie_id])
 
 
 def sample_movie(**params):
@@ -43,6 +58,7 @@ class UnauthenticatedRatingsApiTests(TestCase):
 
 class AuthenticatedRatingApiTests(TestCase):
     def setUp(self) -> None:
+        rating_star_index.invalidate()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             "test@test.com",
@@ -65,5 +81,457 @@ class AuthenticatedRatingApiTests(TestCase):
 
         rating = Rating.objects.get(user=self.user, movie=movie)
 
-        for key in payload:
-            self.assertEqual(payload[key], getattr(rating, key).id)
+        self.assertEqual(payload["star"], rating.star.value)
+        self.assertEqual(payload["movie"], rating.movie.id)
+
+    def test_star_that_is_not_an_integer_rejected(self):
+        movie = sample_movie()
+        sample_star(value=1)
+        sample_star(value=4)
+
+        for star in (4.7, True, "\u0664"):
+            response = self.client.post(
+                RATING_URL, {"star": star, "movie": movie.id}, format="json"
+            )
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+        self.assertFalse(Rating.objects.exists())
+
+    def test_create_rating_reads_no_stars(self):
+        movie = sample_movie()
+        star = sample_star()
+        rating_star_index.ensure_fresh()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                RATING_URL, {"star": star.value, "movie": movie.id}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(
+            any("movies_ratingstar" in query["sql"] for query in queries)
+        )
+
+    def test_star_added_after_index_built_accepted(self):
+        movie = sample_movie()
+        sample_star(value=1)
+        rating_star_index.ensure_fresh()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            star = sample_star(value=5)
+
+        response = self.client.post(
+            RATING_URL, {"star": star.value, "movie": movie.id}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Rating.objects.get(movie=movie).star, star)
+
+    def test_rating_histogram_follows_rating_changes(self):
+        movie = sample_movie()
+        stars = [sample_star(value=value) for value in (1, 2, 3, 4, 5)]
+        other_user = get_user_model().objects.create_user(
+            "other@test.com", "testpass", username="other"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user=other_user, star=stars[4], movie=movie)
+        call_command("rebuild_rating_aggregates", stdout=StringIO())
+
+        self.client.post(RATING_URL, {"star": 2, "movie": movie.id})
+        self.client.post(RATING_URL, {"star": 5, "movie": movie.id})
+
+        response = self.client.get(histogram_url(movie.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["rating_count"], 2)
+        self.assertEqual(
+            response.data["rating_histogram"],
+            {"1": 0, "2": 0, "3": 0, "4": 0, "5": 2},
+        )
+
+    def test_rating_histogram_not_modified(self):
+        movie = sample_movie()
+        url = histogram_url(movie.id)
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_create_rating_updates_movie_aggregates(self):
+        movie = sample_movie()
+        star = sample_star(value=4)
+
+        self.client.post(RATING_URL, {"star": star.value, "movie": movie.id})
+
+        movie.refresh_from_db()
+        self.assertEqual(movie.rating_count, 1)
+        self.assertEqual(movie.rating_sum, 4)
+        self.assertEqual(movie.average_rating, Decimal("4.0"))
+
+    def test_change_rating_replaces_star_in_aggregates(self):
+        movie = sample_movie()
+        star_low = sample_star(value=2)
+        star_high = sample_star(value=5)
+        other_user = get_user_model().objects.create_user(
+            "other@test.com", "testpass", username="other"
+        )
+        Rating.objects.create(user=other_user, star=star_low, movie=movie)
+        call_command("rebuild_rating_aggregates", stdout=StringIO())
+
+        self.client.post(
+            RATING_URL, {"star": star_low.value, "movie": movie.id}
+        )
+        self.client.post(
+            RATING_URL, {"star": star_high.value, "movie": movie.id}
+        )
+
+        movie.refresh_from_db()
+        self.assertEqual(Rating.objects.filter(movie=movie).count(), 2)
+        self.assertEqual(movie.rating_count, 2)
+        self.assertEqual(movie.rating_sum, 7)
+        self.assertEqual(movie.average_rating, Decimal("3.5"))
+
+
+class BatchRatingApiTests(TestCase):
+    def setUp(self) -> None:
+        rating_star_index.invalidate()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.stars = {value: sample_star(value=value) for value in (2, 4, 5)}
+
+    def post_batch(self, ratings):
+        return self.client.post(BATCH_URL, {"ratings": ratings}, format="json")
+
+    def test_batch_creates_and_updates_ratings(self):
+        rated = sample_movie(title="Rated")
+        unrated = sample_movie(title="Unrated")
+        same = sample_movie(title="Same")
+        Rating.objects.create(user=self.user, star=self.stars[2], movie=rated)
+        Rating.objects.create(user=self.user, star=self.stars[5], movie=same)
+        call_command("rebuild_rating_aggregates", stdout=StringIO())
+
+        response = self.post_batch(
+            [
+                {"movie": rated.id, "star": 4},
+                {"movie": unrated.id, "star": 5},
+                {"movie": same.id, "star": 5},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["status"] for item in response.data["results"]],
+            ["updated", "created", "unchanged"],
+        )
+        self.assertEqual(Rating.objects.filter(user=self.user).count(), 3)
+
+        rated.refresh_from_db()
+        unrated.refresh_from_db()
+        self.assertEqual(rated.rating_histogram, {"4": 1})
+        self.assertEqual(rated.rating_sum, 4)
+        self.assertEqual(rated.rating_count, 1)
+        self.assertEqual(unrated.average_rating, Decimal("5.0"))
+
+    def test_invalid_items_reported_and_skipped(self):
+        movie = sample_movie()
+
+        response = self.post_batch(
+            [
+                {"movie": movie.id, "star": 3},
+                {"movie": 0, "star": 4},
+                {"movie": movie.id + 100, "star": 4},
+                {"movie": movie.id, "star": 2},
+            ]
+        )
+
+        results = response.data["results"]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["status"] for item in results],
+            ["invalid", "invalid", "invalid", "created"],
+        )
+        self.assertIn("star", results[0]["errors"])
+        self.assertIn("movie", results[1]["errors"])
+        self.assertIn("movie", results[2]["errors"])
+        self.assertEqual(
+            Rating.objects.get(user=self.user, movie=movie).star.value, 2
+        )
+
+    def test_ids_that_are_not_integers_rejected(self):
+        movie = sample_movie()
+
+        response = self.post_batch(
+            [
+                {"movie": movie.id + 0.7, "star": 4},
+                {"movie": "abc", "star": 4},
+                {"movie": 2**63, "star": 4},
+                {"movie": movie.id, "star": 4.5},
+                {"movie": float(movie.id), "star": "5"},
+            ]
+        )
+
+        results = response.data["results"]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["status"] for item in results],
+            ["invalid", "invalid", "invalid", "invalid", "created"],
+        )
+        self.assertIn("star", results[3]["errors"])
+
+    def test_later_item_for_same_movie_wins(self):
+        movie = sample_movie()
+
+        response = self.post_batch(
+            [{"movie": movie.id, "star": 2}, {"movie": movie.id, "star": 5}]
+        )
+
+        self.assertEqual(
+            [item["status"] for item in response.data["results"]],
+            ["superseded", "created"],
+        )
+        movie.refresh_from_db()
+        self.assertEqual(movie.rating_count, 1)
+        self.assertEqual(movie.rating_sum, 5)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        movies = [sample_movie(title=f"Movie {index}") for index in range(20)]
+        Rating.objects.create(
+            user=self.user, star=self.stars[2], movie=movies[0]
+        )
+        ratings = [{"movie": movie.id, "star": 4} for movie in movies]
+        rating_star_index.ensure_fresh()
+
+        with self.assertNumQueries(6):
+            self.post_batch(ratings)
+
+    def test_empty_batch_rejected(self):
+        response = self.post_batch([])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(RATING_WRITE_BEHIND=True)
+class WriteBehindRatingApiTests(TestCase):
+    def setUp(self) -> None:
+        rating_star_index.invalidate()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_rating_queued_until_flushed(self):
+        movie = sample_movie()
+        star = sample_star(value=4)
+
+        response = self.client.post(
+            RATING_URL, {"star": star.value, "movie": movie.id}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data, {"star": 4, "movie": movie.id})
+        self.assertFalse(Rating.objects.exists())
+
+        call_command("flush_ratings", stdout=StringIO())
+
+        movie.refresh_from_db()
+        self.assertEqual(Rating.objects.get(movie=movie).star, star)
+        self.assertEqual(movie.rating_count, 1)
+        self.assertFalse(PendingRating.objects.exists())
+
+    def test_flush_keeps_latest_rating_of_user_for_movie(self):
+        movie = sample_movie()
+        stars = [sample_star(value=value) for value in (2, 5, 3)]
+
+        for star in stars:
+            self.client.post(
+                RATING_URL, {"star": star.value, "movie": movie.id}
+            )
+
+        with self.assertNumQueries(12):
+            call_command("flush_ratings", batch_size=10, stdout=StringIO())
+
+        movie.refresh_from_db()
+        self.assertEqual(Rating.objects.get(movie=movie).star.value, 3)
+        self.assertEqual(movie.rating_count, 1)
+        self.assertEqual(movie.rating_sum, 3)
+
+    def test_flush_reports_running_flush(self):
+        service.enqueue_rating(self.user, sample_movie(), sample_star())
+        other = connections.create_connection("default")
+        self.addCleanup(other.close)
+        with other.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_lock(%s)", [service.RATING_FLUSH_LOCK]
+            )
+        out = StringIO()
+
+        call_command("flush_ratings", stdout=out)
+
+        self.assertIn("Another flush is running", out.getvalue())
+        self.assertTrue(PendingRating.objects.exists())
+
+    def test_invalid_rating_rejected_before_queueing(self):
+        movie = sample_movie()
+
+        response = self.client.post(RATING_URL, {"star": 9, "movie": movie.id})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PendingRating.objects.exists())
+
+
+class ConcurrentRatingTests(TransactionTestCase):
+    def test_concurrent_votes_leave_one_rating(self):
+        user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        movie = sample_movie()
+        stars = [sample_star(value=value) for value in (1, 2, 3, 4, 5)]
+        barrier = threading.Barrier(len(stars) * 2)
+        errors = []
+
+        def vote(star):
+            try:
+                barrier.wait()
+                service.rate_movie(user, movie, star)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=vote, args=(star,))
+            for star in stars * 2
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        rating = Rating.objects.select_related("star").get(
+            user=user, movie=movie
+        )
+        movie.refresh_from_db()
+        self.assertEqual(movie.rating_count, 1)
+        self.assertEqual(movie.rating_sum, rating.star.value)
+
+    def test_duplicate_rating_rejected(self):
+        user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        movie = sample_movie()
+        star = sample_star()
+        Rating.objects.create(user=user, star=star, movie=movie)
+
+        with self.assertRaises(IntegrityError):
+            Rating.objects.create(user=user, star=star, movie=movie)
+
+
+class RatingEditTests(TestCase):
+    def setUp(self) -> None:
+        rating_star_index.invalidate()
+        self.movie = sample_movie()
+        self.low, self.high = sample_star(value=2), sample_star(value=5)
+        self.users = [
+            get_user_model().objects.create_user(
+                f"user{index}@test.com", "testpass", username=f"user{index}"
+            )
+            for index in range(2)
+        ]
+        self.ratings = [
+            Rating.objects.create(user=user, star=self.low, movie=self.movie)
+            for user in self.users
+        ]
+
+    def assert_aggregates(self, histogram):
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.rating_histogram, histogram)
+        self.assertEqual(
+            self.movie.rating_count, sum(histogram.values())
+        )
+        self.assertEqual(
+            self.movie.rating_sum,
+            sum(int(value) * count for value, count in histogram.items()),
+        )
+
+    def test_created_ratings_counted(self):
+        self.assert_aggregates({"2": 2})
+        self.assertEqual(self.movie.average_rating, Decimal("2.0"))
+
+    def test_edited_star_moves_aggregates(self):
+        self.ratings[0].star = self.high
+        self.ratings[0].save()
+
+        self.assert_aggregates({"2": 1, "5": 1})
+        self.assertEqual(self.movie.average_rating, Decimal("3.5"))
+
+    def test_rating_moved_to_other_movie(self):
+        other_movie = sample_movie(title="Other movie")
+
+        self.ratings[0].movie = other_movie
+        self.ratings[0].save()
+
+        self.assert_aggregates({"2": 1})
+        other_movie.refresh_from_db()
+        self.assertEqual(other_movie.rating_histogram, {"2": 1})
+
+    def test_deleted_rating_leaves_aggregates(self):
+        self.ratings[0].delete()
+
+        self.assert_aggregates({"2": 1})
+
+    def test_deleted_user_takes_ratings_out(self):
+        self.users[1].delete()
+
+        self.assert_aggregates({"2": 1})
+
+    def test_deleted_movie_takes_ratings_along(self):
+        self.movie.delete()
+
+        self.assertFalse(Rating.objects.exists())
+
+
+class RebuildRatingAggregatesTests(TestCase):
+    def test_rebuild_rating_aggregates(self):
+        rated_movie = sample_movie(title="Rated")
+        unrated_movie = sample_movie(title="Unrated")
+        Movie.objects.filter(id=unrated_movie.id).update(
+            rating_count=3, rating_sum=9, average_rating=Decimal("3.0")
+        )
+
+        for index, value in enumerate((3, 4, 4)):
+            user = get_user_model().objects.create_user(
+                f"user{index}@test.com", "testpass", username=f"user{index}"
+            )
+            star, _ = RatingStar.objects.get_or_create(value=value)
+            Rating.objects.create(user=user, star=star, movie=rated_movie)
+
+        rated_stamp = Movie.objects.get(id=rated_movie.id).updated_at
+        unrated_stamp = Movie.objects.get(id=unrated_movie.id).updated_at
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            call_command(
+                "rebuild_rating_aggregates", batch_size=1, stdout=StringIO()
+            )
+
+        rated_movie.refresh_from_db()
+        unrated_movie.refresh_from_db()
+        # the ratings kept the rated movie's aggregates in step
+        self.assertEqual(rated_movie.updated_at, rated_stamp)
+        self.assertGreater(unrated_movie.updated_at, unrated_stamp)
+        self.assertTrue(callbacks)
+        self.assertEqual(rated_movie.rating_count, 3)
+        self.assertEqual(rated_movie.rating_sum, 11)
+        self.assertEqual(rated_movie.average_rating, Decimal("3.7"))
+        self.assertEqual(rated_movie.rating_histogram, {"3": 1, "4": 2})
+        self.assertEqual(unrated_movie.rating_count, 0)
+        self.assertIsNone(unrated_movie.average_rating)
@@ -0,0 +1,129 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from rest_framework.test import APIClient
+
+from movies import service
+from movies.models import Movie, Actor, RatingStar
+
+
+MOVIE_URL = reverse("movies:movie-list")
+ACTOR_URL = reverse("movies:actor-list")
+
+
+def sample_movie(**params):
+    defaults = {
+        "title": "Sample movie",
+        "description": "Sample description",
+        "year_of_release": 1990,
+    }
+    defaults.update(params)
+
+    return Movie.objects.create(**defaults)
+
+
+class ResponseCacheTestsMixin:
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.movie = sample_movie()
+
+    def test_anonymous_list_served_from_cache(self):
+        first_response = self.client.get(MOVIE_URL, {"a": 1, "b": 2})
+
+        # same parameters in another order share the entry
+        with self.assertNumQueries(0):
+            second_response = self.client.get(MOVIE_URL, {"b": 2, "a": 1})
+
+        self.assertEqual(second_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(second_response.content, first_response.content)
+        self.assertEqual(second_response["ETag"], first_response["ETag"])
+
+    def test_cached_response_honours_if_none_match(self):
+        url = reverse("movies:movie-detail", args=[self.movie.id])
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_retires_cached_responses(self):
+        self.client.get(ACTOR_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Actor.objects.create(name="Tom Cruise")
+
+        response = self.client.get(ACTOR_URL)
+
+        self.assertEqual(response.data["count"], 1)
+
+    def test_vote_retires_only_responses_with_ratings(self):
+        star = RatingStar.objects.create(value=4)
+        user = get_user_model().objects.create_user(
+            "test@test.com", "testpass", username="test"
+        )
+        self.client.get(MOVIE_URL)
+        self.client.get(ACTOR_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            service.rate_movie(user, self.movie, star)
+
+        with self.assertNumQueries(0):
+            self.client.get(ACTOR_URL)
+
+        response = self.client.get(MOVIE_URL)
+
+        self.assertEqual(response.data["results"][0]["average_rating"], 4)
+
+    def test_cached_response_keeps_vary(self):
+        vary = self.client.get(MOVIE_URL)["Vary"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(MOVIE_URL)
+
+        self.assertEqual(response["Vary"], vary)
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.get(MOVIE_URL)
+        sample_movie(title="Uncommitted")
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                "test@test.com", "testpass", username="test"
+            )
+        )
+
+        response = self.client.get(MOVIE_URL)
+
+        self.assertEqual(response.data["count"], 2)
+
+
+class LocalMemoryResponseCacheTests(ResponseCacheTestsMixin, TestCase):
+    pass
+
+
+class FileResponseCacheTests(ResponseCacheTestsMixin, TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+
+        settings_override = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": (
+                        "django.core.cache.backends.filebased.FileBasedCache"
+                    ),
+                    "LOCATION": directory,
+                }
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        super().setUp()
@@ -57,3 +57,24 @@ class AuthenticatedReviewApiTests(TestCase):
 
         review_exists = Review.objects.filter(user=self.user).exists()
         self.assertTrue(review_exists)
+
+    def test_reply_to_review_of_other_movie_rejected(self):
+        movie = sample_movie()
+        other_movie = sample_movie(title="Other movie")
+        author = get_user_model().objects.create_user(
+            "author@test.com", "testpass", username="author"
+        )
+        review = Review.objects.create(
+            user=author, text="Great", movie=other_movie
+        )
+
+        payload = {
+            "text": "Agree",
+            "movie": movie.id,
+            "parent": review.id,
+        }
+
+        response = self.client.post(REVIEW_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Review.objects.filter(parent=review).exists())
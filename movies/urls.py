@@ -18,5 +18,11 @@ router.register("genres", views.GenreViewSet, basename="genres")
 router.register(
     "movie-frames", views.MovieFramesViewSet, basename="movie-frames"
 )
+router.register(
+    "autocomplete", views.AutocompleteViewSet, basename="autocomplete"
+)
+router.register(
+    "connections", views.ConnectionViewSet, basename="connections"
+)
 
 urlpatterns = [path("", include(router.urls))]
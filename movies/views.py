@@ -1,14 +1,44 @@
-from django.db.models import Avg
+import re
+
+from django.conf import settings
+from django.db.models import Max, Prefetch
+from django.db.models.functions import Greatest
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
-
-from movies.models import Movie, Actor, Director, Category, Genre, MovieFrames
-from movies.pagination import ApiPagination
+from rest_framework.throttling import ScopedRateThrottle
+
+from movies import cache
+from movies.catalog import export_movies, ndjson_chunks
+from movies.mixins import AnonymousResponseCacheMixin, ConditionalGetMixin
+from movies.autocomplete import autocomplete_index
+from movies.collaboration import collaboration_graph
+from movies.embeddings import embedding_store
+from movies.models import (
+    Movie,
+    Actor,
+    Director,
+    Category,
+    Genre,
+    MovieFrames,
+    MovieNeighbor,
+    MovieRanking,
+    Rating,
+    Review,
+)
+from movies import service
+from movies.pagination import (
+    CatalogPagination,
+    RankingPagination,
+    ReviewPagination,
+)
 from movies.permissions import IsAdminOrReadOnly
 
 from movies.serializers import (
@@ -16,8 +46,13 @@ from movies.serializers import (
     MovieListSerializer,
     MovieDetailSerializer,
     MoviePosterSerializer,
+    MovieNeighborSerializer,
+    MovieRecommendationSerializer,
+    MovieRankingSerializer,
+    MovieRatingHistogramSerializer,
     ReviewCreateSerializer,
     RatingCreateSerializer,
+    RatingBatchSerializer,
     ActorSerializer,
     ActorListSerializer,
     ActorDetailSerializer,
@@ -26,37 +61,145 @@ from movies.serializers import (
     DirectorListSerializer,
     DirectorDetailSerializer,
     DirectorImageSerializer,
+    ReviewThreadSerializer,
     CategoryCreateSerializer,
     GenreCreateSerializer,
     MovieFramesSerializer,
 )
-from movies.service import MovieFilter
+from movies.service import MovieFilter, MovieRankingFilter
 
 
-class MovieViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Movie.objects.filter(draft=False)
-        .annotate(average_rating=Avg("film_rating__star__value"))
-    )
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+PERSON_REF = re.compile(r"(actor|director):(\d+)")
+
+
+def parse_digits(value):
+    """``value`` as an int when it is made of ASCII digits only, else None
+
+    ``str.isdigit`` alone also accepts e.g. "²", which ``int`` rejects.
+    """
+    if value.isascii() and value.isdigit():
+        return int(value)
+
+    return None
+
+
+class MovieViewSet(
+    AnonymousResponseCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
+    queryset = Movie.objects.filter(draft=False).defer("search_vector")
     serializer_class = MovieSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = MovieFilter
-    pagination_class = ApiPagination
+    pagination_class = CatalogPagination
+    cursor_ordering = ("title", "id")
+    ranked_query_params = ("search",)
+    # genre and category edits move their own stamps, not the movies'
+    detail_last_modified = Greatest(
+        Max("updated_at"),
+        Max("genres__updated_at"),
+        Max("category__updated_at"),
+    )
+    cached_actions = (
+        "list",
+        "retrieve",
+        "rating_histogram",
+        "top",
+        "similar_by_audience",
+        "similar",
+        "more_like_this",
+    )
+    # actions rendering rating aggregates, cached until the next vote
+    rating_actions = ("list", "retrieve", "rating_histogram", "top")
 
     def get_queryset(self):
         title = self.request.query_params.get("title")
         category = self.request.query_params.get("category")
+        search = self.request.query_params.get("search")
         queryset = super().get_queryset()
 
+        if search:
+            queryset = service.search_movies(queryset, search)
+
         if title:
             queryset = queryset.filter(title__icontains=title)
 
         if category:
             queryset = queryset.filter(category__name__icontains=category)
 
+        return self.plan_queryset(queryset)
+
+    def plan_queryset(self, queryset):
+        """Load everything the action's serializer renders up front"""
+        if self.action == "list":
+            return queryset
+
+        # the whole review tree in one query, nested by the serializer
+        reviews = Prefetch(
+            "reviews",
+            queryset=Review.objects.select_related("user").order_by("id")
+        )
+
+        if self.action == "retrieve":
+            queryset = queryset.select_related("category").prefetch_related(
+                "genres",
+                "directors",
+                "actors",
+                "film_shots",
+                Prefetch(
+                    "film_rating",
+                    queryset=Rating.objects.select_related("user"),
+                ),
+            )
+            if self.get_reviews_limit() is None:
+                queryset = queryset.prefetch_related(reviews)
+
         return queryset
 
+    def get_reviews_limit(self):
+        """Top-level reviews in the detail view, None for the whole tree.
+
+        Capped, as every distinct limit is another variant of the
+        movie's cached detail.
+        """
+        value = self.request.query_params.get("reviews")
+
+        if value is None:
+            return None
+        if value == "none":
+            return 0
+
+        limit = parse_digits(value)
+
+        if not limit:
+            raise ValidationError(
+                {"reviews": "Use 'none' or a positive number of reviews."}
+            )
+
+        return min(limit, settings.REVIEWS_MAX_LIMIT)
+
+    def get_review_depth(self):
+        value = self.request.query_params.get("depth")
+
+        if value is None:
+            return settings.REVIEWS_MAX_DEPTH
+
+        depth = parse_digits(value)
+
+        if depth is None:
+            raise ValidationError({"depth": "A valid integer is required."})
+
+        return min(depth, settings.REVIEWS_MAX_DEPTH)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+
+        if self.action == "retrieve":
+            context["reviews_limit"] = self.get_reviews_limit()
+
+        return context
+
     def get_serializer_class(self):
         if self.action == "list":
             return MovieListSerializer
@@ -64,6 +207,8 @@ class MovieViewSet(viewsets.ModelViewSet):
             return MovieDetailSerializer
         if self.action == "upload_poster":
             return MoviePosterSerializer
+        if self.action == "rating_histogram":
+            return MovieRatingHistogramSerializer
         return super().get_serializer_class()
 
     @action(
@@ -83,6 +228,350 @@ class MovieViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="rating-histogram",
+    )
+    def rating_histogram(self, request, pk=None):
+        """Endpoint for the number of ratings of a movie per star value"""
+        return self.conditional_response(
+            request,
+            self.get_detail_last_modified(),
+            lambda: Response(self.get_serializer(self.get_object()).data),
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="genres",
+                type=str,
+                description="Movies in any of the genres (ex. ?genres=Drama)",
+            ),
+            OpenApiParameter(
+                name="category",
+                type=str,
+                description="Movies of the category (ex. ?category=Movie)",
+            ),
+            OpenApiParameter(
+                name="year_of_release_min",
+                type=int,
+                description="Released in or after (ex. 1990)",
+            ),
+            OpenApiParameter(
+                name="year_of_release_max",
+                type=int,
+                description="Released in or before (ex. 1999)",
+            ),
+        ],
+        responses=MovieRankingSerializer(many=True),
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+    )
+    def top(self, request):
+        """Endpoint for the best rated movies by Bayesian average"""
+        filterset = MovieRankingFilter(
+            request.query_params,
+            queryset=MovieRanking.objects.select_related("movie").only(
+                "score",
+                "movie__title",
+                "movie__average_rating",
+                "movie__rating_count",
+            ),
+            request=request,
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        paginator = RankingPagination()
+        page = paginator.paginate_queryset(filterset.qs, request, view=self)
+        serializer = MovieRankingSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+
+        return paginator.get_paginated_response(serializer.data)
+
+    def get_limit(self, default, maximum):
+        limit = parse_digits(
+            self.request.query_params.get("limit", str(default))
+        )
+
+        if limit is None:
+            raise ValidationError({"limit": "A valid integer is required."})
+
+        return min(limit, maximum)
+
+    def neighbors_response(self, request, pk, kind):
+        """Best stored neighbors of ``kind`` of a movie in one indexed
+        read, an empty list for movies without any
+        """
+        limit = self.get_limit(10, settings.NEIGHBORS_MAX_LIMIT)
+        pk = parse_digits(pk)
+
+        if pk is None:
+            raise Http404
+
+        neighbors = (
+            MovieNeighbor.objects.filter(
+                movie_id=pk,
+                kind=kind,
+                movie__draft=False,
+                neighbor__draft=False,
+            )
+            .select_related("neighbor")
+            .only("score", "neighbor__title")
+            .order_by("-score")[:limit]
+        )
+        serializer = MovieNeighborSerializer(
+            neighbors, many=True, context=self.get_serializer_context()
+        )
+
+        return Response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                description=(
+                    "Number of movies, at most NEIGHBORS_MAX_LIMIT "
+                    "(ex. ?limit=5)"
+                )
+            ),
+        ],
+        responses=MovieNeighborSerializer(many=True),
+    )
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="similar-by-audience",
+    )
+    def similar_by_audience(self, request, pk=None):
+        """Endpoint for movies rated alike by the users who rated this one"""
+        return self.neighbors_response(
+            request, pk, MovieNeighbor.AUDIENCE
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                description=(
+                    "Number of movies, at most NEIGHBORS_MAX_LIMIT "
+                    "(ex. ?limit=5)"
+                )
+            ),
+        ],
+        responses=MovieNeighborSerializer(many=True),
+    )
+    @action(
+        methods=["GET"],
+        detail=True,
+    )
+    def similar(self, request, pk=None):
+        """Endpoint for movies sharing actors, directors and genres"""
+        return self.neighbors_response(request, pk, MovieNeighbor.CONTENT)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                description=(
+                    "Number of movies, at most NEIGHBORS_MAX_LIMIT "
+                    "(ex. ?limit=5)"
+                )
+            ),
+        ],
+        responses=MovieNeighborSerializer(many=True),
+    )
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="more-like-this",
+    )
+    def more_like_this(self, request, pk=None):
+        """Endpoint for movies whose descriptions use the same words"""
+        return self.neighbors_response(request, pk, MovieNeighbor.TEXT)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                description=(
+                    "Number of movies, at most FOR_YOU_MAX_LIMIT "
+                    "(ex. ?limit=20)"
+                )
+            ),
+        ],
+        responses=MovieRecommendationSerializer(many=True),
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="for-you",
+        permission_classes=[IsAuthenticated],
+    )
+    def for_you(self, request):
+        """Endpoint for the published movies the user has not rated yet
+        that their embedding predicts they would like best
+        """
+        limit = self.get_limit(10, settings.FOR_YOU_MAX_LIMIT)
+        rated_ids = Rating.objects.filter(user=request.user).values_list(
+            "movie_id", flat=True
+        )
+        # room for movies turned into drafts since the last training
+        movie_ids, scores = embedding_store.recommend(
+            request.user.id, list(rated_ids), 2 * limit
+        )
+        movies = Movie.objects.filter(draft=False).only("title").in_bulk(
+            movie_ids.tolist()
+        )
+        recommended = []
+
+        for movie_id, score in zip(movie_ids.tolist(), scores.tolist()):
+            if movie_id in movies and len(recommended) < limit:
+                movies[movie_id].score = score
+                recommended.append(movies[movie_id])
+
+        serializer = MovieRecommendationSerializer(
+            recommended, many=True, context=self.get_serializer_context()
+        )
+
+        return Response(serializer.data)
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="cache-stats",
+        permission_classes=[IsAdminUser],
+    )
+    def cache_stats(self, request):
+        """Endpoint for checking the hit rate of the movie detail cache"""
+        return Response(cache.get_movie_detail_stats())
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request):
+        """Endpoint for downloading every movie as JSON Lines (staff only)"""
+        compress = bool(
+            ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        )
+        response = StreamingHttpResponse(
+            ndjson_chunks(export_movies(), compress=compress),
+            content_type="application/x-ndjson",
+        )
+        response["Content-Disposition"] = (
+            'attachment; filename="catalog.ndjson"'
+        )
+        if compress:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="depth",
+                type=int,
+                description=(
+                    "Levels of replies to load, capped by REVIEWS_MAX_DEPTH "
+                    "(ex. ?depth=1)"
+                )
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="reviews",
+    )
+    def reviews(self, request, pk=None):
+        """Endpoint for paging through the review threads of a movie"""
+        movie = self.get_object()
+        depth = self.get_review_depth()
+        paginator = ReviewPagination()
+
+        reviews = paginator.paginate_queryset(
+            movie.reviews.filter(parent__isnull=True).select_related("user"),
+            request,
+            view=self,
+        )
+        service.attach_review_replies(reviews, depth)
+        serializer = ReviewThreadSerializer(
+            reviews, many=True, context=self.get_serializer_context()
+        )
+
+        return paginator.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="reviews",
+                type=str,
+                description=(
+                    "Omit reviews or keep only the first top-level reviews, "
+                    "at most REVIEWS_MAX_LIMIT, with limited replies "
+                    "(ex. ?reviews=none, ?reviews=5)"
+                )
+            ),
+        ]
+    )
+    def retrieve(self, request, *args, **kwargs):
+        movie_id = parse_digits(
+            self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        )
+
+        if movie_id is None:
+            raise Http404
+
+        # filtered lookups may 404 or differ, so they skip the cache
+        if set(request.query_params) - {"reviews"}:
+            return super().retrieve(request, *args, **kwargs)
+
+        base_uri = request.build_absolute_uri("/")
+        variant = str(self.get_reviews_limit())
+        generation = cache.get_movie_detail_generation(movie_id)
+        cached = cache.get_movie_detail(
+            movie_id, generation, base_uri, variant
+        )
+
+        # the entry is retired on every change, so its stamp is current
+        if cached is not None:
+            updated_at, data = cached
+            return self.conditional_response(
+                request, updated_at, lambda: Response(data)
+            )
+
+        updated_at = self.get_detail_last_modified()
+        response = self.conditional_response(
+            request,
+            updated_at,
+            lambda: mixins.RetrieveModelMixin.retrieve(
+                self, request, *args, **kwargs
+            ),
+        )
+
+        if updated_at is not None and response.status_code == 200:
+            cache.set_movie_detail(
+                movie_id,
+                generation,
+                base_uri,
+                variant,
+                response.data,
+                updated_at,
+            )
+
+        return response
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -99,6 +588,14 @@ class MovieViewSet(viewsets.ModelViewSet):
                     "Filter by category name (ex. ?category=Films)"
                 )
             ),
+            OpenApiParameter(
+                name="search",
+                type=str,
+                description=(
+                    "Full-text search in title, tagline and description, "
+                    "most relevant first (ex. ?search=space robots)"
+                )
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -121,23 +618,61 @@ class AddStarRatingViewSet(
     serializer_class = RatingCreateSerializer
     permission_classes = (IsAuthenticated,)
 
+    def get_serializer_class(self):
+        if self.action == "batch":
+            return RatingBatchSerializer
+        return super().get_serializer_class()
+
+    def create(self, request, *args, **kwargs):
+        if not settings.RATING_WRITE_BEHIND:
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        service.enqueue_rating(
+            user=request.user,
+            movie=serializer.validated_data["movie"],
+            star=serializer.validated_data["star"],
+        )
+
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(
+        methods=["POST"],
+        detail=False,
+    )
+    def batch(self, request):
+        """Endpoint for rating many movies at once, with a result per item"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = service.rate_movies(
+            request.user, serializer.validated_data["ratings"]
+        )
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
 
-class ActorViewSet(viewsets.ModelViewSet):
+class ActorViewSet(
+    AnonymousResponseCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Actor.objects.all()
     serializer_class = ActorSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
-    pagination_class = ApiPagination
+    pagination_class = CatalogPagination
+    cursor_ordering = ("name", "id")
+    ranked_query_params = ("name",)
 
     def get_queryset(self):
         name = self.request.query_params.get("name")
         queryset = super().get_queryset()
 
         if name:
-            queryset = queryset.filter(name__icontains=name)
+            queryset = service.search_people(queryset, name)
 
         return queryset
 
@@ -173,7 +708,8 @@ class ActorViewSet(viewsets.ModelViewSet):
                 name="name",
                 type=str,
                 description=(
-                    "Filter by name (ex. ?name=Tom Cruise)"
+                    "Filter by name, tolerating typos, closest first "
+                    "(ex. ?name=Tom Cruise)"
                 )
             ),
         ]
@@ -182,19 +718,23 @@ class ActorViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class DirectorViewSet(viewsets.ModelViewSet):
+class DirectorViewSet(
+    AnonymousResponseCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Director.objects.all()
     serializer_class = DirectorSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
-    pagination_class = ApiPagination
+    pagination_class = CatalogPagination
+    cursor_ordering = ("name", "id")
+    ranked_query_params = ("name",)
 
     def get_queryset(self):
         name = self.request.query_params.get("name")
         queryset = super().get_queryset()
 
         if name:
-            queryset = queryset.filter(name__icontains=name)
+            queryset = service.search_people(queryset, name)
 
         return queryset
 
@@ -230,7 +770,8 @@ class DirectorViewSet(viewsets.ModelViewSet):
                 name="name",
                 type=str,
                 description=(
-                    "Filter by name (ex. ?name=James Cameron)"
+                    "Filter by name, tolerating typos, closest first "
+                    "(ex. ?name=James Cameron)"
                 )
             ),
         ]
@@ -261,3 +802,118 @@ class MovieFramesViewSet(
     queryset = MovieFrames.objects.select_related("movies")
     serializer_class = MovieFramesSerializer
     permission_classes = (IsAdminUser,)
+
+
+class AutocompleteViewSet(viewsets.ViewSet):
+    # answered from worker memory, so neither authentication nor
+    # anything else may touch the database
+    authentication_classes = ()
+    throttle_classes = (ScopedRateThrottle,)
+    throttle_scope = "autocomplete"
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                type=str,
+                description=(
+                    "Beginning of a title or name, or of any word in it "
+                    "(ex. ?q=cru)"
+                )
+            ),
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                description=(
+                    "Number of suggestions of each kind, at most "
+                    "AUTOCOMPLETE_MAX_LIMIT (ex. ?limit=5)"
+                )
+            ),
+        ]
+    )
+    def list(self, request):
+        """Endpoint for search-as-you-type over movies, actors and directors"""
+        limit = parse_digits(request.query_params.get("limit", "5"))
+
+        if limit is None:
+            raise ValidationError({"limit": "A valid integer is required."})
+
+        return Response(
+            autocomplete_index.search(
+                request.query_params.get("q", ""),
+                min(limit, settings.AUTOCOMPLETE_MAX_LIMIT),
+            )
+        )
+
+
+class ConnectionViewSet(viewsets.ViewSet):
+    @staticmethod
+    def person_ref(request, name):
+        match = PERSON_REF.fullmatch(request.query_params.get(name, ""))
+
+        if match is None:
+            raise ValidationError(
+                {name: "Expected actor:<id> or director:<id>."}
+            )
+
+        return match[1], int(match[2])
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="from",
+                type=str,
+                required=True,
+                description="Actor or director (ex. ?from=actor:12)",
+            ),
+            OpenApiParameter(
+                name="to",
+                type=str,
+                required=True,
+                description="Actor or director (ex. ?to=director:3)",
+            ),
+        ]
+    )
+    def list(self, request):
+        """Endpoint for the shortest chain of movies linking two people"""
+        found = collaboration_graph.path(
+            self.person_ref(request, "from"), self.person_ref(request, "to")
+        )
+
+        if found is None:
+            raise NotFound("These people share no chain of movies.")
+
+        people, movie_ids = found
+        names = {
+            kind: dict(
+                model.objects.filter(
+                    id__in=[
+                        person_id
+                        for person_kind, person_id in people
+                        if person_kind == kind
+                    ]
+                ).values_list("id", "name")
+            )
+            for kind, model in (("actor", Actor), ("director", Director))
+        }
+        titles = dict(
+            Movie.objects.filter(id__in=movie_ids).values_list("id", "title")
+        )
+
+        return Response(
+            {
+                "degrees": len(movie_ids),
+                "people": [
+                    {
+                        "kind": kind,
+                        "id": person_id,
+                        "name": names[kind].get(person_id),
+                    }
+                    for kind, person_id in people
+                ],
+                "movies": [
+                    {"id": movie_id, "title": titles.get(movie_id)}
+                    for movie_id in movie_ids
+                ],
+            }
+        )